@@ -1,9 +1,12 @@
 from django.contrib import admin
 
 # Register your models here.
-from .models import Module, Page, UserProgress, User
+from .models import ImportedRecord, Job, Module, Page, QuizAttempt, UserProgress, User
 
 admin.site.register(Module)
 admin.site.register(Page)
 admin.site.register(UserProgress)
 admin.site.register(User)
+admin.site.register(Job)
+admin.site.register(QuizAttempt)
+admin.site.register(ImportedRecord)
@@ -0,0 +1,35 @@
+from django.urls import path
+
+from . import async_views
+from .async_views import async_read
+from .views import ModuleViewSet, UserProgressViewSet, UserViewSet
+
+# Included ahead of api.urls when settings.ASYNC_READ_VIEWS is on
+urlpatterns = [
+    path('modules/', async_read(async_views.module_list, ModuleViewSet.as_view({
+        'get': 'list',
+        'post': 'create'
+    })), name='module-list-async'),
+    path('modules/saved/', async_read(async_views.saved_modules, ModuleViewSet.as_view({
+        'get': 'saved'
+    })), name='module-saved-async'),
+    path('modules/<int:pk>/', async_read(async_views.module_detail, ModuleViewSet.as_view({
+        'get': 'retrieve',
+        'put': 'update',
+        'patch': 'partial_update',
+        'delete': 'destroy'
+    })), name='module-detail-async'),
+    path('modules/<int:pk>/pages/', async_read(async_views.module_pages, ModuleViewSet.as_view({
+        'get': 'pages',
+        'post': 'pages'
+    })), name='module-pages-async'),
+    path('progress/', async_read(async_views.progress_list, UserProgressViewSet.as_view({
+        'get': 'list',
+        'post': 'create'
+    })), name='progress-list-async'),
+    path('users/me/', async_read(async_views.me, UserViewSet.as_view({
+        'get': 'me',
+        'put': 'update',
+        'patch': 'partial_update'
+    })), name='user-me-async'),
+]
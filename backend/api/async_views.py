@@ -0,0 +1,154 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse
+from rest_framework import exceptions
+from rest_framework.request import Request
+
+from . import cache as module_cache
+from . import representations
+from .authentication import ClaimsJWTAuthentication
+from .conditional import aconditional_response, is_conditional, make_etag
+from .models import Module, User, UserProgress
+from .progress_buffer import progress_buffer
+from .renderers import FastJSONRenderer
+from .serializers import UserSerializer
+from .views import (
+    ModuleViewSet,
+    UserProgressViewSet,
+    module_detail_validators,
+    module_progress,
+    module_progress_query,
+    parse_module_id,
+    progress_list_validators,
+    sees_answers,
+    select_fields,
+)
+
+# Native async implementations of the read endpoints, served ahead of the
+# DRF viewsets when settings.ASYNC_READ_VIEWS is on (see api.async_urls).
+# Other methods on the same URLs still go to the sync viewsets.
+
+
+def json_response(data, status=200):
+    return HttpResponse(FastJSONRenderer().render(data), status=status, content_type='application/json')
+
+
+def async_read(async_view, sync_view):
+    """Serve GET with ``async_view`` and every other method with the sync DRF view."""
+    sync_view = sync_to_async(sync_view)
+
+    @wraps(async_view)
+    async def view(request, *args, **kwargs):
+        if request.method != 'GET':
+            return await sync_view(request, *args, **kwargs)
+        return await authenticated(async_view)(request, *args, **kwargs)
+
+    # CSRF is the DRF views' concern; JWT requests are exempt there as well
+    view.csrf_exempt = True
+    return view
+
+
+def authenticated(async_view):
+    """Authenticate like the DRF views do and render API errors the same way."""
+    @wraps(async_view)
+    async def view(request, *args, **kwargs):
+        authenticator = ClaimsJWTAuthentication()
+        try:
+            result = await authenticator.aauthenticate(request)
+            if result is None:
+                raise exceptions.NotAuthenticated
+            request.user = result[0]
+            return await async_view(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+            response = json_response(data, status=exc.status_code)
+            if exc.status_code == 401:
+                response['WWW-Authenticate'] = authenticator.authenticate_header(request)
+            return response
+        except Http404:
+            return json_response({'detail': exceptions.NotFound.default_detail}, status=404)
+    return view
+
+
+def drf_view(viewset_class, request, action, **kwargs):
+    # Reuse the viewset's queryset, filter and serializer logic without dispatching it
+    drf_request = Request(request)
+    drf_request.user = request.user
+    return viewset_class(request=drf_request, action=action, args=(), kwargs=kwargs, format_kwarg=None)
+
+
+async def aget_cached_module_tree(module_id, answers=False):
+    async def build():
+        tree = await representations.amodule_tree(module_id, answers)
+        if tree is None:
+            raise Http404
+        return tree
+
+    return await module_cache.aget_module_tree(module_id, build, answers)
+
+
+async def module_list(request):
+    view = drf_view(ModuleViewSet, request, 'list')
+    queryset = view.filter_queryset(view.get_queryset())
+    # DRF's paginator evaluates the page itself; the async ORM would run that
+    # query in a worker thread just the same
+    page = await sync_to_async(view.paginator.paginate_queryset)(queryset, view.request, view=view)
+    serializer = view.get_serializer(page, many=True)
+    data = view.paginator.get_paginated_response(serializer.data).data
+    return json_response(select_fields(request, data, paginated=True))
+
+
+async def saved_modules(request):
+    view = drf_view(ModuleViewSet, request, 'saved')
+    queryset = view.filter_queryset(view.get_queryset().filter(saved_by_users=request.user))
+    page = await sync_to_async(view.paginator.paginate_queryset)(queryset, view.request, view=view)
+    serializer = view.get_serializer(page, many=True)
+    data = view.paginator.get_paginated_response(serializer.data).data
+    return json_response(select_fields(request, data, paginated=True))
+
+
+async def module_detail(request, pk):
+    module_id = parse_module_id(pk)
+    progress = module_progress(await module_progress_query(request.user, module_id).afirst())
+    version, modified = await module_cache.aget_module_validators(module_id)
+    progress, etag, last_modified = module_detail_validators(request, module_id, version, modified, progress)
+
+    async def build_response():
+        data = dict(await aget_cached_module_tree(module_id, sees_answers(request.user)))
+        data['progress'] = progress['progress'] if progress else 0
+        return json_response(select_fields(request, data))
+
+    return await aconditional_response(request, etag, last_modified, build_response)
+
+
+async def module_pages(request, pk):
+    module_id = parse_module_id(pk)
+    if is_conditional(request) and not await Module.objects.filter(pk=module_id).aexists():
+        raise Http404
+    version, modified = await module_cache.aget_module_validators(module_id)
+    answers = sees_answers(request.user)
+
+    async def build_response():
+        return json_response(select_fields(request, (await aget_cached_module_tree(module_id, answers))['pages']))
+
+    etag = make_etag('pages', module_id, version, *(['answers'] if answers else []))
+    return await aconditional_response(request, etag, modified, build_response)
+
+
+async def progress_list(request):
+    if progress_buffer.has_pending(request.user.pk):
+        await sync_to_async(progress_buffer.flush)(user_id=request.user.pk)
+    queryset = UserProgress.objects.filter(user=request.user)
+    state = await queryset.aaggregate(**UserProgressViewSet.progress_state)
+    etag, last_modified = progress_list_validators(request, state)
+
+    async def build_response():
+        return json_response(select_fields(request, await representations.aprogress_list(queryset)))
+
+    return await aconditional_response(request, etag, last_modified, build_response)
+
+
+async def me(request):
+    user = await User.objects.aget(pk=request.user.pk)
+    return json_response(UserSerializer(user).data)
@@ -0,0 +1,118 @@
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+# User fields embedded in issued tokens; together with the id they are
+# enough for the permission checks on the catalog and progress endpoints
+CLAIM_FIELDS = ('email', 'is_admin', 'is_superuser')
+AUTH_TIME_CLAIM = 'auth_time'
+
+
+def get_cache():
+    return caches[getattr(settings, 'AUTH_CACHE_ALIAS', 'default')]
+
+
+def add_user_claims(token, user):
+    for field in CLAIM_FIELDS:
+        token[field] = getattr(user, field)
+    # Copied into access tokens minted from this refresh token, so revoking
+    # by login time also covers refreshed tokens
+    token[AUTH_TIME_CLAIM] = token['iat']
+    return token
+
+
+def _revocation_timeout():
+    return int(jwt_settings.REFRESH_TOKEN_LIFETIME.total_seconds())
+
+
+def revoke_user_tokens(user_id):
+    """Reject every token issued to the user so far, e.g. after a password or role change."""
+    # Whole seconds like iat, so a login right after the change is accepted
+    get_cache().set(f'auth:revoked-before:{user_id}', int(time.time()), _revocation_timeout())
+
+
+def revoke_token(token):
+    remaining = max(1, int(token['exp'] - time.time()))
+    get_cache().set(f"auth:revoked-jti:{token['jti']}", True, remaining)
+
+
+def is_revoked(token):
+    user_id = token.get(jwt_settings.USER_ID_CLAIM)
+    jti_key = f"auth:revoked-jti:{token.get('jti')}"
+    user_key = f'auth:revoked-before:{user_id}'
+    revoked = get_cache().get_many([jti_key, user_key])
+    if revoked.get(jti_key):
+        return True
+    revoked_before = revoked.get(user_key)
+    issued_at = token.get(AUTH_TIME_CLAIM, token.get('iat'))
+    return revoked_before is not None and issued_at is not None and issued_at < revoked_before
+
+
+def claims_user_enabled():
+    return getattr(settings, 'JWT_CLAIMS_USER', False)
+
+
+def load_full_user(user):
+    """Return ``user`` with every field loaded, fetching it when built from token claims."""
+    if user.get_deferred_fields():
+        return type(user)._default_manager.get(pk=user.pk)
+    return user
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication with a cache-backed revocation check. With
+    settings.JWT_CLAIMS_USER enabled, ``request.user`` is built from the
+    token claims instead of a SELECT: a User instance with only the claimed
+    fields loaded, so the rest are fetched on first access and save() only
+    writes the loaded fields.
+    """
+
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        if is_revoked(token):
+            raise AuthenticationFailed(_('Token has been revoked'), code='token_revoked')
+        return token
+
+    def uses_claims(self, validated_token):
+        return claims_user_enabled() and all(field in validated_token for field in CLAIM_FIELDS)
+
+    def get_user(self, validated_token):
+        if not self.uses_claims(validated_token):
+            # Tokens issued before the claims were added take the DB path
+            return super().get_user(validated_token)
+
+        user_model = get_user_model()
+        claims = {field: validated_token[field] for field in CLAIM_FIELDS}
+        claims[jwt_settings.USER_ID_FIELD] = validated_token[jwt_settings.USER_ID_CLAIM]
+        # Deactivating a user revokes their tokens
+        claims['is_active'] = True
+        # from_db expects values in model field order
+        fields = [field for field in user_model._meta.concrete_fields if field.name in claims]
+        return user_model.from_db(
+            router.db_for_read(user_model),
+            [field.attname for field in fields],
+            [claims[field.name] for field in fields],
+        )
+
+    async def aauthenticate(self, request):
+        """authenticate() for async views; takes a plain Django request."""
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        # The revocation check reads the cache, a blocking call
+        validated_token = await sync_to_async(self.get_validated_token)(raw_token)
+        if self.uses_claims(validated_token):
+            return self.get_user(validated_token), validated_token
+        return await sync_to_async(self.get_user)(validated_token), validated_token
@@ -0,0 +1,78 @@
+import statistics
+import time
+
+from django.test.utils import override_settings
+from django.urls import include, path
+from rest_framework.test import APIClient
+
+# Bypass the module tree cache so measured requests reach the database
+UNCACHED = override_settings(
+    CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'uncached': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+    },
+    MODULE_CACHE_ALIAS='uncached',
+)
+
+
+class AsyncReadURLConf:
+    # The project URLs with the async read views in front, as ASYNC_READ_VIEWS=true builds them
+    urlpatterns = [
+        path('api/', include('api.async_urls')),
+        path('api/', include('api.urls')),
+    ]
+
+
+ASYNC_READS = override_settings(ROOT_URLCONF=AsyncReadURLConf)
+
+
+def hot_endpoints(module, user):
+    """(name, method, url, data) for the requests the frontend issues most."""
+    return [
+        ('ModuleViewSet.list', 'get', '/api/modules/', {}),
+        ('ModuleViewSet.list ?category', 'get', '/api/modules/', {'category': module.category}),
+        ('ModuleViewSet.list ?ordering=-updated_at', 'get', '/api/modules/', {'ordering': '-updated_at'}),
+        ('ModuleViewSet.retrieve', 'get', f'/api/modules/{module.id}/', {}),
+        ('ModuleViewSet.pages', 'get', f'/api/modules/{module.id}/pages/', {}),
+        ('ModuleViewSet.saved', 'get', '/api/modules/saved/', {}),
+        ('UserProgressViewSet.list', 'get', '/api/progress/', {}),
+        ('UserProgressViewSet.by_module', 'put', f'/api/progress/by-module/{module.id}/', {'progress': 10}),
+    ]
+
+
+def api_client(user=None):
+    client = APIClient(SERVER_NAME='localhost')
+    if user is not None:
+        client.force_authenticate(user)
+    return client
+
+
+def request(client, method, url, data=None):
+    return getattr(client, method)(url, data or {}, format=None if method == 'get' else 'json')
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples_ms):
+    return {
+        'count': len(samples_ms),
+        'p50_ms': round(percentile(samples_ms, 50), 3),
+        'p95_ms': round(percentile(samples_ms, 95), 3),
+        'p99_ms': round(percentile(samples_ms, 99), 3),
+        'mean_ms': round(statistics.fmean(samples_ms), 3) if samples_ms else 0.0,
+    }
+
+
+def time_ms(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
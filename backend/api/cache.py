@@ -0,0 +1,166 @@
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .routers import use_primary
+
+HITS_KEY = 'module_cache:hits'
+MISSES_KEY = 'module_cache:misses'
+MODULE_COUNT_KEY = 'module_cache:count'
+
+
+def get_cache():
+    return caches[getattr(settings, 'MODULE_CACHE_ALIAS', 'default')]
+
+
+def _version_key(module_id):
+    return f'module:{module_id}:version'
+
+
+def _modified_key(module_id):
+    return f'module:{module_id}:modified'
+
+
+def _tree_key(module_id, version, answers=False):
+    return f"module:{module_id}:tree{':answers' if answers else ''}:{version}"
+
+
+def _answer_key_key(module_id, version):
+    return f'module:{module_id}:answer_key:{version}'
+
+
+def _incr(cache, key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Evicted again or a backend that stores nothing; counters are best effort
+        return None
+
+
+def get_module_validators(module_id):
+    """Return the module's content version and the unix time it last changed."""
+    cache = get_cache()
+    keys = [_version_key(module_id), _modified_key(module_id)]
+    values = cache.get_many(keys)
+    if len(values) < 2:
+        # Seed from the clock so a version lost to eviction never reuses an old key
+        now = time.time_ns()
+        cache.add(keys[0], now, timeout=None)
+        cache.add(keys[1], now / 1e9, timeout=None)
+        values = cache.get_many(keys)
+    return values.get(keys[0]), values.get(keys[1], time.time())
+
+
+def get_module_version(module_id):
+    return get_module_validators(module_id)[0]
+
+
+def bump_module_version(module_id):
+    cache = get_cache()
+    cache.set(_modified_key(module_id), time.time(), timeout=None)
+    try:
+        return cache.incr(_version_key(module_id))
+    except ValueError:
+        version = time.time_ns()
+        cache.set(_version_key(module_id), version, timeout=None)
+        return version
+
+
+def invalidate_module(module_id):
+    bump_module_version(module_id)
+    # Bump again once the write is visible, so a reader that rebuilt the tree
+    # from pre-commit rows can't keep serving it under the current version
+    transaction.on_commit(lambda: bump_module_version(module_id))
+
+
+def _lookup_tree(module_id, answers):
+    cache = get_cache()
+    key = _tree_key(module_id, get_module_version(module_id), answers)
+    tree = cache.get(key)
+    _incr(cache, MISSES_KEY if tree is None else HITS_KEY)
+    return key, tree
+
+
+def _store_tree(key, tree):
+    get_cache().set(key, tree, getattr(settings, 'MODULE_CACHE_TIMEOUT', 3600))
+
+
+def get_module_tree(module_id, build, answers=False):
+    """
+    Return the cached user-independent representation of a module, building
+    it on a miss. The variant with quiz answers is cached separately.
+    """
+    key, tree = _lookup_tree(module_id, answers)
+    if tree is None:
+        # Cached values outlive replica lag, so they are built from the primary
+        with use_primary():
+            tree = build()
+        _store_tree(key, tree)
+    return tree
+
+
+async def aget_module_validators(module_id):
+    return await sync_to_async(get_module_validators)(module_id)
+
+
+async def aget_module_tree(module_id, build, answers=False):
+    """get_module_tree() for async views, where ``build`` is a coroutine function."""
+    # Django's cache backends have no native async API (their a* methods are
+    # thread hops too), so each blocking step is one hop
+    key, tree = await sync_to_async(_lookup_tree)(module_id, answers)
+    if tree is None:
+        with use_primary():
+            tree = await build()
+        await sync_to_async(_store_tree)(key, tree)
+    return tree
+
+
+def get_answer_key(module_id, build):
+    """Return the module's cached quiz answer key, building it on a miss; option edits bump the version."""
+    cache = get_cache()
+    key = _answer_key_key(module_id, get_module_version(module_id))
+    answer_key = cache.get(key)
+    if answer_key is None:
+        with use_primary():
+            answer_key = build()
+        cache.set(key, answer_key, getattr(settings, 'MODULE_CACHE_TIMEOUT', 3600))
+    return answer_key
+
+
+def get_module_count(count):
+    """Return the number of modules in the catalog, calling ``count`` on a miss."""
+    cache = get_cache()
+    value = cache.get(MODULE_COUNT_KEY)
+    if value is None:
+        with use_primary():
+            value = count()
+        cache.set(MODULE_COUNT_KEY, value, getattr(settings, 'MODULE_CACHE_TIMEOUT', 3600))
+    return value
+
+
+def invalidate_module_count():
+    get_cache().delete(MODULE_COUNT_KEY)
+    transaction.on_commit(lambda: get_cache().delete(MODULE_COUNT_KEY))
+
+
+def get_stats():
+    cache = get_cache()
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / total if total else 0,
+    }
+
+
+def reset_stats():
+    get_cache().delete_many([HITS_KEY, MISSES_KEY])
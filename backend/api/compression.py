@@ -0,0 +1,170 @@
+import zlib
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+DEFAULTS = {
+    'ENABLED': True,
+    # Smaller bodies are sent as they are: the saving would be a few bytes
+    # and the header overhead eats most of it
+    'MIN_LENGTH': 1024,
+    # Server preference among the encodings the client accepts equally;
+    # br and zstd only once their packages are installed
+    'ENCODINGS': ['zstd', 'br', 'gzip'],
+    # Level 6 costs three times the CPU of 4 for about 10% fewer bytes on a
+    # module tree (benchmark_compression)
+    'GZIP_LEVEL': 4,
+    'BROTLI_QUALITY': 4,
+    'ZSTD_LEVEL': 3,
+    # HTML is left out: the browsable API and admin pages carry CSRF tokens,
+    # which compression would expose to BREACH
+    'CONTENT_TYPES': [
+        'application/json',
+        'application/x-ndjson',
+        'text/plain',
+        'text/css',
+        'text/javascript',
+        'application/javascript',
+    ],
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'RESPONSE_COMPRESSION', {})}
+
+
+def _gzip(config):
+    compressor = zlib.compressobj(config['GZIP_LEVEL'], zlib.DEFLATED, 31)
+    return compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+
+def _brotli(config):
+    compressor = brotli.Compressor(quality=config['BROTLI_QUALITY'])
+    return compressor.process, compressor.flush, compressor.finish
+
+
+def _zstd(config):
+    compressor = zstandard.ZstdCompressor(level=config['ZSTD_LEVEL']).compressobj()
+    return compressor.compress, lambda: compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK), compressor.flush
+
+
+# Each returns (compress, flush, finish): flush ends a block the client can
+# decode right away, finish ends the stream
+CODECS = {'gzip': _gzip}
+if brotli is not None:
+    CODECS['br'] = _brotli
+if zstandard is not None:
+    CODECS['zstd'] = _zstd
+
+
+def available_encodings(config=None):
+    config = config or get_config()
+    return [encoding for encoding in config['ENCODINGS'] if encoding in CODECS]
+
+
+def parse_accept_encoding(header):
+    accepted = {}
+    for item in header.split(','):
+        name, _, params = item.partition(';')
+        name = name.strip().lower()
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name:
+            accepted[name] = quality
+    return accepted
+
+
+def negotiate(header, encodings):
+    """The encoding to use for an Accept-Encoding header: the client's highest q, then ``encodings`` order."""
+    accepted = parse_accept_encoding(header)
+    best, best_key = None, None
+    for rank, encoding in enumerate(encodings):
+        quality = accepted.get(encoding, accepted.get('*', 0.0))
+        if quality > 0 and (best_key is None or (quality, -rank) > best_key):
+            best, best_key = encoding, (quality, -rank)
+    return best
+
+
+def compress(encoding, data, config=None):
+    compress_chunk, _, finish = CODECS[encoding](config or get_config())
+    return compress_chunk(data) + finish()
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Negotiated response compression (settings.RESPONSE_COMPRESSION): zstd,
+    br or gzip by Accept-Encoding, for textual content types and bodies of
+    at least MIN_LENGTH bytes. Streaming responses are compressed block by
+    block, flushing after each one so NDJSON exports still arrive
+    incrementally.
+    """
+
+    def __init__(self, get_response):
+        self.config = get_config()
+        if not self.config['ENABLED']:
+            raise MiddlewareNotUsed
+        self.encodings = available_encodings(self.config)
+        self.content_types = set(self.config['CONTENT_TYPES'])
+        super().__init__(get_response)
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding'):
+            return response
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type not in self.content_types:
+            return response
+        if not response.streaming and len(response.content) < self.config['MIN_LENGTH']:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''), self.encodings)
+        if encoding is None:
+            return response
+
+        compress_chunk, flush, finish = CODECS[encoding](self.config)
+        if response.streaming:
+            if response.is_async:
+                async def compressed_stream(content):
+                    async for chunk in content:
+                        if chunk:
+                            yield compress_chunk(chunk) + flush()
+                    yield finish()
+            else:
+                def compressed_stream(content):
+                    for chunk in content:
+                        if chunk:
+                            yield compress_chunk(chunk) + flush()
+                    yield finish()
+            response.streaming_content = compressed_stream(response.streaming_content)
+            del response['Content-Length']
+        else:
+            compressed = compress_chunk(response.content) + finish()
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        # The body differs byte for byte from the identity encoding, so a strong ETag would be wrong
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,54 @@
+import hashlib
+import math
+
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+
+def make_etag(*parts):
+    digest = hashlib.md5(':'.join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def is_conditional(request):
+    return 'HTTP_IF_NONE_MATCH' in request.META or 'HTTP_IF_MODIFIED_SINCE' in request.META
+
+
+def conditional_response(request, etag, last_modified, build_response):
+    """
+    Answer a GET with 304 when the client's validators still match, otherwise
+    build the response. ``last_modified`` is a unix timestamp or None, and both
+    validators must be computed without serializing the body.
+    """
+    last_modified = _http_seconds(last_modified)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = build_response()
+    return _add_validators(response, etag, last_modified)
+
+
+async def aconditional_response(request, etag, last_modified, build_response):
+    """conditional_response() for async views, where ``build_response`` is a coroutine function."""
+    last_modified = _http_seconds(last_modified)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = await build_response()
+    return _add_validators(response, etag, last_modified)
+
+
+def _http_seconds(last_modified):
+    # HTTP dates have whole seconds. Rounding up keeps a change later in the
+    # same second as a client's If-Modified-Since from answering 304
+    return math.ceil(last_modified) if last_modified is not None else None
+
+
+def _add_validators(response, etag, last_modified):
+    if response.status_code in (200, 304):
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+    # Representations include the requesting user's data, and browsers must
+    # revalidate rather than reuse them heuristically
+    patch_vary_headers(response, ['Authorization'])
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
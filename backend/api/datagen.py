@@ -0,0 +1,155 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.utils import timezone
+
+from .models import Module, Page, QuizOption, User, UserProgress
+from .ordering import spaced_rank
+
+BATCH_SIZE = 5000
+BENCH_EMAIL = 'bench-{}@example.com'
+BENCH_PASSWORD = 'bench-password'
+
+WORDS = (
+    'learn practice basic advanced guide intro lesson skill quick deep theory example '
+    'method tool step project habit review test idea pattern craft focus daily'
+).split()
+# Rarer subject terms, one per sentence, so text searches have selective words too
+TOPICS = [a + b + c for a in 'ka lo mi nu re sa ti vo ze pa du fi'.split()
+          for b in 'ba ko li mu ne ro si ta'.split() for c in 'nxlrsmdk']
+
+
+def _sentence(rng, words):
+    words = [rng.choice(WORDS) for _ in range(words - 1)]
+    words.insert(rng.randrange(len(words) + 1), rng.choice(TOPICS))
+    return ' '.join(words).capitalize() + '.'
+
+
+def _paragraphs(rng, count):
+    return '\n\n'.join(' '.join(_sentence(rng, rng.randint(6, 14)) for _ in range(5)) for _ in range(count))
+
+
+def generate_dataset(
+    users=100,
+    modules_per_category=10,
+    pages_per_module=8,
+    quiz_ratio=0.25,
+    options_per_quiz=4,
+    progress_density=0.3,
+    saved_density=0.05,
+    seed=0,
+    password=BENCH_PASSWORD,
+    progress_rows=None,
+    log=None,
+):
+    """
+    Bulk-insert a synthetic catalog and user base. ``progress_density`` is the
+    share of (user, module) pairs with a progress row; ``progress_rows`` caps
+    the total instead. Every user shares one password hash so logins work
+    without hashing per row. Returns the created row counts.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    log = log or (lambda message: None)
+
+    log('Creating modules...')
+    modules = []
+    for category, _ in Module.CATEGORY_CHOICES:
+        for i in range(modules_per_category):
+            modules.append(Module(
+                title=f'{category} {_sentence(rng, 3)[:-1]} {i + 1}',
+                description=_paragraphs(rng, rng.randint(1, 4)),
+                category=category,
+            ))
+    modules = Module.objects.bulk_create(modules, batch_size=BATCH_SIZE)
+    # auto_now_add stamps the whole batch with one instant; spread it out for realistic cursors
+    for module in modules:
+        module.created_at = now - timedelta(seconds=rng.randrange(86400 * 365))
+        module.updated_at = module.created_at + timedelta(seconds=rng.randrange(86400 * 30))
+    Module.objects.bulk_update(modules, ['created_at', 'updated_at'], batch_size=BATCH_SIZE)
+
+    log('Creating pages...')
+    pages = Page.objects.bulk_create(
+        (
+            Page(
+                module=module,
+                type='quiz' if rng.random() < quiz_ratio else 'text',
+                content=_paragraphs(rng, rng.randint(1, 3)),
+                rank=spaced_rank(position),
+            )
+            for module in modules for position in range(pages_per_module)
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    QuizOption.objects.bulk_create(
+        (
+            QuizOption(page=page, text=_sentence(rng, 4), is_correct=option == 0)
+            for page in pages if page.type == 'quiz' for option in range(options_per_quiz)
+        ),
+        batch_size=BATCH_SIZE,
+    )
+
+    log('Creating users...')
+    password_hash = make_password(password)
+    start = User.objects.filter(email__startswith='bench-').count()
+    users = User.objects.bulk_create(
+        (
+            User(
+                email=BENCH_EMAIL.format(start + i),
+                password=password_hash,
+                first_name='Bench',
+                last_name=str(start + i),
+            )
+            for i in range(users)
+        ),
+        batch_size=BATCH_SIZE,
+    )
+
+    log('Creating progress...')
+    module_pages = {}
+    for page in pages:
+        module_pages.setdefault(page.module_id, []).append(page.id)
+    per_user = round(len(modules) * progress_density)
+    if progress_rows is not None and users:
+        per_user = progress_rows // len(users)
+    per_user = max(0, min(len(modules), per_user))
+
+    # bulk_upsert keeps the generated updated_at, which auto_now would overwrite
+    progress_count = 0
+    batch = []
+    for user in users:
+        for module in rng.sample(modules, per_user):
+            page_ids = module_pages.get(module.id)
+            batch.append((
+                user.id,
+                module.id,
+                rng.choice([rng.uniform(0, 100), 100.0]),
+                rng.choice(page_ids) if page_ids else None,
+                now - timedelta(seconds=rng.randrange(86400 * 90)),
+            ))
+        if len(batch) >= BATCH_SIZE:
+            UserProgress.objects.bulk_upsert(batch)
+            progress_count += len(batch)
+            batch = []
+    UserProgress.objects.bulk_upsert(batch)
+    progress_count += len(batch)
+
+    saved_per_user = max(0, min(len(modules), round(len(modules) * saved_density)))
+    Saved = User.saved_modules.through
+    saved = Saved.objects.bulk_create(
+        (
+            Saved(user_id=user.id, module_id=module.id)
+            for user in users for module in rng.sample(modules, saved_per_user)
+        ),
+        batch_size=BATCH_SIZE,
+    )
+
+    return {
+        'users': len(users),
+        'modules': len(modules),
+        'pages': len(pages),
+        'quiz_options': sum(options_per_quiz for page in pages if page.type == 'quiz'),
+        'progress': progress_count,
+        'saved': len(saved),
+    }
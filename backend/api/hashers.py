@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.contrib.auth import hashers
+
+# Django's hashers with their cost read from settings.PASSWORD_HASH_COST at
+# call time. They keep Django's algorithm names, so stored hashes stay
+# valid; a hash made with another algorithm or cost is upgraded on the
+# user's next successful login by check_password().
+
+
+def _cost(name, default):
+    return getattr(settings, 'PASSWORD_HASH_COST', {}).get(name, default)
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    @property
+    def iterations(self):
+        return _cost('PBKDF2_ITERATIONS', hashers.PBKDF2PasswordHasher.iterations)
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    @property
+    def time_cost(self):
+        return _cost('ARGON2_TIME_COST', hashers.Argon2PasswordHasher.time_cost)
+
+    @property
+    def memory_cost(self):
+        return _cost('ARGON2_MEMORY_COST', hashers.Argon2PasswordHasher.memory_cost)
+
+    @property
+    def parallelism(self):
+        return _cost('ARGON2_PARALLELISM', hashers.Argon2PasswordHasher.parallelism)
+
+
+class BCryptSHA256PasswordHasher(hashers.BCryptSHA256PasswordHasher):
+    @property
+    def rounds(self):
+        return _cost('BCRYPT_ROUNDS', hashers.BCryptSHA256PasswordHasher.rounds)
+
+
+class ScryptPasswordHasher(hashers.ScryptPasswordHasher):
+    @property
+    def work_factor(self):
+        return _cost('SCRYPT_WORK_FACTOR', hashers.ScryptPasswordHasher.work_factor)
+
@@ -0,0 +1,161 @@
+import json
+import random
+import time
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from api.benchmarks import UNCACHED, api_client, request, summarize
+from api.datagen import BENCH_PASSWORD, generate_dataset
+from api.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay the frontend call mix (login, catalog, module, pages, progress, '
+        'save/unsave) against the API and report latency and query counts per '
+        'endpoint, and the overall throughput.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sessions', type=int, default=50,
+                            help='Simulated learner visits to replay')
+        parser.add_argument('--pages-per-visit', type=int, default=5,
+                            help='Progress updates sent per module visit')
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--password', default=BENCH_PASSWORD)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--uncached', action='store_true',
+                            help='Bypass the module tree cache')
+        parser.add_argument('--generate', action='store_true',
+                            help='Generate a default dataset first and roll everything back afterwards')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument('--compare', help='Previous JSON results to compare against')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.samples = {}
+
+        with transaction.atomic():
+            if options['generate']:
+                generate_dataset(password=options['password'], seed=options['seed'])
+            emails = list(User.objects.filter(email__startswith='bench-').values_list('email', flat=True))
+            if not emails:
+                raise CommandError('No benchmark users found; run generate_data or pass --generate.')
+
+            with UNCACHED if options['uncached'] else nullcontext():
+                for _ in range(options['warmup']):
+                    self.visit(self.rng.choice(emails), options)
+                self.samples = {}
+                started = time.perf_counter()
+                for _ in range(options['sessions']):
+                    self.visit(self.rng.choice(emails), options)
+                elapsed = time.perf_counter() - started
+            # Progress and saves written by the replay are not kept
+            transaction.set_rollback(True)
+
+        results = self.results(elapsed, options)
+        self.report(results)
+        if options['compare']:
+            with open(options['compare']) as fh:
+                self.compare(json.load(fh), results)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(results, fh, indent=2)
+
+    def call(self, client, name, method, url, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = request(client, method, url, data)
+            elapsed = (time.perf_counter() - started) * 1000
+        sample = self.samples.setdefault(name, {'ms': [], 'queries': [], 'errors': 0})
+        sample['ms'].append(elapsed)
+        sample['queries'].append(len(queries))
+        if response.status_code >= 400:
+            sample['errors'] += 1
+        return response
+
+    def visit(self, email, options):
+        """One learner visit, in the order the frontend issues its requests."""
+        client = api_client()
+        response = self.call(client, 'login', 'post', '/api/token/', {
+            'email': email, 'password': options['password'],
+        })
+        if response.status_code != 200:
+            raise CommandError(f'Login failed for {email}; check --password.')
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.json()['access']}")
+
+        modules = self.call(client, 'modules.list', 'get', '/api/modules/').json()['results']
+        if not modules:
+            raise CommandError('No modules to benchmark against.')
+        self.call(client, 'modules.saved', 'get', '/api/modules/saved/')
+        module_id = self.rng.choice(modules)['id']
+        self.call(client, 'modules.retrieve', 'get', f'/api/modules/{module_id}/')
+        pages = self.call(client, 'modules.pages', 'get', f'/api/modules/{module_id}/pages/').json()
+
+        for position, page in enumerate(pages[:options['pages_per_visit']]):
+            self.call(client, 'progress.update', 'put', f'/api/progress/by-module/{module_id}/', {
+                'progress': round((position + 1) / len(pages) * 100, 2),
+                'last_page_viewed': page['id'],
+                'monotonic': True,
+            })
+
+        if self.rng.random() < 0.3:
+            self.call(client, 'modules.save', 'post', f'/api/modules/{module_id}/save/')
+            self.call(client, 'modules.unsave', 'post', f'/api/modules/{module_id}/unsave/')
+
+    def results(self, elapsed, options):
+        endpoints = {}
+        for name, sample in self.samples.items():
+            stats = summarize(sample['ms'])
+            stats['queries_mean'] = round(sum(sample['queries']) / len(sample['queries']), 2)
+            stats['queries_max'] = max(sample['queries'])
+            stats['errors'] = sample['errors']
+            endpoints[name] = stats
+        requests = sum(len(sample['ms']) for sample in self.samples.values())
+        return {
+            'timestamp': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'cached': not options['uncached'],
+            'sessions': options['sessions'],
+            'requests': requests,
+            'seconds': round(elapsed, 3),
+            'throughput_rps': round(requests / elapsed, 1) if elapsed else 0,
+            'endpoints': endpoints,
+        }
+
+    def report(self, results):
+        self.stdout.write(
+            f"{'endpoint':18} {'count':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+            f"{'queries':>8} {'errors':>6}"
+        )
+        for name, stats in results['endpoints'].items():
+            self.stdout.write(
+                f"{name:18} {stats['count']:>6} {stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} "
+                f"{stats['p99_ms']:>8.2f} {stats['queries_mean']:>8.1f} {stats['errors']:>6}"
+            )
+        self.stdout.write(
+            f"{results['requests']} requests in {results['seconds']:.2f}s "
+            f"({results['throughput_rps']:.1f} req/s)"
+        )
+
+    def compare(self, baseline, results):
+        self.stdout.write(f"\nvs {baseline['timestamp']}")
+        self.stdout.write(f"{'endpoint':18} {'p50':>10} {'p95':>10} {'queries':>10}")
+        for name, stats in results['endpoints'].items():
+            previous = baseline['endpoints'].get(name)
+            if previous is None:
+                continue
+            self.stdout.write(
+                f"{name:18} {self.delta(previous['p50_ms'], stats['p50_ms']):>10} "
+                f"{self.delta(previous['p95_ms'], stats['p95_ms']):>10} "
+                f"{stats['queries_mean'] - previous['queries_mean']:>+10.1f}"
+            )
+
+    def delta(self, before, after):
+        if not before:
+            return 'n/a'
+        return f'{(after - before) / before * 100:+.1f}%'
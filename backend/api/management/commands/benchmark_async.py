@@ -0,0 +1,123 @@
+import asyncio
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client, override_settings
+
+from api.benchmarks import ASYNC_READS, summarize
+from api.models import Module, User
+from api.serializers import CustomTokenObtainPairSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay concurrent learners against the read endpoints: the sync views '
+        'behind a WSGI-style thread pool, then the async views under ASGI. '
+        'Needs data from generate_data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--learners', type=int, default=1000,
+                            help='Concurrent simulated learners')
+        parser.add_argument('--threads', type=int, default=32,
+                            help='WSGI worker threads')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--json', help='Also write the results to this file')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        users = list(User.objects.filter(email__startswith='bench-')[:options['learners']])
+        module_ids = list(Module.objects.values_list('id', flat=True))
+        if not users or not module_ids:
+            raise CommandError('No benchmark data; run generate_data first.')
+
+        self.sessions = []
+        for i in range(options['learners']):
+            user = users[i % len(users)]
+            token = CustomTokenObtainPairSerializer.get_token(user).access_token
+            self.sessions.append((f'Bearer {token}', rng.choice(module_ids)))
+
+        # The test clients always send Host: testserver
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            results = {
+                'learners': options['learners'],
+                'wsgi': self.run_wsgi(options['threads']),
+                'asgi': asyncio.run(self.run_asgi()),
+            }
+        results['wsgi']['threads'] = options['threads']
+        self.report(results)
+        if options['json']:
+            with open(options['json'], 'w') as fh:
+                json.dump(results, fh, indent=2)
+
+    def urls(self, module_id):
+        # What a learner opening a module loads
+        return [
+            '/api/users/me/',
+            '/api/modules/',
+            f'/api/modules/{module_id}/',
+            f'/api/modules/{module_id}/pages/',
+            '/api/progress/',
+        ]
+
+    def run_wsgi(self, threads):
+        def learner(session):
+            authorization, module_id = session
+            client = Client(headers={'Authorization': authorization})
+            samples = []
+            for url in self.urls(module_id):
+                started = time.perf_counter()
+                response = client.get(url)
+                samples.append(((time.perf_counter() - started) * 1000, response.status_code))
+            connections.close_all()
+            return samples
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            samples = [sample for result in pool.map(learner, self.sessions) for sample in result]
+        return self.summarize(samples, time.perf_counter() - started)
+
+    async def run_asgi(self):
+        async def learner(session):
+            authorization, module_id = session
+            client = AsyncClient()
+            headers = {'Authorization': authorization}
+            samples = []
+            # One context per learner, as ASGIHandler creates per request
+            async with ThreadSensitiveContext():
+                for url in self.urls(module_id):
+                    started = time.perf_counter()
+                    response = await client.get(url, headers=headers)
+                    samples.append(((time.perf_counter() - started) * 1000, response.status_code))
+                await sync_to_async(connections.close_all)()
+            return samples
+
+        with ASYNC_READS:
+            started = time.perf_counter()
+            results = await asyncio.gather(*(learner(session) for session in self.sessions))
+            elapsed = time.perf_counter() - started
+        return self.summarize([sample for result in results for sample in result], elapsed)
+
+    def summarize(self, samples, elapsed):
+        stats = summarize([ms for ms, _ in samples])
+        stats['errors'] = sum(1 for _, status in samples if status >= 400)
+        stats['seconds'] = round(elapsed, 3)
+        stats['throughput_rps'] = round(len(samples) / elapsed, 1)
+        return stats
+
+    def report(self, results):
+        self.stdout.write(f"{results['learners']} concurrent learners")
+        self.stdout.write(
+            f"{'server':6} {'requests':>9} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}"
+        )
+        for server in ('wsgi', 'asgi'):
+            stats = results[server]
+            self.stdout.write(
+                f"{server:6} {stats['count']:>9} {stats['throughput_rps']:>8.1f} {stats['p50_ms']:>9.2f} "
+                f"{stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f} {stats['errors']:>7}"
+            )
@@ -0,0 +1,129 @@
+import json
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.benchmarks import api_client, percentile
+from api.compression import available_encodings, compress, get_config
+from api.datagen import TOPICS, WORDS
+from api.models import Module, Page, QuizOption, User, UserProgress
+
+STRUCTURE_FIELDS = 'id,title,category,progress,pages.id,pages.type,pages.order,pages.quiz_options'
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure response bytes per endpoint with and without ?fields=, and the size and CPU '
+        'time of each available compression encoding. Works on rows it creates and rolls back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=100,
+                            help='Pages in the benchmark module (a quarter of them quizzes)')
+        parser.add_argument('--content-bytes', type=int, default=4000,
+                            help='Approximate text per page')
+        parser.add_argument('--progress-rows', type=int, default=200)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--json', help='Also write the results to this file')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        config = get_config()
+        encodings = available_encodings(config)
+        with transaction.atomic():
+            module, user = self.create_rows(options)
+            client = api_client(user)
+            results = {'encodings': encodings, 'min_length': config['MIN_LENGTH'], 'endpoints': {}}
+            for name, url, params in self.endpoints(module):
+                body = client.get(url, params).content
+                wire = client.get(url, params, HTTP_ACCEPT_ENCODING=', '.join(encodings))
+                results['endpoints'][name] = {
+                    'identity_bytes': len(body),
+                    'wire_bytes': len(wire.content),
+                    'wire_encoding': wire.get('Content-Encoding', 'identity'),
+                    'encodings': {
+                        encoding: self.measure(encoding, body, config, options['repeat'])
+                        for encoding in encodings
+                    },
+                }
+            transaction.set_rollback(True)
+        self.report(results)
+        if options['json']:
+            with open(options['json'], 'w') as fh:
+                json.dump(results, fh, indent=2)
+
+    def text(self, size):
+        words = []
+        length = 0
+        while length < size:
+            word = self.rng.choice(TOPICS) if self.rng.random() < 0.3 else self.rng.choice(WORDS)
+            words.append(word)
+            length += len(word) + 1
+        return ' '.join(words)
+
+    def create_rows(self, options):
+        module = Module.objects.create(title='Compression benchmark', description=self.text(400))
+        pages = Page.objects.bulk_create([
+            Page(
+                module=module,
+                type='quiz' if i % 4 == 3 else 'text',
+                content=self.text(options['content_bytes']),
+                rank=i + 1,
+            )
+            for i in range(options['pages'])
+        ])
+        QuizOption.objects.bulk_create([
+            QuizOption(page=page, text=self.text(40), is_correct=o == 0)
+            for page in pages if page.type == 'quiz' for o in range(4)
+        ])
+        user = User.objects.create(email='benchmark-compression@example.com', first_name='B', last_name='C')
+        modules = Module.objects.bulk_create([
+            Module(title=f'Progress {i}', description=self.text(300)) for i in range(options['progress_rows'])
+        ])
+        UserProgress.objects.bulk_create([
+            UserProgress(user=user, module=m, progress=i % 101) for i, m in enumerate(modules)
+        ])
+        return module, user
+
+    def endpoints(self, module):
+        return [
+            ('ModuleViewSet.retrieve', f'/api/modules/{module.id}/', {}),
+            ('ModuleViewSet.retrieve ?fields', f'/api/modules/{module.id}/', {'fields': STRUCTURE_FIELDS}),
+            ('ModuleViewSet.pages', f'/api/modules/{module.id}/pages/', {}),
+            ('ModuleViewSet.pages ?fields', f'/api/modules/{module.id}/pages/', {'fields': 'id,type,order'}),
+            ('ModuleViewSet.list', '/api/modules/', {}),
+            ('ModuleViewSet.list ?fields', '/api/modules/', {'fields': 'id,title,category,progress'}),
+            ('UserProgressViewSet.list', '/api/progress/', {}),
+            ('UserProgressViewSet.list ?fields', '/api/progress/', {'fields': 'module,progress'}),
+        ]
+
+    def measure(self, encoding, body, config, repeat):
+        compressed = compress(encoding, body, config)
+        samples = []
+        for _ in range(repeat):
+            started = time.process_time()
+            compress(encoding, body, config)
+            samples.append((time.process_time() - started) * 1000)
+        cpu_ms = percentile(samples, 50)
+        return {
+            'bytes': len(compressed),
+            'ratio': round(len(body) / len(compressed), 2) if compressed else 0.0,
+            'cpu_p50_ms': round(cpu_ms, 3),
+            'mb_per_s': round(len(body) / 1e6 / (cpu_ms / 1000), 1) if cpu_ms else None,
+        }
+
+    def report(self, results):
+        self.stdout.write(f"encodings: {', '.join(results['encodings'])}; min length {results['min_length']} B")
+        self.stdout.write(f"{'endpoint':36} {'identity':>10} {'wire':>10}  encoding     bytes   ratio  cpu ms")
+        for name, endpoint in results['endpoints'].items():
+            self.stdout.write(
+                f"{name:36} {endpoint['identity_bytes']:>10} {endpoint['wire_bytes']:>10}  "
+                f"({endpoint['wire_encoding']})"
+            )
+            for encoding, stats in endpoint['encodings'].items():
+                self.stdout.write(
+                    f"{'':59}{encoding:8} {stats['bytes']:>8} {stats['ratio']:>7.2f} {stats['cpu_p50_ms']:>7.2f}"
+                )
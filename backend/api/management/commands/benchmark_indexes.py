@@ -0,0 +1,85 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from api.benchmarks import UNCACHED, api_client, hot_endpoints, request, summarize, time_ms
+from api.datagen import generate_dataset
+from api.models import Module, User, UserProgress
+
+# Indexes added for the hot query shapes (migration 0007), by model
+HOT_PATH_INDEXES = {
+    Module: ['api_module_category_idx', 'api_module_created_idx', 'api_module_updated_idx'],
+    UserProgress: ['api_progress_user_updated_idx'],
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Load a synthetic dataset inside a transaction, time the hot endpoints '
+        'without and with the hot-path indexes, then roll everything back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--modules-per-category', type=int, default=12)
+        parser.add_argument('--progress-rows', type=int, default=1000000)
+        parser.add_argument('--repeat', type=int, default=30)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--json', help='Also write the results to this file')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user, module = self.load(options)
+            results = {}
+            self.toggle_indexes(create=False)
+            results['before'] = self.measure(user, module, options['repeat'])
+            self.toggle_indexes(create=True)
+            results['after'] = self.measure(user, module, options['repeat'])
+            transaction.set_rollback(True)
+
+        self.report(results)
+        if options['json']:
+            with open(options['json'], 'w') as fh:
+                json.dump(results, fh, indent=2)
+
+    def load(self, options):
+        self.stdout.write(f"Inserting {options['progress_rows']} progress rows...")
+        generate_dataset(
+            users=options['users'],
+            modules_per_category=options['modules_per_category'],
+            pages_per_module=5,
+            progress_rows=options['progress_rows'],
+            seed=options['seed'],
+        )
+        user = User.objects.filter(email__startswith='bench-').order_by('-id').first()
+        module = Module.objects.order_by('-created_at')[Module.objects.count() // 2]
+        return user, module
+
+    def toggle_indexes(self, create):
+        # Plain DDL so it runs inside the benchmark's transaction on SQLite too
+        editor = connection.schema_editor(atomic=False)
+        for model, names in HOT_PATH_INDEXES.items():
+            indexes = {index.name: index for index in model._meta.indexes}
+            for index in (indexes[name] for name in names):
+                sql = index.create_sql(model, editor) if create else index.remove_sql(model, editor)
+                with connection.cursor() as cursor:
+                    cursor.execute(str(sql))
+
+    def measure(self, user, module, repeat):
+        client = api_client(user)
+        results = {}
+        with UNCACHED:
+            for name, method, url, data in hot_endpoints(module, user):
+                request(client, method, url, data)  # warm up
+                results[name] = summarize(time_ms(lambda: request(client, method, url, data), repeat))
+        return results
+
+    def report(self, results):
+        self.stdout.write(f"{'endpoint':45} {'before p50':>12} {'after p50':>12} {'speedup':>9}")
+        for name, before in results['before'].items():
+            after = results['after'][name]
+            speedup = before['p50_ms'] / after['p50_ms'] if after['p50_ms'] else 0
+            self.stdout.write(
+                f"{name:45} {before['p50_ms']:>10.2f}ms {after['p50_ms']:>10.2f}ms {speedup:>8.1f}x"
+            )
@@ -0,0 +1,86 @@
+import json
+import math
+
+from django.conf import settings
+from django.contrib.auth.hashers import get_hasher, make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils.module_loading import import_string
+
+from api.benchmarks import api_client, summarize, time_ms
+from api.models import User
+
+PASSWORD = 'benchmark-login-password'
+
+
+class Command(BaseCommand):
+    help = (
+        'Time password verification for each configured hasher at its configured '
+        'cost, then the full login endpoint, and estimate the workers needed for '
+        'a target login rate.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Verifications per hasher')
+        parser.add_argument('--requests', type=int, default=50,
+                            help='Login requests against /api/token/')
+        parser.add_argument('--target-rps', type=float, default=50,
+                            help='Peak logins per second to size workers for')
+        parser.add_argument('--json', help='Also write the results to this file')
+
+    def handle(self, *args, **options):
+        results = {'hashers': {}, 'preferred': get_hasher().algorithm}
+        for path in settings.PASSWORD_HASHERS:
+            hasher = import_string(path)()
+            try:
+                encoded = hasher.encode(PASSWORD, hasher.salt())
+            except ValueError as e:
+                # argon2-cffi / bcrypt not installed
+                self.stdout.write(f'{hasher.algorithm}: skipped ({e})')
+                continue
+            stats = summarize(time_ms(lambda: hasher.verify(PASSWORD, encoded), options['repeat']))
+            stats['verifies_per_core'] = round(1000 / stats['mean_ms'], 1)
+            stats['cost'] = hasher.safe_summary(encoded)
+            results['hashers'][hasher.algorithm] = stats
+
+        with transaction.atomic():
+            user = User.objects.create(
+                email='benchmark-login@example.com', password=make_password(PASSWORD),
+                first_name='Benchmark', last_name='Login',
+            )
+            client = api_client()
+            payload = {'email': user.email, 'password': PASSWORD}
+            with CaptureQueriesContext(connection) as queries:
+                samples = time_ms(lambda: client.post('/api/token/', payload, format='json'), options['requests'])
+            transaction.set_rollback(True)
+
+        login = summarize(samples)
+        login['queries_per_login'] = len(queries) / options['requests']
+        login['logins_per_worker'] = round(1000 / login['mean_ms'], 1)
+        # Synchronous workers each handle one login at a time
+        login['workers_for_target'] = math.ceil(options['target_rps'] / login['logins_per_worker'])
+        results['login'] = login
+
+        self.report(results, options['target_rps'])
+        if options['json']:
+            with open(options['json'], 'w') as fh:
+                json.dump(results, fh, indent=2)
+
+    def report(self, results, target_rps):
+        self.stdout.write(f"{'hasher':22} {'p50 ms':>8} {'p95 ms':>8} {'verifies/s/core':>16}  cost")
+        for algorithm, stats in results['hashers'].items():
+            cost = ', '.join(f'{key}={value}' for key, value in stats['cost'].items()
+                             if key not in ('algorithm', 'salt', 'hash'))
+            marker = '*' if algorithm == results['preferred'] else ' '
+            self.stdout.write(
+                f"{algorithm + marker:22} {stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} "
+                f"{stats['verifies_per_core']:>16.1f}  {cost}"
+            )
+        login = results['login']
+        self.stdout.write(
+            f"\nlogin ({results['preferred']}): p50 {login['p50_ms']:.2f}ms, p95 {login['p95_ms']:.2f}ms, "
+            f"{login['queries_per_login']:.1f} queries, {login['logins_per_worker']:.1f} logins/s per worker"
+        )
+        self.stdout.write(f"{login['workers_for_target']} workers for {target_rps:g} logins/s")
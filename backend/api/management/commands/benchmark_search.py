@@ -0,0 +1,105 @@
+import json
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from api.benchmarks import api_client, summarize, time_ms
+from api.datagen import TOPICS, WORDS, generate_dataset
+from api.models import Module, Page, User
+from api.search import ScanSearchBackend, get_backend, search_terms
+
+
+class Command(BaseCommand):
+    help = (
+        'Load a synthetic catalog inside a transaction, time module searches with '
+        'the full-text index against LIKE scans, then roll everything back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=100000)
+        parser.add_argument('--pages-per-module', type=int, default=20)
+        parser.add_argument('--queries', type=int, default=20,
+                            help='Distinct queries per query shape')
+        parser.add_argument('--scan-queries', type=int, default=5,
+                            help='Queries timed with LIKE scans, which are far slower')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--json', help='Also write the results to this file')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with transaction.atomic():
+            self.load(options)
+            shapes = {
+                'rare term': [rng.choice(TOPICS) for _ in range(options['queries'])],
+                'two terms': [f'{rng.choice(TOPICS)} {rng.choice(WORDS)}' for _ in range(options['queries'])],
+                'prefix': [rng.choice(TOPICS)[:4] for _ in range(options['queries'])],
+                'common term': [rng.choice(WORDS) for _ in range(options['queries'])],
+                # The worst case for a scan, which has to read every page
+                'no match': [f'zq{rng.randrange(10 ** 6)}' for _ in range(options['queries'])],
+            }
+            backends = {
+                'index': get_backend(),
+                'scan': ScanSearchBackend(connection),
+            }
+            results = {'pages': Page.objects.count(), 'modules': Module.objects.count(), 'shapes': {}}
+            for shape, queries in shapes.items():
+                results['shapes'][shape] = {
+                    name: self.measure(backend, queries if name == 'index' else queries[:options['scan_queries']])
+                    for name, backend in backends.items()
+                }
+            results['endpoint'] = self.measure_endpoint(shapes['two terms'])
+            transaction.set_rollback(True)
+
+        self.report(results)
+        if options['json']:
+            with open(options['json'], 'w') as fh:
+                json.dump(results, fh, indent=2)
+
+    def load(self, options):
+        self.stdout.write(f"Inserting {options['pages']} pages...")
+        categories = len(Module.CATEGORY_CHOICES)
+        generate_dataset(
+            users=1,
+            modules_per_category=max(1, options['pages'] // options['pages_per_module'] // categories),
+            pages_per_module=options['pages_per_module'],
+            progress_rows=0,
+            saved_density=0,
+            seed=options['seed'],
+        )
+        # Measure a settled index rather than one fragmented by the bulk load
+        get_backend().optimize()
+
+    def measure(self, backend, queries):
+        samples, hits = [], 0
+        for query in queries:
+            terms = search_terms(query)
+            started = time.perf_counter()
+            hits += len(backend.search(terms, limit=20))
+            samples.append((time.perf_counter() - started) * 1000)
+        stats = summarize(samples)
+        stats['avg_results'] = hits / len(queries)
+        return stats
+
+    def measure_endpoint(self, queries):
+        client = api_client(User.objects.filter(email__startswith='bench-').first())
+        return summarize([
+            sample for query in queries
+            for sample in time_ms(lambda: client.get('/api/modules/search/', {'q': query}), 1)
+        ])
+
+    def report(self, results):
+        self.stdout.write(f"{results['pages']} pages in {results['modules']} modules")
+        self.stdout.write(f"{'query':12} {'index p50':>11} {'index p95':>11} {'scan p50':>11} {'speedup':>9}")
+        for shape, stats in results['shapes'].items():
+            index, scan = stats['index'], stats['scan']
+            speedup = scan['p50_ms'] / index['p50_ms'] if index['p50_ms'] else 0
+            self.stdout.write(
+                f"{shape:12} {index['p50_ms']:>9.2f}ms {index['p95_ms']:>9.2f}ms "
+                f"{scan['p50_ms']:>9.2f}ms {speedup:>8.1f}x"
+            )
+        endpoint = results['endpoint']
+        self.stdout.write(
+            f"GET /api/modules/search/: p50 {endpoint['p50_ms']:.2f}ms, p95 {endpoint['p95_ms']:.2f}ms"
+        )
@@ -0,0 +1,112 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Prefetch
+from rest_framework.renderers import JSONRenderer
+
+from api import representations
+from api.benchmarks import summarize, time_ms
+from api.models import Module, Page, QuizOption, User, UserProgress
+from api.renderers import FastJSONRenderer, orjson
+from api.serializers import ModuleSerializer, UserProgressSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the DRF serializers against the .values() representations for a module '
+        'tree and a progress list, and JSONRenderer against FastJSONRenderer. Works on '
+        'rows it creates and rolls back; only serialization and rendering are timed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=1000,
+                            help='Pages in the module tree (half of them quizzes with 4 options)')
+        parser.add_argument('--progress-rows', type=int, default=1000,
+                            help='Rows in the progress list')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--json', help='Also write the results to this file')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            module, user = self.create_rows(options['pages'], options['progress_rows'])
+            results = {
+                'pages': options['pages'],
+                'progress_rows': options['progress_rows'],
+                'orjson': orjson is not None,
+                'module_tree': self.bench_tree(module, options['repeat']),
+                'progress_list': self.bench_progress(user, options['repeat']),
+            }
+            transaction.set_rollback(True)
+        self.report(results)
+        if options['json']:
+            with open(options['json'], 'w') as fh:
+                json.dump(results, fh, indent=2)
+
+    def create_rows(self, pages, progress_rows):
+        module = Module.objects.create(title='Serializer benchmark', description='Benchmark module')
+        created = Page.objects.bulk_create([
+            Page(module=module, type='quiz' if i % 2 else 'text', content=f'Page {i} ' * 20, rank=i + 1)
+            for i in range(pages)
+        ])
+        QuizOption.objects.bulk_create([
+            QuizOption(page=page, text=f'Option {o}', is_correct=o == 0)
+            for page in created if page.type == 'quiz' for o in range(4)
+        ])
+        user = User.objects.create(email='benchmark-serializers@example.com', first_name='B', last_name='S')
+        modules = Module.objects.bulk_create([
+            Module(title=f'Progress {i}', description='') for i in range(progress_rows)
+        ])
+        UserProgress.objects.bulk_create([
+            UserProgress(user=user, module=m, progress=i % 101) for i, m in enumerate(modules)
+        ])
+        return module, user
+
+    def bench(self, serialize, fast, repeat):
+        """Serialize and render each way; returns stats per variant."""
+        data = serialize()
+        assert JSONRenderer().render(fast()) == JSONRenderer().render(data)
+        return {
+            'drf_serializer': summarize(time_ms(serialize, repeat)),
+            'values_representation': summarize(time_ms(fast, repeat)),
+            'json_renderer': summarize(time_ms(lambda: JSONRenderer().render(data), repeat)),
+            'fast_renderer': summarize(time_ms(lambda: FastJSONRenderer().render(data), repeat)),
+        }
+
+    def bench_tree(self, module, repeat):
+        instance = Module.objects.prefetch_related(
+            Prefetch('pages', queryset=Page.objects.with_position().prefetch_related('quiz_options'))
+        ).get(pk=module.pk)
+        module_rows, page_rows, option_rows = representations.module_tree_querysets(module.pk)
+        rows = (module_rows.get(), list(page_rows), list(option_rows))
+        return self.bench(
+            lambda: ModuleSerializer(instance, context={'answers': False}).data,
+            lambda: representations.build_module_tree(*rows),
+            repeat,
+        )
+
+    def bench_progress(self, user, repeat):
+        instances = list(UserProgress.objects.filter(user=user))
+        rows = list(UserProgress.objects.filter(user=user).values(*representations.PROGRESS_FIELDS))
+
+        def fast():
+            datetime_repr = representations.datetime_formatter()
+            return [representations.progress_item(row, datetime_repr) for row in rows]
+
+        return self.bench(lambda: UserProgressSerializer(instances, many=True).data, fast, repeat)
+
+    def report(self, results):
+        self.stdout.write(f"orjson installed: {results['orjson']}")
+        for shape, size, unit in (
+            ('module_tree', results['pages'], 'pages'),
+            ('progress_list', results['progress_rows'], 'rows'),
+        ):
+            self.stdout.write(f'{shape} ({size} {unit})')
+            self.stdout.write(f"  {'variant':22} {'p50 ms':>9} {'ms/1k':>9} {'1k/s':>9}")
+            for variant, stats in results[shape].items():
+                per_thousand = stats['p50_ms'] * 1000 / size if size else 0.0
+                stats['ms_per_1k'] = round(per_thousand, 3)
+                self.stdout.write(
+                    f"  {variant:22} {stats['p50_ms']:>9.2f} {per_thousand:>9.2f} "
+                    f"{1000 / per_thousand if per_thousand else 0:>9.1f}"
+                )
@@ -0,0 +1,127 @@
+import json
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+
+from api.benchmarks import api_client, summarize
+from api.models import Module, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Stress the progress write path with concurrent writers against the configured '
+        'database and report throughput, latency and lock errors. Run it once per '
+        'DATABASE_PROFILE to compare them. Needs data from generate_data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', default='1,4,16',
+                            help='Comma-separated concurrent writer counts to run')
+        parser.add_argument('--readers', type=int, default=0,
+                            help='Threads reading the progress list alongside the writers')
+        parser.add_argument('--seconds', type=float, default=5.0,
+                            help='Duration of each run')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--json', help='Also write the results to this file')
+
+    def handle(self, *args, **options):
+        writer_counts = [int(count) for count in options['writers'].split(',')]
+        users = list(User.objects.filter(email__startswith='bench-')[:max(writer_counts) + options['readers']])
+        module_ids = list(Module.objects.values_list('id', flat=True))
+        if len(users) < max(writer_counts) + options['readers'] or not module_ids:
+            raise CommandError('Not enough benchmark data; run generate_data with more users.')
+
+        results = {'profile': self.describe_database(), 'runs': []}
+        connections.close_all()
+        for writers in writer_counts:
+            run = self.run(users[:writers], users[writers:writers + options['readers']], module_ids, options)
+            run['writers'] = writers
+            results['runs'].append(run)
+        self.report(results)
+        if options['json']:
+            with open(options['json'], 'w') as fh:
+                json.dump(results, fh, indent=2)
+
+    def describe_database(self):
+        profile = {
+            'name': settings.DATABASE_PROFILE,
+            'vendor': connection.vendor,
+            'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+        }
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                for pragma in ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size'):
+                    profile[pragma] = cursor.execute(f'PRAGMA {pragma}').fetchone()[0]
+        return profile
+
+    def run(self, writers, readers, module_ids, options):
+        deadline = time.perf_counter() + options['seconds']
+        samples, errors, reads = [], [], []
+        lock = threading.Lock()
+
+        def writer(user, seed):
+            rng = random.Random(seed)
+            client = api_client(user)
+            local_samples, local_errors = [], 0
+            while time.perf_counter() < deadline:
+                url = f'/api/progress/by-module/{rng.choice(module_ids)}/'
+                started = time.perf_counter()
+                try:
+                    response = client.put(url, {'progress': rng.randint(0, 100)}, format='json')
+                    ok = response.status_code == 200
+                except OperationalError:
+                    # "database is locked" and friends
+                    ok = False
+                if ok:
+                    local_samples.append((time.perf_counter() - started) * 1000)
+                else:
+                    local_errors += 1
+            connections.close_all()
+            with lock:
+                samples.extend(local_samples)
+                errors.append(local_errors)
+
+        def reader(user):
+            client = api_client(user)
+            count = 0
+            while time.perf_counter() < deadline:
+                try:
+                    client.get('/api/progress/')
+                    count += 1
+                except OperationalError:
+                    pass
+            connections.close_all()
+            with lock:
+                reads.append(count)
+
+        threads = [
+            threading.Thread(target=writer, args=(user, options['seed'] + i)) for i, user in enumerate(writers)
+        ] + [threading.Thread(target=reader, args=(user,)) for user in readers]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        stats = summarize(samples)
+        stats['errors'] = sum(errors)
+        stats['writes_per_second'] = round(len(samples) / elapsed, 1)
+        stats['reads'] = sum(reads)
+        return stats
+
+    def report(self, results):
+        profile = results['profile']
+        self.stdout.write(', '.join(f'{key}={value}' for key, value in profile.items()))
+        self.stdout.write(
+            f"{'writers':>7} {'writes':>8} {'writes/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}"
+        )
+        for run in results['runs']:
+            self.stdout.write(
+                f"{run['writers']:>7} {run['count']:>8} {run['writes_per_second']:>9.1f} {run['p50_ms']:>9.2f} "
+                f"{run['p95_ms']:>9.2f} {run['p99_ms']:>9.2f} {run['errors']:>7}"
+            )
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.test.utils import CaptureQueriesContext
+
+from api.benchmarks import UNCACHED, api_client, hot_endpoints, request
+from api.models import Module, User
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the API's hot endpoints and print the database's query plan "
+        "(EXPLAIN QUERY PLAN on SQLite, EXPLAIN on PostgreSQL) for every SQL "
+        "statement they issue. Writes are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='User id to issue requests as (default: first user)')
+        parser.add_argument('--module', type=int, help='Module id to inspect (default: first module)')
+
+    def handle(self, *args, **options):
+        connection = connections['default']
+        user = User.objects.filter(pk=options['user']).first() if options['user'] else User.objects.first()
+        module = Module.objects.filter(pk=options['module']).first() if options['module'] else Module.objects.first()
+        if user is None or module is None:
+            raise CommandError('Need at least one user and one module.')
+
+        client = api_client(user)
+        explain = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+
+        with UNCACHED:
+            for name, method, url, data in hot_endpoints(module, user):
+                self.stdout.write(self.style.MIGRATE_HEADING(f'{name}  {method.upper()} {url}'))
+                with transaction.atomic(using=connection.alias):
+                    with CaptureQueriesContext(connection) as queries:
+                        request(client, method, url, data)
+                    for query in queries.captured_queries:
+                        sql = query['sql']
+                        if sql.startswith(('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK')):
+                            continue
+                        self.stdout.write(f'  {sql}')
+                        with connection.cursor() as cursor:
+                            cursor.execute(explain + sql)
+                            for row in cursor.fetchall():
+                                self.stdout.write(f'    {row[-1]}')
+                    transaction.set_rollback(True, using=connection.alias)
@@ -0,0 +1,30 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from api import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream modules (with their pages and quiz options) or learner progress as NDJSON, '
+        'for import_ndjson in another environment or for analytics.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=['modules', 'progress'])
+        parser.add_argument('--module', type=int, action='append', dest='module_ids',
+                            help='Only this module; repeat for more (default: all)')
+        parser.add_argument('--output', help='Write to this file (default: stdout)')
+        parser.add_argument('--chunk-size', type=int, default=transfer.CHUNK_SIZE,
+                            help='Rows fetched from the database at a time')
+
+    def handle(self, *args, **options):
+        export = transfer.export_modules if options['kind'] == 'modules' else transfer.export_progress
+        blocks = export(options['module_ids'], chunk_size=options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'wb') as fh:
+                fh.writelines(blocks)
+        else:
+            sys.stdout.buffer.writelines(blocks)
+            sys.stdout.buffer.flush()
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.datagen import BENCH_PASSWORD, generate_dataset
+
+
+class Command(BaseCommand):
+    help = 'Bulk-insert a synthetic dataset of modules, pages, quiz options, users and progress.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--modules-per-category', type=int, default=10)
+        parser.add_argument('--pages-per-module', type=int, default=8)
+        parser.add_argument('--quiz-ratio', type=float, default=0.25,
+                            help='Share of pages that are quizzes')
+        parser.add_argument('--options-per-quiz', type=int, default=4)
+        parser.add_argument('--progress-density', type=float, default=0.3,
+                            help='Share of (user, module) pairs with a progress row')
+        parser.add_argument('--progress-rows', type=int,
+                            help='Total progress rows, overriding --progress-density')
+        parser.add_argument('--saved-density', type=float, default=0.05,
+                            help='Share of modules each user has saved')
+        parser.add_argument('--password', default=BENCH_PASSWORD)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            counts = generate_dataset(
+                users=options['users'],
+                modules_per_category=options['modules_per_category'],
+                pages_per_module=options['pages_per_module'],
+                quiz_ratio=options['quiz_ratio'],
+                options_per_quiz=options['options_per_quiz'],
+                progress_density=options['progress_density'],
+                progress_rows=options['progress_rows'],
+                saved_density=options['saved_density'],
+                password=options['password'],
+                seed=options['seed'],
+                log=self.stdout.write,
+            )
+        self.stdout.write(self.style.SUCCESS(
+            'Created ' + ', '.join(f'{count} {name}' for name, count in counts.items())
+        ))
@@ -0,0 +1,34 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Import an export_ndjson file in chunks, each in its own transaction. Modules, '
+        'pages and options get new ids; an interrupted import resumes when run again.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="NDJSON file, or - for stdin")
+        parser.add_argument('--source',
+                            help="Environment the records come from (default: the file's header)")
+        parser.add_argument('--chunk-size', type=int, default=transfer.CHUNK_SIZE,
+                            help='Records written per transaction')
+
+    def handle(self, *args, **options):
+        counts = {}
+        fh = sys.stdin.buffer if options['path'] == '-' else open(options['path'], 'rb')
+        try:
+            transfer.import_records(fh, source=options['source'], chunk_size=options['chunk_size'], counts=counts)
+        except ValueError as exc:
+            raise CommandError(f'{exc} (committed before it: {self.format(counts)}; run again to resume)')
+        finally:
+            if fh is not sys.stdin.buffer:
+                fh.close()
+        self.stdout.write(self.format(counts))
+
+    def format(self, counts):
+        return ', '.join(f'{value} {key}' for key, value in counts.items())
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from api.stats import install_triggers, refresh_module_stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the per-module stats from UserProgress and saved modules, '
+        'e.g. after loading data with the triggers missing or to clear float drift.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('module_ids', nargs='*', type=int,
+                            help='Only these modules (default: all)')
+        parser.add_argument('--install', action='store_true',
+                            help='Recreate missing maintenance triggers first (SQLite drops '
+                                 'them when a migration rebuilds their table)')
+
+    def handle(self, *args, **options):
+        if options['install']:
+            install_triggers()
+        count = refresh_module_stats(options['module_ids'] or None)
+        self.stdout.write(f'{count} modules refreshed')
@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from api.models import Job
+from api.tasks import get_config, run_pending, worker_pool
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (password reset mail, cache warming) until interrupted.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2,
+                            help='Worker threads')
+        parser.add_argument('--once', action='store_true',
+                            help='Run the jobs that are due now, then exit')
+        parser.add_argument('--stats', action='store_true',
+                            help='Print queued jobs by status, then exit')
+        parser.add_argument('--retry-failed', action='store_true',
+                            help='Queue failed jobs again, then exit')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            counts = dict(Job.objects.values_list('status').annotate(count=Count('id')))
+            for status, _ in Job._meta.get_field('status').choices:
+                self.stdout.write(f'{status:8} {counts.get(status, 0)}')
+            return
+        if options['retry_failed']:
+            queued = Job.objects.filter(status=Job.FAILED).update(status=Job.PENDING, attempts=0)
+            self.stdout.write(f'{queued} failed jobs queued again')
+            return
+        if options['once']:
+            self.stdout.write(f'{run_pending()} jobs run')
+            return
+
+        worker_pool.start(options['workers'])
+        self.stdout.write(f"{options['workers']} workers polling every {get_config()['POLL_INTERVAL']}s")
+        try:
+            while worker_pool.is_running():
+                time.sleep(1)
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping; waiting for running jobs')
+        finally:
+            worker_pool.stop()
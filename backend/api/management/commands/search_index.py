@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.search import get_backend
+
+
+class Command(BaseCommand):
+    help = (
+        'Reinstall the full-text index maintenance (needed on SQLite after a migration '
+        'rebuilds api_module or api_page) and reindex every module and page.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--install', action='store_true',
+                            help='Recreate the index tables and triggers that are missing first')
+        parser.add_argument('--optimize', action='store_true',
+                            help='Only merge the index segments, e.g. after a large import')
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        if options['optimize']:
+            backend.optimize()
+            self.stdout.write(f'{type(backend).__name__}: index optimized')
+            return
+        with transaction.atomic():
+            if options['install']:
+                backend.install()
+            backend.rebuild()
+        self.stdout.write(f'{type(backend).__name__}: index rebuilt')
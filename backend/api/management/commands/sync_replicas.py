@@ -0,0 +1,45 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from api.routers import PRIMARY
+
+
+class Command(BaseCommand):
+    help = (
+        'Copy the primary SQLite database over the SQLite replicas in REPLICA_DATABASES, '
+        'once or every --interval seconds, standing in for replication (and its lag) locally.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Repeat every this many seconds (default: copy once)')
+
+    def handle(self, *args, **options):
+        if not settings.REPLICA_DATABASES:
+            raise CommandError('No replicas configured; set DATABASE_REPLICAS.')
+        for alias in [PRIMARY, *settings.REPLICA_DATABASES]:
+            if connections[alias].vendor != 'sqlite':
+                raise CommandError(f'{alias} is not SQLite; its replication is the database server\'s job.')
+        while True:
+            started = time.perf_counter()
+            self.sync()
+            self.stdout.write(
+                f"Copied {PRIMARY} to {', '.join(settings.REPLICA_DATABASES)} "
+                f'in {(time.perf_counter() - started) * 1000:.0f} ms'
+            )
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def sync(self):
+        source = connections[PRIMARY]
+        source.ensure_connection()
+        for alias in settings.REPLICA_DATABASES:
+            # SQLite's online backup gives a consistent snapshot while the primary takes writes
+            with sqlite3.connect(connections[alias].settings_dict['NAME']) as target:
+                source.connection.backup(target)
+            target.close()
@@ -0,0 +1,60 @@
+from django.db import migrations, models
+
+RANK_SPACING = 1024.0
+
+
+def ranks_from_order(apps, schema_editor):
+    Page = apps.get_model('api', 'Page')
+    db = schema_editor.connection.alias
+    pages = []
+    module_id, position = None, 0
+    # Duplicate orders are possible, so break ties by id
+    for page in Page.objects.using(db).order_by('module_id', 'order', 'id').only('id', 'module_id', 'order'):
+        if page.module_id != module_id:
+            module_id, position = page.module_id, 0
+        page.rank = (position + 1) * RANK_SPACING
+        position += 1
+        pages.append(page)
+    Page.objects.using(db).bulk_update(pages, ['rank'], batch_size=1000)
+
+
+def order_from_ranks(apps, schema_editor):
+    Page = apps.get_model('api', 'Page')
+    db = schema_editor.connection.alias
+    pages = []
+    module_id, position = None, 0
+    for page in Page.objects.using(db).order_by('module_id', 'rank', 'id').only('id', 'module_id', 'rank'):
+        if page.module_id != module_id:
+            module_id, position = page.module_id, 0
+        page.order = position
+        position += 1
+        pages.append(page)
+    Page.objects.using(db).bulk_update(pages, ['order'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_module_category'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='page',
+            name='rank',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.RunPython(ranks_from_order, order_from_ranks),
+        migrations.RemoveField(
+            model_name='page',
+            name='order',
+        ),
+        migrations.AlterModelOptions(
+            name='page',
+            options={'ordering': ['rank', 'id']},
+        ),
+        migrations.AddIndex(
+            model_name='page',
+            index=models.Index(fields=['module', 'rank'], name='api_page_module_rank_idx'),
+        ),
+    ]
@@ -0,0 +1,91 @@
+from django.db import migrations
+
+# Full-text index maintained by the database itself, so bulk writes (which
+# send no signals) are indexed too. The SQL is frozen here as of this
+# migration; api.search holds the current version for `manage.py
+# search_index --install`.
+
+SQLITE_INSTALL = [
+    # External content tables: the index stores terms only and reads text from api_module/api_page
+    'CREATE VIRTUAL TABLE IF NOT EXISTS api_module_fts USING fts5('
+    "title, description, content='api_module', content_rowid='id', "
+    "tokenize='porter unicode61 remove_diacritics 2')",
+    'CREATE VIRTUAL TABLE IF NOT EXISTS api_page_fts USING fts5('
+    "content, content='api_page', content_rowid='id', "
+    "tokenize='porter unicode61 remove_diacritics 2')",
+
+    'CREATE TRIGGER IF NOT EXISTS api_module_fts_insert AFTER INSERT ON api_module BEGIN '
+    'INSERT INTO api_module_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END',
+    'CREATE TRIGGER IF NOT EXISTS api_module_fts_delete AFTER DELETE ON api_module BEGIN '
+    'INSERT INTO api_module_fts(api_module_fts, rowid, title, description) '
+    "VALUES ('delete', old.id, old.title, old.description); END",
+    'CREATE TRIGGER IF NOT EXISTS api_module_fts_update AFTER UPDATE OF title, description ON api_module BEGIN '
+    'INSERT INTO api_module_fts(api_module_fts, rowid, title, description) '
+    "VALUES ('delete', old.id, old.title, old.description); "
+    'INSERT INTO api_module_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END',
+
+    'CREATE TRIGGER IF NOT EXISTS api_page_fts_insert AFTER INSERT ON api_page BEGIN '
+    'INSERT INTO api_page_fts(rowid, content) VALUES (new.id, new.content); END',
+    'CREATE TRIGGER IF NOT EXISTS api_page_fts_delete AFTER DELETE ON api_page BEGIN '
+    "INSERT INTO api_page_fts(api_page_fts, rowid, content) VALUES ('delete', old.id, old.content); END",
+    'CREATE TRIGGER IF NOT EXISTS api_page_fts_update AFTER UPDATE OF content ON api_page BEGIN '
+    "INSERT INTO api_page_fts(api_page_fts, rowid, content) VALUES ('delete', old.id, old.content); "
+    'INSERT INTO api_page_fts(rowid, content) VALUES (new.id, new.content); END',
+
+    # Index the rows that already exist
+    "INSERT INTO api_module_fts(api_module_fts) VALUES ('rebuild')",
+    "INSERT INTO api_page_fts(api_page_fts) VALUES ('rebuild')",
+]
+
+SQLITE_UNINSTALL = [
+    'DROP TRIGGER IF EXISTS api_module_fts_insert',
+    'DROP TRIGGER IF EXISTS api_module_fts_delete',
+    'DROP TRIGGER IF EXISTS api_module_fts_update',
+    'DROP TRIGGER IF EXISTS api_page_fts_insert',
+    'DROP TRIGGER IF EXISTS api_page_fts_delete',
+    'DROP TRIGGER IF EXISTS api_page_fts_update',
+    'DROP TABLE IF EXISTS api_module_fts',
+    'DROP TABLE IF EXISTS api_page_fts',
+]
+
+POSTGRES_INSTALL = [
+    'ALTER TABLE api_module ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ('
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'B')) STORED",
+    'CREATE INDEX IF NOT EXISTS api_module_search_idx ON api_module USING gin (search_vector)',
+    'ALTER TABLE api_page ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ('
+    "to_tsvector('english', coalesce(content, ''))) STORED",
+    'CREATE INDEX IF NOT EXISTS api_page_search_idx ON api_page USING gin (search_vector)',
+]
+
+POSTGRES_UNINSTALL = [
+    'DROP INDEX IF EXISTS api_module_search_idx',
+    'ALTER TABLE api_module DROP COLUMN IF EXISTS search_vector',
+    'DROP INDEX IF EXISTS api_page_search_idx',
+    'ALTER TABLE api_page DROP COLUMN IF EXISTS search_vector',
+]
+
+# Other databases have no index and search with LIKE scans
+INSTALL = {'sqlite': SQLITE_INSTALL, 'postgresql': POSTGRES_INSTALL}
+UNINSTALL = {'sqlite': SQLITE_UNINSTALL, 'postgresql': POSTGRES_UNINSTALL}
+
+
+def install(apps, schema_editor):
+    for statement in INSTALL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement, params=None)
+
+
+def uninstall(apps, schema_editor):
+    for statement in UNINSTALL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement, params=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_job'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
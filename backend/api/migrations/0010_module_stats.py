@@ -0,0 +1,130 @@
+# Generated by Django 5.0 on 2026-10-17 23:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Running totals kept by triggers, backfilled from the existing rows. The
+# SQL is frozen here as of this migration; api.stats holds the current
+# version. 100.0 is UserProgress.COMPLETE.
+
+SQLITE_TRIGGERS = [
+    'CREATE TRIGGER IF NOT EXISTS api_modulestats_progress_insert AFTER INSERT ON api_userprogress BEGIN '
+    'INSERT INTO api_modulestats (module_id, learners, completed, progress_sum, saves) '
+    'VALUES (new.module_id, 1, new.progress >= 100.0, new.progress, 0) '
+    'ON CONFLICT (module_id) DO UPDATE SET learners = learners + 1, '
+    'completed = completed + excluded.completed, progress_sum = progress_sum + excluded.progress_sum; END',
+    'CREATE TRIGGER IF NOT EXISTS api_modulestats_progress_update AFTER UPDATE OF progress ON api_userprogress '
+    'WHEN new.progress != old.progress BEGIN '
+    'UPDATE api_modulestats SET completed = completed + (new.progress >= 100.0) - (old.progress >= 100.0), '
+    'progress_sum = progress_sum + new.progress - old.progress WHERE module_id = new.module_id; END',
+    # Plain UPDATEs on delete, so a module being deleted doesn't get its row back
+    'CREATE TRIGGER IF NOT EXISTS api_modulestats_progress_delete AFTER DELETE ON api_userprogress BEGIN '
+    'UPDATE api_modulestats SET learners = learners - 1, completed = completed - (old.progress >= 100.0), '
+    'progress_sum = progress_sum - old.progress WHERE module_id = old.module_id; END',
+    'CREATE TRIGGER IF NOT EXISTS api_modulestats_saved_insert AFTER INSERT ON api_user_saved_modules BEGIN '
+    'INSERT INTO api_modulestats (module_id, learners, completed, progress_sum, saves) '
+    'VALUES (new.module_id, 0, 0, 0.0, 1) ON CONFLICT (module_id) DO UPDATE SET saves = saves + 1; END',
+    'CREATE TRIGGER IF NOT EXISTS api_modulestats_saved_delete AFTER DELETE ON api_user_saved_modules BEGIN '
+    'UPDATE api_modulestats SET saves = saves - 1 WHERE module_id = old.module_id; END',
+]
+
+SQLITE_DROP = [
+    'DROP TRIGGER IF EXISTS api_modulestats_progress_insert',
+    'DROP TRIGGER IF EXISTS api_modulestats_progress_update',
+    'DROP TRIGGER IF EXISTS api_modulestats_progress_delete',
+    'DROP TRIGGER IF EXISTS api_modulestats_saved_insert',
+    'DROP TRIGGER IF EXISTS api_modulestats_saved_delete',
+]
+
+POSTGRES_TRIGGERS = [
+    'CREATE OR REPLACE FUNCTION api_modulestats_progress() RETURNS trigger AS $$ BEGIN '
+    "IF TG_OP = 'INSERT' THEN "
+    'INSERT INTO api_modulestats (module_id, learners, completed, progress_sum, saves) '
+    'VALUES (NEW.module_id, 1, (NEW.progress >= 100.0)::int, NEW.progress, 0) '
+    'ON CONFLICT (module_id) DO UPDATE SET learners = api_modulestats.learners + 1, '
+    'completed = api_modulestats.completed + EXCLUDED.completed, '
+    'progress_sum = api_modulestats.progress_sum + EXCLUDED.progress_sum; '
+    "ELSIF TG_OP = 'UPDATE' THEN "
+    'IF NEW.progress <> OLD.progress THEN '
+    'UPDATE api_modulestats SET completed = completed + (NEW.progress >= 100.0)::int '
+    '- (OLD.progress >= 100.0)::int, progress_sum = progress_sum + NEW.progress - OLD.progress '
+    'WHERE module_id = NEW.module_id; END IF; '
+    'ELSE '
+    'UPDATE api_modulestats SET learners = learners - 1, completed = completed - (OLD.progress >= 100.0)::int, '
+    'progress_sum = progress_sum - OLD.progress WHERE module_id = OLD.module_id; '
+    'END IF; RETURN NULL; END $$ LANGUAGE plpgsql',
+    'DROP TRIGGER IF EXISTS api_modulestats_progress ON api_userprogress',
+    'CREATE TRIGGER api_modulestats_progress AFTER INSERT OR DELETE OR UPDATE OF progress ON api_userprogress '
+    'FOR EACH ROW EXECUTE FUNCTION api_modulestats_progress()',
+
+    'CREATE OR REPLACE FUNCTION api_modulestats_saved() RETURNS trigger AS $$ BEGIN '
+    "IF TG_OP = 'INSERT' THEN "
+    'INSERT INTO api_modulestats (module_id, learners, completed, progress_sum, saves) '
+    'VALUES (NEW.module_id, 0, 0, 0.0, 1) '
+    'ON CONFLICT (module_id) DO UPDATE SET saves = api_modulestats.saves + 1; '
+    'ELSE '
+    'UPDATE api_modulestats SET saves = saves - 1 WHERE module_id = OLD.module_id; '
+    'END IF; RETURN NULL; END $$ LANGUAGE plpgsql',
+    'DROP TRIGGER IF EXISTS api_modulestats_saved ON api_user_saved_modules',
+    'CREATE TRIGGER api_modulestats_saved AFTER INSERT OR DELETE ON api_user_saved_modules '
+    'FOR EACH ROW EXECUTE FUNCTION api_modulestats_saved()',
+]
+
+POSTGRES_DROP = [
+    'DROP TRIGGER IF EXISTS api_modulestats_progress ON api_userprogress',
+    'DROP TRIGGER IF EXISTS api_modulestats_saved ON api_user_saved_modules',
+    'DROP FUNCTION IF EXISTS api_modulestats_progress()',
+    'DROP FUNCTION IF EXISTS api_modulestats_saved()',
+]
+
+TRIGGERS = {'sqlite': SQLITE_TRIGGERS, 'postgresql': POSTGRES_TRIGGERS}
+DROP_TRIGGERS = {'sqlite': SQLITE_DROP, 'postgresql': POSTGRES_DROP}
+
+BACKFILL = """
+    INSERT INTO api_modulestats (module_id, learners, completed, progress_sum, saves)
+    SELECT api_module.id, COALESCE(progress.learners, 0), COALESCE(progress.completed, 0),
+           COALESCE(progress.progress_sum, 0.0), COALESCE(saved.saves, 0)
+    FROM api_module
+    LEFT JOIN (
+        SELECT module_id, COUNT(*) AS learners,
+               SUM(CASE WHEN progress >= 100.0 THEN 1 ELSE 0 END) AS completed,
+               SUM(progress) AS progress_sum
+        FROM api_userprogress GROUP BY module_id
+    ) progress ON progress.module_id = api_module.id
+    LEFT JOIN (
+        SELECT module_id, COUNT(*) AS saves FROM api_user_saved_modules GROUP BY module_id
+    ) saved ON saved.module_id = api_module.id
+"""
+
+
+def install(apps, schema_editor):
+    # Other databases get the backfill only, and rely on refresh_module_stats()
+    for statement in TRIGGERS.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement, params=None)
+    schema_editor.execute(BACKFILL, params=None)
+
+
+def uninstall(apps, schema_editor):
+    for statement in DROP_TRIGGERS.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement, params=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ModuleStats',
+            fields=[
+                ('module', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='api.module')),
+                ('learners', models.IntegerField(default=0)),
+                ('completed', models.IntegerField(default=0)),
+                ('progress_sum', models.FloatField(default=0.0)),
+                ('saves', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(install, uninstall),
+    ]
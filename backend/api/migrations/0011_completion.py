@@ -0,0 +1,124 @@
+# Generated by Django 5.0 on 2026-10-17 23:58
+
+from importlib import import_module
+
+from django.db import migrations, models
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+# A module is completed once its progress row has completed_at, for the
+# user's counter and for ModuleStats alike. Rows already at 100% are
+# completed as of their last update, and the stats triggers from 0010 are
+# replaced with ones counting completed_at. The SQL is frozen here as of
+# this migration; api.stats holds the current version.
+
+SQLITE_TRIGGERS = [
+    'DROP TRIGGER IF EXISTS api_modulestats_progress_insert',
+    'DROP TRIGGER IF EXISTS api_modulestats_progress_update',
+    'DROP TRIGGER IF EXISTS api_modulestats_progress_delete',
+    'CREATE TRIGGER IF NOT EXISTS api_modulestats_progress_insert AFTER INSERT ON api_userprogress BEGIN '
+    'INSERT INTO api_modulestats (module_id, learners, completed, progress_sum, saves) '
+    'VALUES (new.module_id, 1, new.completed_at IS NOT NULL, new.progress, 0) '
+    'ON CONFLICT (module_id) DO UPDATE SET learners = learners + 1, '
+    'completed = completed + excluded.completed, progress_sum = progress_sum + excluded.progress_sum; END',
+    'CREATE TRIGGER IF NOT EXISTS api_modulestats_progress_update '
+    'AFTER UPDATE OF progress, completed_at ON api_userprogress '
+    'WHEN new.progress != old.progress OR (new.completed_at IS NULL) != (old.completed_at IS NULL) BEGIN '
+    'UPDATE api_modulestats SET completed = completed '
+    '+ (new.completed_at IS NOT NULL) - (old.completed_at IS NOT NULL), '
+    'progress_sum = progress_sum + new.progress - old.progress WHERE module_id = new.module_id; END',
+    'CREATE TRIGGER IF NOT EXISTS api_modulestats_progress_delete AFTER DELETE ON api_userprogress BEGIN '
+    'UPDATE api_modulestats SET learners = learners - 1, completed = completed - (old.completed_at IS NOT NULL), '
+    'progress_sum = progress_sum - old.progress WHERE module_id = old.module_id; END',
+]
+
+POSTGRES_TRIGGERS = [
+    'CREATE OR REPLACE FUNCTION api_modulestats_progress() RETURNS trigger AS $$ BEGIN '
+    "IF TG_OP = 'INSERT' THEN "
+    'INSERT INTO api_modulestats (module_id, learners, completed, progress_sum, saves) '
+    'VALUES (NEW.module_id, 1, (NEW.completed_at IS NOT NULL)::int, NEW.progress, 0) '
+    'ON CONFLICT (module_id) DO UPDATE SET learners = api_modulestats.learners + 1, '
+    'completed = api_modulestats.completed + EXCLUDED.completed, '
+    'progress_sum = api_modulestats.progress_sum + EXCLUDED.progress_sum; '
+    "ELSIF TG_OP = 'UPDATE' THEN "
+    'IF NEW.progress <> OLD.progress OR (NEW.completed_at IS NULL) <> (OLD.completed_at IS NULL) THEN '
+    'UPDATE api_modulestats SET completed = completed + (NEW.completed_at IS NOT NULL)::int '
+    '- (OLD.completed_at IS NOT NULL)::int, progress_sum = progress_sum + NEW.progress - OLD.progress '
+    'WHERE module_id = NEW.module_id; END IF; '
+    'ELSE '
+    'UPDATE api_modulestats SET learners = learners - 1, completed = completed - (OLD.completed_at IS NOT NULL)::int, '
+    'progress_sum = progress_sum - OLD.progress WHERE module_id = OLD.module_id; '
+    'END IF; RETURN NULL; END $$ LANGUAGE plpgsql',
+    'DROP TRIGGER IF EXISTS api_modulestats_progress ON api_userprogress',
+    'CREATE TRIGGER api_modulestats_progress AFTER INSERT OR DELETE OR UPDATE OF progress, completed_at '
+    'ON api_userprogress '
+    'FOR EACH ROW EXECUTE FUNCTION api_modulestats_progress()',
+]
+
+TRIGGERS = {'sqlite': SQLITE_TRIGGERS, 'postgresql': POSTGRES_TRIGGERS}
+
+
+def complete_existing(apps, schema_editor):
+    User = apps.get_model('api', 'User')
+    UserProgress = apps.get_model('api', 'UserProgress')
+    db = schema_editor.connection.alias
+    UserProgress.objects.using(db).filter(
+        progress__gte=100.0, completed_at__isnull=True
+    ).update(completed_at=F('updated_at'))
+    completed = UserProgress.objects.using(db).filter(
+        user_id=OuterRef('pk'), completed_at__isnull=False
+    ).order_by().values('user_id').annotate(count=Count('*')).values('count')
+    User.objects.using(db).update(completed_modules_count=Coalesce(Subquery(completed), 0))
+
+
+def recount_stats(apps, schema_editor, **completed):
+    ModuleStats = apps.get_model('api', 'ModuleStats')
+    UserProgress = apps.get_model('api', 'UserProgress')
+    db = schema_editor.connection.alias
+    count = UserProgress.objects.using(db).filter(
+        module_id=OuterRef('module_id'), **completed
+    ).order_by().values('module_id').annotate(count=Count('*')).values('count')
+    ModuleStats.objects.using(db).update(completed=Coalesce(Subquery(count), 0))
+
+
+def count_completed_at(apps, schema_editor):
+    for statement in TRIGGERS.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement, params=None)
+    recount_stats(apps, schema_editor, completed_at__isnull=False)
+
+
+def count_full_progress(apps, schema_editor):
+    previous = import_module('api.migrations.0010_module_stats')
+    if schema_editor.connection.vendor == 'sqlite':
+        # CREATE TRIGGER IF NOT EXISTS would keep this migration's versions
+        for statement in previous.SQLITE_DROP:
+            schema_editor.execute(statement, params=None)
+    for statement in previous.TRIGGERS.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement, params=None)
+    recount_stats(apps, schema_editor, progress__gte=100.0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_module_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='completed_modules_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprogress',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='userprogress',
+            index=models.Index(condition=models.Q(('completed_at__isnull', False)), fields=['user', 'completed_at'], name='api_progress_completed_idx'),
+        ),
+        migrations.RunPython(complete_existing, migrations.RunPython.noop),
+        migrations.RunPython(count_completed_at, count_full_progress),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.0 on 2026-10-18 00:08
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_completion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuizAttempt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('selected', models.JSONField(default=list)),
+                ('is_correct', models.BooleanField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('module', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.module')),
+                ('page', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.page')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='quiz_attempts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'module', '-created_at'], name='api_quizattempt_user_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.0 on 2026-10-18 00:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_quiz_attempt'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportedRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=100)),
+                ('model', models.CharField(max_length=10)),
+                ('source_id', models.BigIntegerField()),
+                ('object_id', models.BigIntegerField()),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='importedrecord',
+            constraint=models.UniqueConstraint(fields=('source', 'model', 'source_id'), name='api_importedrecord_source_uniq'),
+        ),
+    ]
@@ -1,5 +1,8 @@
-from django.db import models
+from django.db import connections, models, router, transaction
+from django.db.models import F
 from django.contrib.auth.models import AbstractUser, BaseUserManager
+from django.db.models.functions import Coalesce, RowNumber
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 class UserManager(BaseUserManager):
@@ -31,12 +34,41 @@ class User(AbstractUser):
     last_name = models.CharField(max_length=30)
     is_admin = models.BooleanField(default=False)
     saved_modules = models.ManyToManyField('Module', related_name='saved_by_users', blank=True)
+    # Modules with UserProgress.completed_at set, maintained by UserProgress.objects.complete()
+    completed_modules_count = models.PositiveIntegerField(default=0)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['first_name', 'last_name']
 
     objects = UserManager()
 
+    def save(self, *args, **kwargs):
+        # The counter only moves through F() updates; a full save of an
+        # instance loaded earlier must not write back a stale copy
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.attname for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname != 'completed_modules_count'
+                and field.attname not in self.get_deferred_fields()
+            ]
+        super().save(*args, **kwargs)
+
+    def add_saved_modules(self, module_ids):
+        """Save modules in one INSERT, skipping unknown and already saved ids; returns the ids that exist."""
+        Saved = self.saved_modules.through
+        module_ids = list(Module.objects.filter(pk__in=set(module_ids)).values_list('pk', flat=True))
+        Saved.objects.bulk_create(
+            [Saved(user_id=self.pk, module_id=module_id) for module_id in module_ids], ignore_conflicts=True
+        )
+        return module_ids
+
+    def remove_saved_modules(self, module_ids):
+        """Unsave modules in one DELETE; returns how many were saved."""
+        return self.saved_modules.through.objects.filter(user_id=self.pk, module_id__in=set(module_ids)).delete()[0]
+
+    def saved_module_ids(self):
+        return list(self.saved_modules.through.objects.filter(user_id=self.pk).values_list('module_id', flat=True))
+
     def __str__(self):
         return self.email
 
@@ -58,9 +90,29 @@ class Module(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Catalog listing: ?category= filter with the default -created_at cursor ordering
+            models.Index(fields=['category', '-created_at'], name='api_module_category_idx'),
+            models.Index(fields=['-created_at'], name='api_module_created_idx'),
+            models.Index(fields=['-updated_at'], name='api_module_updated_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
+class PageQuerySet(models.QuerySet):
+    def with_position(self):
+        # 0-based position within the module; only meaningful when the queryset
+        # holds every page of the modules it covers
+        return self.annotate(
+            position=models.Window(
+                RowNumber(),
+                partition_by=models.F('module_id'),
+                order_by=[models.F('rank').asc(), models.F('id').asc()],
+            ) - 1
+        )
+
 class Page(models.Model):
     module = models.ForeignKey(Module, related_name='pages', on_delete=models.CASCADE)
     type = models.CharField(max_length=10, choices=[
@@ -69,15 +121,21 @@ class Page(models.Model):
         ('video', 'Video'),
     ])
     content = models.TextField()
-    order = models.IntegerField(default=0)
+    # Sort key within the module, see api.ordering
+    rank = models.FloatField(default=0.0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = PageQuerySet.as_manager()
+
     class Meta:
-        ordering = ['order']
+        ordering = ['rank', 'id']
+        indexes = [
+            models.Index(fields=['module', 'rank'], name='api_page_module_rank_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.module.title} - Page {self.order}"
+        return f"{self.module.title} - Page {self.rank:g}"
 
 class QuizOption(models.Model):
     page = models.ForeignKey(Page, related_name='quiz_options', on_delete=models.CASCADE)
@@ -89,12 +147,319 @@ class QuizOption(models.Model):
     class Meta:
         ordering = ['id']
 
+class UserProgressManager(models.Manager):
+    upsert_columns = '(user_id, module_id, progress, last_page_viewed_id, updated_at)'
+
+    def _on_conflict_sql(self, table, monotonic):
+        if monotonic:
+            progress_sql = (
+                f'CASE WHEN excluded.progress > {table}.progress '
+                f'THEN excluded.progress ELSE {table}.progress END'
+            )
+        else:
+            progress_sql = 'excluded.progress'
+        return (
+            f'ON CONFLICT (user_id, module_id) DO UPDATE SET '
+            f'progress = {progress_sql}, '
+            f'last_page_viewed_id = COALESCE(excluded.last_page_viewed_id, {table}.last_page_viewed_id), '
+            f'updated_at = excluded.updated_at'
+        )
+
+    def _exists_sql(self, connection, module_id, last_page_viewed_id):
+        # Guarding an insert with EXISTS turns a missing module or page into
+        # an empty RETURNING instead of an integrity error
+        qn = connection.ops.quote_name
+        if last_page_viewed_id is not None:
+            return (
+                f'SELECT 1 FROM {qn(Page._meta.db_table)} WHERE id = %s AND module_id = %s',
+                [last_page_viewed_id, module_id],
+            )
+        return f'SELECT 1 FROM {qn(Module._meta.db_table)} WHERE id = %s', [module_id]
+
+    def upsert(self, user_id, module_id, progress, last_page_viewed_id=None, monotonic=False):
+        """
+        Insert or update the (user, module) row in a single INSERT ... ON CONFLICT
+        statement. With ``monotonic`` stored progress never decreases. Reaching
+        COMPLETE completes the module, see complete(). Returns None when the
+        module (or the page, if given) doesn't exist.
+        """
+        if progress >= self.model.COMPLETE:
+            result = self.complete(user_id, module_id, last_page_viewed_id)
+            return result[0] if result else None
+
+        connection = connections[router.db_for_write(self.model)]
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        now = timezone.now()
+        exists_sql, exists_params = self._exists_sql(connection, module_id, last_page_viewed_id)
+
+        sql = (
+            f'INSERT INTO {table} {self.upsert_columns} '
+            f'SELECT %s, %s, %s, %s, %s WHERE EXISTS ({exists_sql}) '
+            f'{self._on_conflict_sql(table, monotonic)} '
+            f'RETURNING id, progress, last_page_viewed_id'
+        )
+        params = [
+            user_id,
+            module_id,
+            float(progress),
+            last_page_viewed_id,
+            connection.ops.adapt_datetimefield_value(now),
+        ] + exists_params
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        return self.model(
+            id=row[0],
+            user_id=user_id,
+            module_id=module_id,
+            progress=row[1],
+            last_page_viewed_id=row[2],
+            updated_at=now,
+        )
+
+    def complete(self, user_id, module_id, last_page_viewed_id=None):
+        """
+        Set the user's progress on the module to COMPLETE, creating the row if
+        needed. The first time, this records completed_at and counts the
+        module on the user; a module stays completed if its progress drops
+        later. Returns the row and whether this call completed it, or None
+        when the module (or the page, if given) doesn't exist.
+        """
+        connection = connections[router.db_for_write(self.model)]
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        now = timezone.now()
+        db_now = connection.ops.adapt_datetimefield_value(now)
+        exists_sql, exists_params = self._exists_sql(connection, module_id, last_page_viewed_id)
+
+        # An earlier completed_at is kept, so the row holds ours exactly when
+        # this call completed the module
+        sql = (
+            f'INSERT INTO {table} (user_id, module_id, progress, last_page_viewed_id, updated_at, completed_at) '
+            f'SELECT %s, %s, %s, %s, %s, %s WHERE EXISTS ({exists_sql}) '
+            f'ON CONFLICT (user_id, module_id) DO UPDATE SET '
+            f'progress = excluded.progress, '
+            f'last_page_viewed_id = COALESCE(excluded.last_page_viewed_id, {table}.last_page_viewed_id), '
+            f'updated_at = excluded.updated_at, '
+            f'completed_at = COALESCE({table}.completed_at, excluded.completed_at) '
+            f'RETURNING id, last_page_viewed_id, completed_at = %s'
+        )
+        params = [user_id, module_id, self.model.COMPLETE, last_page_viewed_id, db_now, db_now] + exists_params
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params + [db_now])
+                row = cursor.fetchone()
+            if row is None:
+                return None
+            completed = bool(row[2])
+            if completed:
+                User.objects.filter(pk=user_id).update(completed_modules_count=F('completed_modules_count') + 1)
+                completed_at = now
+            else:
+                completed_at = self.filter(pk=row[0]).values_list('completed_at', flat=True).get()
+        progress = self.model(
+            id=row[0],
+            user_id=user_id,
+            module_id=module_id,
+            progress=self.model.COMPLETE,
+            last_page_viewed_id=row[1],
+            updated_at=now,
+            completed_at=completed_at,
+        )
+        return progress, completed
+
+    def _complete_reached(self, rows):
+        """
+        Complete the rows among ``rows`` (``(user_id, module_id, ...)`` tuples)
+        written at COMPLETE or more without going through complete(), and
+        recount their users' completed modules.
+        """
+        user_ids = {row[0] for row in rows}
+        completed = self.filter(
+            user_id=models.OuterRef('pk'), completed_at__isnull=False
+        ).order_by().values('user_id').annotate(count=models.Count('*')).values('count')
+        with transaction.atomic(using=router.db_for_write(self.model)):
+            self.filter(
+                user_id__in=user_ids,
+                module_id__in={row[1] for row in rows},
+                progress__gte=self.model.COMPLETE,
+                completed_at__isnull=True,
+            ).update(completed_at=F('updated_at'))
+            User.objects.filter(pk__in=user_ids).update(
+                completed_modules_count=Coalesce(models.Subquery(completed), 0)
+            )
+
+    def import_rows(self, rows, batch_size=1000):
+        """
+        Upsert ``(user_id, module_id, progress, last_page_viewed_id, updated_at, completed_at)``
+        rows as read from an export, completing those at COMPLETE, and recount
+        the touched users' completed modules. A row only replaces one updated
+        before it, and keeps its completion. Rows must reference existing
+        users, modules and pages.
+        Returns how many rows were written.
+        """
+        connection = connections[router.db_for_write(self.model)]
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        adapt = connection.ops.adapt_datetimefield_value
+        written = 0
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                for start in range(0, len(rows), batch_size):
+                    batch = rows[start:start + batch_size]
+                    params = []
+                    for user_id, module_id, progress, last_page_viewed_id, updated_at, completed_at in batch:
+                        params += [
+                            user_id,
+                            module_id,
+                            float(progress),
+                            last_page_viewed_id,
+                            adapt(updated_at),
+                            adapt(completed_at),
+                        ]
+                    values = ', '.join(['(%s, %s, %s, %s, %s, %s)'] * len(batch))
+                    cursor.execute(
+                        f'INSERT INTO {table} (user_id, module_id, progress, last_page_viewed_id, updated_at, completed_at) '
+                        f'VALUES {values} '
+                        f'ON CONFLICT (user_id, module_id) DO UPDATE SET '
+                        f'progress = excluded.progress, '
+                        f'last_page_viewed_id = COALESCE(excluded.last_page_viewed_id, {table}.last_page_viewed_id), '
+                        f'updated_at = excluded.updated_at, '
+                        f'completed_at = COALESCE({table}.completed_at, excluded.completed_at) '
+                        f'WHERE excluded.updated_at > {table}.updated_at',
+                        params
+                    )
+                    written += cursor.rowcount
+            self._complete_reached(rows)
+        return written
+
+    def bulk_upsert(self, rows, monotonic=False, batch_size=1000):
+        """
+        Upsert many ``(user_id, module_id, progress, last_page_viewed_id, updated_at)``
+        rows with one multi-row INSERT ... ON CONFLICT per batch, completing
+        those at COMPLETE. Rows must reference existing modules and pages.
+        """
+        connection = connections[router.db_for_write(self.model)]
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        on_conflict = self._on_conflict_sql(table, monotonic)
+        with connection.cursor() as cursor:
+            for start in range(0, len(rows), batch_size):
+                batch = rows[start:start + batch_size]
+                params = []
+                for user_id, module_id, progress, last_page_viewed_id, updated_at in batch:
+                    params += [
+                        user_id,
+                        module_id,
+                        float(progress),
+                        last_page_viewed_id,
+                        connection.ops.adapt_datetimefield_value(updated_at),
+                    ]
+                values = ', '.join(['(%s, %s, %s, %s, %s)'] * len(batch))
+                cursor.execute(
+                    f'INSERT INTO {table} {self.upsert_columns} VALUES {values} {on_conflict}',
+                    params
+                )
+        reached = [row for row in rows if row[2] >= self.model.COMPLETE]
+        if reached:
+            self._complete_reached(reached)
+
 class UserProgress(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     module = models.ForeignKey(Module, on_delete=models.CASCADE)
-    progress = models.FloatField(default=0.0)  # 0.0 to 1.0
+    # Percent of the module done, as the frontend sends it
+    progress = models.FloatField(default=0.0)
     last_page_viewed = models.ForeignKey(Page, on_delete=models.SET_NULL, null=True)
     updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    COMPLETE = 100.0
+
+    objects = UserProgressManager()
 
     class Meta:
         unique_together = ('user', 'module')
+        indexes = [
+            # Progress list and its ETag aggregate: WHERE user_id = ? / MAX(updated_at)
+            models.Index(fields=['user', '-updated_at'], name='api_progress_user_updated_idx'),
+            # A user's completed modules, the only rows that have completed_at
+            models.Index(fields=['user', 'completed_at'], name='api_progress_completed_idx',
+                         condition=models.Q(completed_at__isnull=False)),
+        ]
+
+class ModuleStats(models.Model):
+    """Learner aggregates for a module, kept current by database triggers (see api.stats)."""
+    module = models.OneToOneField(Module, primary_key=True, related_name='stats', on_delete=models.CASCADE)
+    # UserProgress rows, i.e. learners who started the module
+    learners = models.IntegerField(default=0)
+    completed = models.IntegerField(default=0)
+    progress_sum = models.FloatField(default=0.0)
+    saves = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.module_id}: {self.completed}/{self.learners} completed, {self.saves} saves"
+
+class QuizAttempt(models.Model):
+    """One graded answer to a quiz page, written in bulk by the quiz submission endpoint (see api.quizzes)."""
+    # Covered by the (user, module) index
+    user = models.ForeignKey(User, related_name='quiz_attempts', on_delete=models.CASCADE, db_index=False)
+    module = models.ForeignKey(Module, on_delete=models.CASCADE)
+    page = models.ForeignKey(Page, on_delete=models.CASCADE)
+    # Ids of the options chosen
+    selected = models.JSONField(default=list)
+    is_correct = models.BooleanField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'module', '-created_at'], name='api_quizattempt_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} on page {self.page_id}: {'correct' if self.is_correct else 'incorrect'}"
+
+class ImportedRecord(models.Model):
+    """A module, page or quiz option created by an NDJSON import, keyed by its id in the export (see api.transfer)."""
+    # The exporting environment, from the export's header line
+    source = models.CharField(max_length=100)
+    model = models.CharField(max_length=10)
+    source_id = models.BigIntegerField()
+    object_id = models.BigIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'model', 'source_id'], name='api_importedrecord_source_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.source} {self.model} {self.source_id} -> {self.object_id}"
+
+class Job(models.Model):
+    """A queued call of a registered background task, see api.tasks."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FAILED = 'failed'
+
+    task = models.CharField(max_length=200)
+    args = models.JSONField(default=list)
+    kwargs = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, default=PENDING, choices=[
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (FAILED, 'Failed'),
+    ])
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Workers poll WHERE status = 'pending' AND run_at <= now ORDER BY run_at
+            models.Index(fields=['status', 'run_at'], name='api_job_status_run_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.task} ({self.status}, attempt {self.attempts}/{self.max_attempts})"
@@ -0,0 +1,81 @@
+from django.db.models import Case, Value, When
+from django.utils import timezone
+
+from .models import Page
+
+# Pages are ordered by a float rank. New positions take the midpoint between
+# their neighbours, so a move, insert or delete writes a single row; a module
+# is only renumbered when bisection runs out of float precision.
+RANK_SPACING = 1024.0
+MIN_RANK_GAP = 1e-6
+
+
+def spaced_rank(position):
+    return (position + 1) * RANK_SPACING
+
+
+def rank_between(lower, upper):
+    """Return a rank strictly between two neighbours (either may be None), or None if there's no room."""
+    if lower is None and upper is None:
+        return spaced_rank(0)
+    if upper is None:
+        return lower + RANK_SPACING
+    if lower is None:
+        lower = 0.0
+    if upper - lower < MIN_RANK_GAP:
+        return None
+    return (lower + upper) / 2
+
+
+def _pages(module_id, exclude_pk=None):
+    pages = Page.objects.filter(module_id=module_id)
+    if exclude_pk is not None:
+        pages = pages.exclude(pk=exclude_pk)
+    return pages
+
+
+def neighbour_ranks(module_id, position, exclude_pk=None):
+    """Ranks of the pages that would sit just before and after ``position``."""
+    ranks = _pages(module_id, exclude_pk).order_by('rank', 'id').values_list('rank', flat=True)
+    if position <= 0:
+        return None, ranks.first()
+    window = list(ranks[position - 1:position + 1])
+    if not window:
+        return ranks.last(), None
+    return window[0], window[1] if len(window) > 1 else None
+
+
+def rank_for_position(module_id, position=None, exclude_pk=None):
+    """Rank placing a page at ``position`` (appending when None), renumbering the module if needed."""
+    if position is None:
+        last = _pages(module_id, exclude_pk).order_by('-rank').values_list('rank', flat=True).first()
+        return rank_between(last, None)
+    lower, upper = neighbour_ranks(module_id, position, exclude_pk)
+    rank = rank_between(lower, upper)
+    if rank is None:
+        rebalance(module_id)
+        lower, upper = neighbour_ranks(module_id, position, exclude_pk)
+        rank = rank_between(lower, upper)
+    return rank
+
+
+def rank_fits_position(rank, module_id, position, exclude_pk=None):
+    lower, upper = neighbour_ranks(module_id, position, exclude_pk)
+    return (lower is None or lower < rank) and (upper is None or rank < upper)
+
+
+def rewrite_ranks(module_id, page_ids):
+    """Evenly respace the given pages in list order with one UPDATE statement."""
+    return _pages(module_id).filter(pk__in=page_ids).update(
+        rank=Case(
+            *[When(pk=page_id, then=Value(spaced_rank(position)))
+              for position, page_id in enumerate(page_ids)],
+        ),
+        updated_at=timezone.now(),
+    )
+
+
+def rebalance(module_id):
+    page_ids = list(_pages(module_id).order_by('rank', 'id').values_list('id', flat=True))
+    if page_ids:
+        rewrite_ranks(module_id, page_ids)
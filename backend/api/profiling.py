@@ -0,0 +1,289 @@
+import contextvars
+import functools
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.module_loading import import_string
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': False,
+    # Add a Server-Timing header to every response
+    'SERVER_TIMING': True,
+    # Flag a request when one SQL template runs more than this many times
+    'N_PLUS_ONE_THRESHOLD': 10,
+    'SINKS': ['api.profiling.LogSink'],
+}
+
+# Upper bounds in seconds for the request duration histogram
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_active = contextvars.ContextVar('request_profile', default=None)
+_in_list = re.compile(r'IN \(%s(?:, %s)*\)')
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'REQUEST_PROFILING', {})}
+
+
+def sql_template(sql):
+    # IN lists vary in length between otherwise identical queries
+    return _in_list.sub('IN (...)', sql)
+
+
+class RequestProfile:
+    def __init__(self):
+        self.view = None
+        self.method = None
+        self.status = None
+        self.started = None
+        self.total = 0.0
+        self.view_started = None
+        self.view_time = 0.0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.queries = Counter()
+        self.n_plus_one = []
+        self._serializer_depth = 0
+
+    @property
+    def query_count(self):
+        return sum(self.queries.values())
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries[sql_template(sql)] += 1
+
+    def server_timing(self):
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.query_count} queries"',
+            f'serializer;dur={self.serializer_time * 1000:.1f}',
+            f'view;dur={self.view_time * 1000:.1f}',
+            f'total;dur={self.total * 1000:.1f}',
+        ])
+
+
+@contextmanager
+def serializer_timer():
+    profile = _active.get()
+    if profile is None:
+        yield
+        return
+    # Only the outermost serializer is timed; nested ones run inside it
+    profile._serializer_depth += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile._serializer_depth -= 1
+        if not profile._serializer_depth:
+            profile.serializer_time += time.perf_counter() - started
+
+
+def timed_serializer(build):
+    """Counts a function building response data from rows as serializer time."""
+    @functools.wraps(build)
+    def wrapper(*args, **kwargs):
+        with serializer_timer():
+            return build(*args, **kwargs)
+    return wrapper
+
+
+def _timed_data(data):
+    def wrapper(self):
+        with serializer_timer():
+            return data.fget(self)
+    wrapper.profiled = True
+    return property(wrapper)
+
+
+def install_serializer_timing():
+    if not getattr(serializers.BaseSerializer.data.fget, 'profiled', False):
+        serializers.BaseSerializer.data = _timed_data(serializers.BaseSerializer.data)
+
+
+def view_name(view_func, method):
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        return f'{view_func.__module__}.{view_func.__name__}'
+    # Viewsets map HTTP methods to actions; @api_view functions keep their own name
+    action = (getattr(view_func, 'actions', None) or {}).get(method.lower(), method.lower())
+    return f'{cls.__name__}.{action}'
+
+
+class ProfilingMiddleware:
+    """
+    Opt-in per-request profiling (settings.REQUEST_PROFILING): query count,
+    DB time, serializer time and view time, tagged by DRF view and action,
+    reported as a Server-Timing header and to the configured sinks.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        config = get_config()
+        if not config['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.server_timing = config['SERVER_TIMING']
+        self.threshold = config['N_PLUS_ONE_THRESHOLD']
+        self.sinks = [get_sink(path) for path in config['SINKS']]
+        install_serializer_timing()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def start(self, request):
+        profile = RequestProfile()
+        profile.method = request.method
+        request.profile = profile
+        profile.started = time.perf_counter()
+        return profile, _active.set(profile)
+
+    def wrap_connections(self, profile):
+        # Connections belong to a thread, so this must run in the one making the queries
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(profile))
+        return stack
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        profile, token = self.start(request)
+        try:
+            with self.wrap_connections(profile):
+                response = self.get_response(request)
+        finally:
+            _active.reset(token)
+        return self.finish(profile, response)
+
+    async def __acall__(self, request):
+        profile, token = self.start(request)
+        try:
+            # The request's sync_to_async calls, and so its queries, all run in one thread
+            wrappers = await sync_to_async(self.wrap_connections)(profile)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(wrappers.close)()
+        finally:
+            _active.reset(token)
+        return self.finish(profile, response)
+
+    def finish(self, profile, response):
+        finished = time.perf_counter()
+        profile.total = finished - profile.started
+        if profile.view_started is not None:
+            profile.view_time = finished - profile.view_started
+        profile.status = response.status_code
+        profile.view = profile.view or 'unresolved'
+        profile.n_plus_one = [
+            (template, count) for template, count in profile.queries.most_common()
+            if count > self.threshold
+        ]
+
+        if self.server_timing:
+            response['Server-Timing'] = profile.server_timing()
+        for sink in self.sinks:
+            try:
+                sink.record(profile)
+            except Exception:
+                logger.exception('Profiling sink %r failed', sink)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profile = getattr(request, 'profile', None)
+        if profile is not None:
+            profile.view = view_name(view_func, request.method)
+            # The handler renders DRF responses before returning, so view time includes rendering
+            profile.view_started = time.perf_counter()
+
+
+class LogSink:
+    def record(self, profile):
+        logger.info(
+            '%s %s %s queries=%d db=%.1fms serializer=%.1fms view=%.1fms total=%.1fms',
+            profile.view, profile.method, profile.status, profile.query_count,
+            profile.db_time * 1000, profile.serializer_time * 1000,
+            profile.view_time * 1000, profile.total * 1000,
+        )
+        for template, count in profile.n_plus_one:
+            logger.warning('Possible N+1 in %s: %d x %s', profile.view, count, template)
+
+
+class PrometheusSink:
+    """Aggregates profiles in process memory and renders them in the Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._requests = Counter()
+            self._durations = {}
+            self._sums = Counter()
+
+    def record(self, profile):
+        with self._lock:
+            self._requests[(profile.view, profile.method, profile.status)] += 1
+            buckets = self._durations.setdefault(profile.view, [0] * (len(DURATION_BUCKETS) + 1))
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if profile.total <= bound:
+                    buckets[i] += 1
+            buckets[-1] += 1
+            self._sums[('request_duration_seconds', profile.view)] += profile.total
+            self._sums[('db_duration_seconds', profile.view)] += profile.db_time
+            self._sums[('serializer_duration_seconds', profile.view)] += profile.serializer_time
+            self._sums[('db_queries', profile.view)] += profile.query_count
+            self._sums[('n_plus_one', profile.view)] += len(profile.n_plus_one)
+
+    def render(self):
+        with self._lock:
+            lines = ['# TYPE api_requests_total counter']
+            for (view, method, status), count in sorted(self._requests.items()):
+                lines.append(f'api_requests_total{{view="{view}",method="{method}",status="{status}"}} {count}')
+
+            lines.append('# TYPE api_request_duration_seconds histogram')
+            for view, buckets in sorted(self._durations.items()):
+                for bound, count in zip(DURATION_BUCKETS, buckets):
+                    lines.append(f'api_request_duration_seconds_bucket{{view="{view}",le="{bound}"}} {count}')
+                lines.append(f'api_request_duration_seconds_bucket{{view="{view}",le="+Inf"}} {buckets[-1]}')
+                lines.append(
+                    f'api_request_duration_seconds_sum{{view="{view}"}} '
+                    f'{self._sums[("request_duration_seconds", view)]:.6f}'
+                )
+                lines.append(f'api_request_duration_seconds_count{{view="{view}"}} {buckets[-1]}')
+
+            for name in ('db_duration_seconds', 'serializer_duration_seconds', 'db_queries', 'n_plus_one'):
+                lines.append(f'# TYPE api_{name}_total counter')
+                for (metric, view), value in sorted(self._sums.items()):
+                    if metric == name:
+                        lines.append(f'api_{name}_total{{view="{view}"}} {value:g}')
+            return '\n'.join(lines) + '\n'
+
+
+_sinks = {}
+
+
+def get_sink(path):
+    # Sinks are shared per process so the metrics endpoint sees what the middleware records
+    if path not in _sinks:
+        _sinks[path] = import_string(path)()
+    return _sinks[path]
@@ -0,0 +1,229 @@
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, connections, transaction
+from django.utils import timezone
+
+from .models import Module, Page, UserProgress
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': False,
+    # Seconds between background flushes; 0 disables the flush thread
+    'FLUSH_INTERVAL': 1.0,
+    # Flush inline once this many (user, module) rows are pending
+    'MAX_PENDING': 5000,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'PROGRESS_WRITE_BEHIND', {})}
+
+
+def is_enabled():
+    return get_config()['ENABLED']
+
+
+def merged_progress(entry, stored):
+    """The progress a read shows for a pending ``entry`` over the ``stored`` value, None without a row."""
+    if entry['monotonic'] and stored is not None:
+        # The flush will keep whichever is higher
+        return max(entry['progress'], stored)
+    return entry['progress']
+
+
+class ProgressBuffer:
+    """
+    Coalesces progress writes per (user, module) in process memory and
+    flushes them to the database in bulk upserts. Only the latest value of
+    each row is kept, so a burst of page turns costs one write.
+
+    The buffer is per process: reads served by this process see pending
+    values, other workers see them once flushed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # {user_id: {module_id: entry}}, so a user's reads and flushes don't scan everyone's rows
+        self._pending = {}
+        self._pending_rows = 0
+        self._thread = None
+        self._writes = 0
+        self._flushed_rows = 0
+        self._flushes = 0
+        self._flush_seconds = 0.0
+        self._last_flush_seconds = 0.0
+
+    def record(self, user_id, module_id, progress, last_page_viewed_id=None, monotonic=False):
+        with self._lock:
+            user_pending = self._pending.setdefault(user_id, {})
+            previous = user_pending.get(module_id)
+            if previous is None:
+                self._pending_rows += 1
+            else:
+                if monotonic:
+                    progress = max(progress, previous['progress'])
+                    # A pending plain write would have set the row outright,
+                    # so the merged write must as well
+                    monotonic = previous['monotonic']
+                if last_page_viewed_id is None:
+                    last_page_viewed_id = previous['last_page_viewed_id']
+            entry = {
+                'progress': float(progress),
+                'last_page_viewed_id': last_page_viewed_id,
+                'monotonic': monotonic,
+                'updated_at': timezone.now(),
+            }
+            user_pending[module_id] = entry
+            self._writes += 1
+            pending_count = self._pending_rows
+
+        config = get_config()
+        if pending_count >= config['MAX_PENDING']:
+            self.flush()
+        elif config['FLUSH_INTERVAL']:
+            self._ensure_thread(config['FLUSH_INTERVAL'])
+        return entry
+
+    def pending_for(self, user_id):
+        """Return {module_id: entry} for the user's writes not flushed yet."""
+        with self._lock:
+            return {module_id: dict(entry) for module_id, entry in self._pending.get(user_id, {}).items()}
+
+    def has_pending(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                return bool(self._pending)
+            return user_id in self._pending
+
+    def flush(self, user_id=None):
+        with self._flush_lock:
+            with self._lock:
+                if user_id is None:
+                    pending, self._pending = self._pending, {}
+                else:
+                    pending = {user_id: self._pending.pop(user_id)} if user_id in self._pending else {}
+                batch = {
+                    (pending_user_id, module_id): entry
+                    for pending_user_id, entries in pending.items()
+                    for module_id, entry in entries.items()
+                }
+                self._pending_rows -= len(batch)
+            if not batch:
+                return 0
+
+            started = time.perf_counter()
+            try:
+                self._write(batch)
+            except DatabaseError:
+                # Put the rows back unless a newer write has replaced them
+                with self._lock:
+                    for (pending_user_id, module_id), entry in batch.items():
+                        user_pending = self._pending.setdefault(pending_user_id, {})
+                        if module_id not in user_pending:
+                            user_pending[module_id] = entry
+                            self._pending_rows += 1
+                raise
+            elapsed = time.perf_counter() - started
+
+            with self._lock:
+                self._flushes += 1
+                self._flushed_rows += len(batch)
+                self._flush_seconds += elapsed
+                self._last_flush_seconds = elapsed
+            return len(batch)
+
+    def _write(self, batch):
+        # Modules or pages may have been deleted since the writes were buffered
+        module_ids = set(Module.objects.filter(
+            pk__in={module_id for _, module_id in batch}
+        ).values_list('pk', flat=True))
+        pages = dict(Page.objects.filter(
+            pk__in={e['last_page_viewed_id'] for e in batch.values() if e['last_page_viewed_id']}
+        ).values_list('pk', 'module_id'))
+
+        rows = {True: [], False: []}
+        for (user_id, module_id), entry in batch.items():
+            page_id = entry['last_page_viewed_id']
+            if module_id not in module_ids or (page_id is not None and pages.get(page_id) != module_id):
+                continue
+            rows[entry['monotonic']].append((
+                user_id,
+                module_id,
+                entry['progress'],
+                entry['last_page_viewed_id'],
+                entry['updated_at'],
+            ))
+        for monotonic, monotonic_rows in rows.items():
+            if not monotonic_rows:
+                continue
+            try:
+                with transaction.atomic():
+                    UserProgress.objects.bulk_upsert(monotonic_rows, monotonic=monotonic)
+            except IntegrityError:
+                # Lost a race with a delete; the guarded single-row upsert skips those rows
+                for user_id, module_id, progress, last_page_viewed_id, _ in monotonic_rows:
+                    UserProgress.objects.upsert(
+                        user_id, module_id, progress, last_page_viewed_id, monotonic=monotonic
+                    )
+
+    def _ensure_thread(self, interval):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._run, args=(interval,), name='progress-flush', daemon=True
+            )
+            self._thread.start()
+
+    def _run(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Progress write-behind flush failed')
+            finally:
+                connections.close_all()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pending': self._pending_rows,
+                'writes': self._writes,
+                'flushed_rows': self._flushed_rows,
+                'flushes': self._flushes,
+                # Writes received per row actually written
+                'coalescing_ratio': self._writes / self._flushed_rows if self._flushed_rows else 0,
+                'last_flush_ms': self._last_flush_seconds * 1000,
+                'avg_flush_ms': self._flush_seconds / self._flushes * 1000 if self._flushes else 0,
+            }
+
+    def reset(self):
+        with self._lock:
+            self._pending = {}
+            self._pending_rows = 0
+            self._writes = 0
+            self._flushed_rows = 0
+            self._flushes = 0
+            self._flush_seconds = 0.0
+            self._last_flush_seconds = 0.0
+
+
+progress_buffer = ProgressBuffer()
+
+
+@atexit.register
+def flush_on_shutdown():
+    if progress_buffer.has_pending():
+        try:
+            progress_buffer.flush()
+        except Exception:
+            logger.exception('Progress write-behind flush failed on shutdown')
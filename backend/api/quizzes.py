@@ -0,0 +1,58 @@
+from django.http import Http404
+from django.utils import timezone
+
+from . import cache as module_cache
+from .models import Module, QuizAttempt, QuizOption
+
+# Quizzes are graded on the server, so learners never receive is_correct.
+# Each module's answer key maps quiz page ids to (option ids, correct option
+# ids), built with one query and cached under the module's content version,
+# which every Page and QuizOption write bumps.
+
+
+def build_answer_key(module_id):
+    rows = QuizOption.objects.filter(
+        page__module_id=module_id, page__type='quiz'
+    ).order_by().values_list('page_id', 'id', 'is_correct')
+    options, correct = {}, {}
+    for page_id, option_id, is_correct in rows:
+        options.setdefault(page_id, set()).add(option_id)
+        if is_correct:
+            correct.setdefault(page_id, set()).add(option_id)
+    if not options and not Module.objects.filter(pk=module_id).exists():
+        raise Http404
+    return {
+        page_id: (frozenset(option_ids), frozenset(correct.get(page_id, ())))
+        for page_id, option_ids in options.items()
+    }
+
+
+def get_answer_key(module_id):
+    return module_cache.get_answer_key(module_id, lambda: build_answer_key(module_id))
+
+
+def grade(answer_key, answers):
+    """Grade ``[{'page': id, 'options': [ids]}]``; an answer is correct when it picks exactly the correct options."""
+    return [
+        {
+            'page': answer['page'],
+            'selected': sorted(set(answer['options'])),
+            'correct': set(answer['options']) == answer_key[answer['page']][1],
+        }
+        for answer in answers
+    ]
+
+
+def record_attempts(user_id, module_id, results):
+    now = timezone.now()
+    QuizAttempt.objects.bulk_create([
+        QuizAttempt(
+            user_id=user_id,
+            module_id=module_id,
+            page_id=result['page'],
+            selected=result['selected'],
+            is_correct=result['correct'],
+            created_at=now,
+        )
+        for result in results
+    ])
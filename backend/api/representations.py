@@ -0,0 +1,162 @@
+from datetime import timezone as dt_timezone
+
+from django.utils import timezone
+from rest_framework import serializers
+
+from . import profiling
+from .models import Module, Page, QuizOption
+
+# Read-only builders for the hottest response shapes, producing the same
+# JSON as ModuleSerializer and UserProgressSerializer from .values() rows:
+# no model instances and no per-field serializer dispatch. The DRF
+# serializers remain the source of truth for writes and validation, and
+# the tests compare the two renderings byte for byte.
+
+MODULE_FIELDS = ('id', 'title', 'description', 'category', 'created_at', 'updated_at')
+PAGE_FIELDS = ('id', 'module_id', 'type', 'content', 'position', 'created_at', 'updated_at')
+OPTION_FIELDS = ('id', 'page_id', 'text', 'is_correct')
+PROGRESS_FIELDS = ('id', 'user_id', 'module_id', 'progress', 'last_page_viewed_id', 'updated_at', 'completed_at')
+
+_drf_datetime = serializers.DateTimeField().to_representation
+
+
+def datetime_formatter():
+    """A function formatting timestamps exactly as serializers.DateTimeField does, in the current time zone."""
+    # Looking the zone up is slower than formatting, so it is done once per response
+    if timezone.get_current_timezone_name() != 'UTC':
+        return _drf_datetime
+
+    def format_utc(value):
+        # DRF converts to the current zone first, a no-op for rows read in UTC
+        if value is not None and value.tzinfo is dt_timezone.utc:
+            return value.isoformat()[:-6] + 'Z'
+        return _drf_datetime(value)
+
+    return format_utc
+
+
+def module_tree_querysets(module_id):
+    """The module, its pages and their options as .values() querysets, in serializer order."""
+    return (
+        Module.objects.filter(pk=module_id).values(*MODULE_FIELDS),
+        Page.objects.with_position().filter(module_id=module_id).values(*PAGE_FIELDS),
+        QuizOption.objects.filter(page__module_id=module_id).values(*OPTION_FIELDS),
+    )
+
+
+@profiling.timed_serializer
+def build_module_tree(module, pages, options, answers=False):
+    """ModuleSerializer(module, context={'answers': answers}).data, from rows."""
+    datetime_repr = datetime_formatter()
+    page_options, correct_counts = {}, {}
+    for row in options:
+        option = {'id': row['id'], 'text': row['text']}
+        if answers:
+            option['is_correct'] = row['is_correct']
+        page_options.setdefault(row['page_id'], []).append(option)
+        correct_counts[row['page_id']] = correct_counts.get(row['page_id'], 0) + row['is_correct']
+    return {
+        'id': module['id'],
+        'title': module['title'],
+        'description': module['description'],
+        'category': module['category'],
+        'pages': [
+            {
+                'id': page['id'],
+                'module': page['module_id'],
+                'type': page['type'],
+                'content': page['content'],
+                'order': page['position'],
+                'quiz_options': page_options.get(page['id'], []),
+                'multiple_answers': page['type'] == 'quiz' and correct_counts.get(page['id'], 0) > 1,
+                'created_at': datetime_repr(page['created_at']),
+                'updated_at': datetime_repr(page['updated_at']),
+            }
+            for page in pages
+        ],
+        # Trees are cached without a user; views fill in the reader's progress
+        'progress': 0,
+        'created_at': datetime_repr(module['created_at']),
+        'updated_at': datetime_repr(module['updated_at']),
+    }
+
+
+def module_tree(module_id, answers=False):
+    """The module's tree, or None when it doesn't exist."""
+    module_rows, page_rows, option_rows = module_tree_querysets(module_id)
+    module = module_rows.first()
+    if module is None:
+        return None
+    pages = list(page_rows)
+    return build_module_tree(module, pages, list(option_rows) if pages else [], answers)
+
+
+async def amodule_tree(module_id, answers=False):
+    module_rows, page_rows, option_rows = module_tree_querysets(module_id)
+    module = await module_rows.afirst()
+    if module is None:
+        return None
+    pages = [row async for row in page_rows]
+    options = [row async for row in option_rows] if pages else []
+    return build_module_tree(module, pages, options, answers)
+
+
+def progress_item(row, datetime_repr):
+    """UserProgressSerializer(progress).data, from a PROGRESS_FIELDS row."""
+    return {
+        'id': row['id'],
+        'user': row['user_id'],
+        'module': row['module_id'],
+        'progress': float(row['progress']),
+        'last_page_viewed': row['last_page_viewed_id'],
+        'updated_at': datetime_repr(row['updated_at']),
+        'completed_at': datetime_repr(row['completed_at']),
+    }
+
+
+@profiling.timed_serializer
+def progress_items(rows):
+    datetime_repr = datetime_formatter()
+    return [progress_item(row, datetime_repr) for row in rows]
+
+
+def progress_list(queryset):
+    return progress_items(list(queryset.values(*PROGRESS_FIELDS)))
+
+
+async def aprogress_list(queryset):
+    return progress_items([row async for row in queryset.values(*PROGRESS_FIELDS)])
+
+
+def parse_fieldset(value):
+    """
+    Parse a ``?fields=`` value such as ``id,title,pages.id,pages.type`` into
+    ``{'id': None, 'title': None, 'pages': {'id': None, 'type': None}}``,
+    where None keeps the whole value. Returns None when no fields are given.
+    """
+    fieldset = {}
+    for path in (value or '').split(','):
+        names = [name.strip() for name in path.split('.')]
+        if not all(names):
+            continue
+        node = fieldset
+        for name in names[:-1]:
+            if name in node and node[name] is None:
+                # The whole value was asked for already
+                break
+            node = node.setdefault(name, {})
+        else:
+            node[names[-1]] = None
+    return fieldset or None
+
+
+def sparse(data, fieldset):
+    """Keep only ``fieldset``'s keys of a representation or a list of them; unknown names are ignored."""
+    if isinstance(data, list):
+        return [sparse(item, fieldset) for item in data]
+    if not isinstance(data, dict):
+        return data
+    return {
+        key: value if fieldset[key] is None else sparse(value, fieldset[key])
+        for key, value in data.items() if key in fieldset
+    }
@@ -0,0 +1,140 @@
+import contextvars
+import random
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+
+# Read-replica routing. Within a request, reads of the catalog and of
+# progress go to a random replica from settings.REPLICA_DATABASES, unless
+# the request is pinned to the primary. A request is pinned when it uses an
+# unsafe method or writes, and its user stays pinned for
+# REPLICA_PIN_SECONDS afterwards, so nobody reads their own writes back
+# from a lagging replica. Every other model, reads outside requests (tasks,
+# management commands), writes and migrations use the primary.
+
+PRIMARY = 'default'
+REPLICA_MODELS = {'api.module', 'api.page', 'api.quizoption', 'api.userprogress'}
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_request_state = contextvars.ContextVar('replica_request_state', default=None)
+_use_primary = contextvars.ContextVar('replica_use_primary', default=False)
+
+
+def get_cache():
+    return caches[getattr(settings, 'REPLICA_PIN_CACHE_ALIAS', 'default')]
+
+
+def _pin_key(user_id):
+    return f'replica:pinned:{user_id}'
+
+
+def pin_user(user_id):
+    get_cache().set(_pin_key(user_id), True, settings.REPLICA_PIN_SECONDS)
+
+
+@contextmanager
+def use_primary():
+    """Read from the primary inside the block, e.g. to fill caches that outlive replica lag."""
+    token = _use_primary.set(True)
+    try:
+        yield
+    finally:
+        _use_primary.reset(token)
+
+
+class RequestState:
+    def __init__(self, request):
+        self.request = request
+        self.writing = request.method not in SAFE_METHODS
+        self.pinned = self.writing
+        self.checked_user_id = None
+
+    def user_pinned(self):
+        user = getattr(self.request, 'user', None)
+        if user is None or not user.is_authenticated:
+            return False
+        # One cache read per request, once authentication has run
+        if user.pk != self.checked_user_id:
+            self.checked_user_id = user.pk
+            self.pinned = bool(get_cache().get(_pin_key(user.pk)))
+        return self.pinned
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = settings.REPLICA_DATABASES
+        state = _request_state.get()
+        if not replicas or state is None or _use_primary.get():
+            return None
+        if model._meta.label_lower not in REPLICA_MODELS:
+            return None
+        if state.pinned or state.user_pinned():
+            return PRIMARY
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            state.writing = state.pinned = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *settings.REPLICA_DATABASES}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get the schema through replication (or sync_replicas)
+        if db in settings.REPLICA_DATABASES:
+            return False
+        return None
+
+
+class ReplicaPinningMiddleware:
+    """Tracks each request for ReplicaRouter and pins users who wrote to the primary for a while."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REPLICA_DATABASES:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = RequestState(request)
+        token = _request_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        user_id = self.writer_id(request, state)
+        if user_id is not None:
+            pin_user(user_id)
+        return response
+
+    async def __acall__(self, request):
+        state = RequestState(request)
+        token = _request_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        user_id = self.writer_id(request, state)
+        if user_id is not None:
+            await sync_to_async(pin_user)(user_id)
+        return response
+
+    def writer_id(self, request, state):
+        user = getattr(request, 'user', None)
+        if state.writing and user is not None and user.is_authenticated:
+            return user.pk
+        return None
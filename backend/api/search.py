@@ -0,0 +1,313 @@
+import html
+import re
+
+from django.conf import settings
+from django.db import connections, router
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+from .models import Module
+
+# Full-text search over module titles, descriptions and page content. The
+# index lives in the database and is maintained there (FTS5 triggers on
+# SQLite, generated tsvector columns on Postgres), installed by migration
+# 0009. SQLite rebuilds a table when a migration alters it, which drops its
+# triggers: run `manage.py search_index --install` after such migrations.
+
+MAX_TERMS = 10
+# Control characters can't occur in the indexed text, so snippets are
+# escaped first and the match markers turned into <mark> afterwards
+MATCH_START = '\x02'
+MATCH_END = '\x03'
+SNIPPET_TOKENS = 16
+# Best scoring hits per table that are ranked. Bounds the work for terms
+# found on most pages; results past this many hits are not reachable.
+MAX_CANDIDATES = 1000
+
+
+def search_terms(query):
+    return re.findall(r'\w+', query.lower())[:MAX_TERMS]
+
+
+def highlight(snippet):
+    return html.escape(snippet).replace(MATCH_START, '<mark>').replace(MATCH_END, '</mark>')
+
+
+class SearchBackend:
+    """
+    Finds modules whose title, description or page content contain every
+    search term, the last one as a prefix. ``search`` returns
+    (module_id, score, snippet) tuples, best match first.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def install(self):
+        pass
+
+    def uninstall(self):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def optimize(self):
+        pass
+
+    def search(self, terms, category=None, limit=20, offset=0):
+        raise NotImplementedError
+
+    def execute(self, sql, params=()):
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+
+class SQLiteSearchBackend(SearchBackend):
+    TOKENIZE = "tokenize='porter unicode61 remove_diacritics 2'"
+
+    INSTALL = [
+        # External content tables: the index stores terms only and reads text from api_module/api_page
+        'CREATE VIRTUAL TABLE IF NOT EXISTS api_module_fts USING fts5('
+        f"title, description, content='api_module', content_rowid='id', {TOKENIZE})",
+        'CREATE VIRTUAL TABLE IF NOT EXISTS api_page_fts USING fts5('
+        f"content, content='api_page', content_rowid='id', {TOKENIZE})",
+
+        'CREATE TRIGGER IF NOT EXISTS api_module_fts_insert AFTER INSERT ON api_module BEGIN '
+        'INSERT INTO api_module_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END',
+        'CREATE TRIGGER IF NOT EXISTS api_module_fts_delete AFTER DELETE ON api_module BEGIN '
+        'INSERT INTO api_module_fts(api_module_fts, rowid, title, description) '
+        "VALUES ('delete', old.id, old.title, old.description); END",
+        'CREATE TRIGGER IF NOT EXISTS api_module_fts_update AFTER UPDATE OF title, description ON api_module BEGIN '
+        'INSERT INTO api_module_fts(api_module_fts, rowid, title, description) '
+        "VALUES ('delete', old.id, old.title, old.description); "
+        'INSERT INTO api_module_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END',
+
+        'CREATE TRIGGER IF NOT EXISTS api_page_fts_insert AFTER INSERT ON api_page BEGIN '
+        'INSERT INTO api_page_fts(rowid, content) VALUES (new.id, new.content); END',
+        'CREATE TRIGGER IF NOT EXISTS api_page_fts_delete AFTER DELETE ON api_page BEGIN '
+        "INSERT INTO api_page_fts(api_page_fts, rowid, content) VALUES ('delete', old.id, old.content); END",
+        # Reorders only touch rank and leave the index alone
+        'CREATE TRIGGER IF NOT EXISTS api_page_fts_update AFTER UPDATE OF content ON api_page BEGIN '
+        "INSERT INTO api_page_fts(api_page_fts, rowid, content) VALUES ('delete', old.id, old.content); "
+        'INSERT INTO api_page_fts(rowid, content) VALUES (new.id, new.content); END',
+    ]
+
+    UNINSTALL = [
+        'DROP TRIGGER IF EXISTS api_module_fts_insert',
+        'DROP TRIGGER IF EXISTS api_module_fts_delete',
+        'DROP TRIGGER IF EXISTS api_module_fts_update',
+        'DROP TRIGGER IF EXISTS api_page_fts_insert',
+        'DROP TRIGGER IF EXISTS api_page_fts_delete',
+        'DROP TRIGGER IF EXISTS api_page_fts_update',
+        'DROP TABLE IF EXISTS api_module_fts',
+        'DROP TABLE IF EXISTS api_page_fts',
+    ]
+
+    # Ranks the best hits of each table, then per module sums their scores
+    # and keeps the best one's kind and id (SQLite takes bare columns from
+    # the MIN() row), so snippets are only built for the modules returned.
+    # bm25() is lower for better matches; title matches weigh most.
+    SEARCH = """
+        WITH module_hits AS (
+            SELECT api_module_fts.rowid AS hit_id, bm25(api_module_fts, 10.0, 4.0) AS score
+            FROM api_module_fts {module_join}
+            WHERE api_module_fts MATCH %s ORDER BY score LIMIT %s
+        ), page_hits AS (
+            SELECT api_page_fts.rowid AS hit_id, bm25(api_page_fts) AS score
+            FROM api_page_fts {page_join}
+            WHERE api_page_fts MATCH %s ORDER BY score LIMIT %s
+        ), hits AS (
+            SELECT hit_id AS module_id, score, 'module' AS kind, hit_id FROM module_hits
+            UNION ALL
+            SELECT api_page.module_id, page_hits.score, 'page', page_hits.hit_id
+            FROM page_hits JOIN api_page ON api_page.id = page_hits.hit_id
+        )
+        SELECT module_id, SUM(score) AS total, MIN(score), kind, hit_id
+        FROM hits
+        GROUP BY module_id
+        ORDER BY total, module_id
+        LIMIT %s OFFSET %s
+    """
+
+    CATEGORY_JOINS = {
+        'module': 'JOIN api_module ON api_module.id = api_module_fts.rowid AND api_module.category = %s',
+        'page': 'JOIN api_page ON api_page.id = api_page_fts.rowid '
+                'JOIN api_module ON api_module.id = api_page.module_id AND api_module.category = %s',
+    }
+
+    SNIPPETS = """
+        SELECT rowid, snippet({table}, -1, %s, %s, '…', %s)
+        FROM {table} WHERE {table} MATCH %s AND rowid IN ({ids})
+    """
+
+    def install(self):
+        for statement in self.INSTALL:
+            self.execute(statement)
+
+    def uninstall(self):
+        for statement in self.UNINSTALL:
+            self.execute(statement)
+
+    def rebuild(self):
+        self.execute("INSERT INTO api_module_fts(api_module_fts) VALUES ('rebuild')")
+        self.execute("INSERT INTO api_page_fts(api_page_fts) VALUES ('rebuild')")
+
+    def optimize(self):
+        # Merge the segments that row-by-row trigger inserts leave behind
+        self.execute("INSERT INTO api_module_fts(api_module_fts) VALUES ('optimize')")
+        self.execute("INSERT INTO api_page_fts(api_page_fts) VALUES ('optimize')")
+
+    def match_expression(self, terms):
+        return ' '.join(f'"{term}"' for term in terms) + '*'
+
+    def search(self, terms, category=None, limit=20, offset=0):
+        match = self.match_expression(terms)
+        category_params = [category] if category else []
+        sql = self.SEARCH.format(
+            module_join=self.CATEGORY_JOINS['module'] if category else '',
+            page_join=self.CATEGORY_JOINS['page'] if category else '',
+        )
+        rows = self.execute(sql, [
+            *category_params, match, MAX_CANDIDATES,
+            *category_params, match, MAX_CANDIDATES,
+            limit, offset,
+        ])
+
+        snippets = {}
+        for kind, table in (('module', 'api_module_fts'), ('page', 'api_page_fts')):
+            ids = [row[4] for row in rows if row[3] == kind]
+            if ids:
+                sql = self.SNIPPETS.format(table=table, ids=', '.join(['%s'] * len(ids)))
+                for hit_id, snippet in self.execute(sql, [MATCH_START, MATCH_END, SNIPPET_TOKENS, match] + ids):
+                    snippets[kind, hit_id] = snippet
+        return [(module_id, -total, snippets.get((kind, hit_id), ''))
+                for module_id, total, _, kind, hit_id in rows]
+
+
+class PostgresSearchBackend(SearchBackend):
+    INSTALL = [
+        'ALTER TABLE api_module ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ('
+        "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(description, '')), 'B')) STORED",
+        'CREATE INDEX IF NOT EXISTS api_module_search_idx ON api_module USING gin (search_vector)',
+        'ALTER TABLE api_page ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ('
+        "to_tsvector('english', coalesce(content, ''))) STORED",
+        'CREATE INDEX IF NOT EXISTS api_page_search_idx ON api_page USING gin (search_vector)',
+    ]
+
+    UNINSTALL = [
+        'DROP INDEX IF EXISTS api_module_search_idx',
+        'ALTER TABLE api_module DROP COLUMN IF EXISTS search_vector',
+        'DROP INDEX IF EXISTS api_page_search_idx',
+        'ALTER TABLE api_page DROP COLUMN IF EXISTS search_vector',
+    ]
+
+    SEARCH = """
+        WITH q AS (SELECT to_tsquery('english', %s) AS query),
+        module_hits AS (
+            SELECT api_module.id AS hit_id, ts_rank(api_module.search_vector, q.query) AS score
+            FROM api_module, q
+            WHERE api_module.search_vector @@ q.query {module_filter}
+            ORDER BY score DESC LIMIT %s
+        ), page_hits AS (
+            SELECT api_page.id AS hit_id, api_page.module_id, ts_rank(api_page.search_vector, q.query) * 0.4 AS score
+            FROM api_page {page_join}, q
+            WHERE api_page.search_vector @@ q.query
+            ORDER BY score DESC LIMIT %s
+        ), hits AS (
+            SELECT hit_id AS module_id, score, 'module' AS kind, hit_id FROM module_hits
+            UNION ALL
+            SELECT module_id, score, 'page', hit_id FROM page_hits
+        )
+        SELECT module_id, SUM(score) AS total,
+               (array_agg(kind ORDER BY score DESC))[1],
+               (array_agg(hit_id ORDER BY score DESC))[1]
+        FROM hits
+        GROUP BY module_id
+        ORDER BY total DESC, module_id
+        LIMIT %s OFFSET %s
+    """
+
+    SNIPPETS = """
+        SELECT id, ts_headline('english', {column}, to_tsquery('english', %s), %s)
+        FROM {table} WHERE id = ANY(%s)
+    """
+
+    def install(self):
+        for statement in self.INSTALL:
+            self.execute(statement)
+
+    def uninstall(self):
+        for statement in self.UNINSTALL:
+            self.execute(statement)
+
+    def tsquery(self, terms):
+        return ' & '.join(terms) + ':*'
+
+    def search(self, terms, category=None, limit=20, offset=0):
+        query = self.tsquery(terms)
+        category_params = [category] if category else []
+        sql = self.SEARCH.format(
+            module_filter='AND api_module.category = %s' if category else '',
+            page_join='JOIN api_module ON api_module.id = api_page.module_id AND api_module.category = %s'
+            if category else '',
+        )
+        rows = self.execute(sql, [
+            query,
+            *category_params, MAX_CANDIDATES,
+            *category_params, MAX_CANDIDATES,
+            limit, offset,
+        ])
+
+        options = f'StartSel={MATCH_START}, StopSel={MATCH_END}, MaxWords={SNIPPET_TOKENS}, MinWords=5'
+        snippets = {}
+        for kind, table, column in (('module', 'api_module', "title || ' ' || description"),
+                                    ('page', 'api_page', 'content')):
+            ids = [row[3] for row in rows if row[2] == kind]
+            if ids:
+                sql = self.SNIPPETS.format(table=table, column=column)
+                for hit_id, snippet in self.execute(sql, [query, options, ids]):
+                    snippets[kind, hit_id] = snippet
+        return [(module_id, float(total), snippets.get((kind, hit_id), ''))
+                for module_id, total, kind, hit_id in rows]
+
+
+class ScanSearchBackend(SearchBackend):
+    """LIKE scans through the ORM, for databases without a full-text index. Unranked, no snippets."""
+
+    def search(self, terms, category=None, limit=20, offset=0):
+        queryset = Module.objects.all()
+        if category:
+            queryset = queryset.filter(category=category)
+        for term in terms:
+            queryset = queryset.filter(
+                Q(title__icontains=term) | Q(description__icontains=term) | Q(pages__content__icontains=term)
+            )
+        module_ids = queryset.distinct().order_by('-created_at').values_list('id', flat=True)
+        return [(module_id, 0.0, '') for module_id in module_ids[offset:offset + limit]]
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_backend(connection=None):
+    connection = connection or connections[router.db_for_read(Module)]
+    path = getattr(settings, 'SEARCH_BACKEND', None)
+    backend_class = import_string(path) if path else BACKENDS.get(connection.vendor, ScanSearchBackend)
+    return backend_class(connection)
+
+
+def search_modules(query, category=None, limit=20, offset=0):
+    """Return [{'id', 'score', 'snippet'}] for the modules matching ``query``, best first."""
+    terms = search_terms(query)
+    if not terms:
+        return []
+    return [
+        {'id': module_id, 'score': score, 'snippet': highlight(snippet)}
+        for module_id, score, snippet in get_backend().search(terms, category, limit, offset)
+    ]
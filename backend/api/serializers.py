@@ -1,13 +1,23 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from .authentication import add_user_claims
 from .models import Module, Page, UserProgress, QuizOption, User
+from .ordering import rank_fits_position, rank_for_position, rewrite_ranks, spaced_rank
+from .progress_buffer import merged_progress
 
 User = get_user_model()
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     username_field = 'email'
 
+    @classmethod
+    def get_token(cls, user):
+        return add_user_claims(super().get_token(user), user)
+
     def validate(self, attrs):
         credentials = {
             'email': attrs.get('email'),
@@ -22,12 +32,12 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
 
 class UserSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=False)
-    saved_modules = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
     
     class Meta:
         model = User
-        fields = ('id', 'email', 'first_name', 'last_name', 'password', 'is_admin', 'is_superuser', 'saved_modules')
-        read_only_fields = ('is_admin', 'is_superuser')
+        fields = ('id', 'email', 'first_name', 'last_name', 'password', 'is_admin', 'is_superuser',
+                  'completed_modules_count')
+        read_only_fields = ('is_admin', 'is_superuser', 'completed_modules_count')
         extra_kwargs = {
             'password': {'write_only': True}
         }
@@ -61,15 +71,53 @@ class QuizOptionSerializer(serializers.ModelSerializer):
         model = QuizOption
         fields = ['id', 'text', 'is_correct']
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Learners submit answers for grading instead (see api.quizzes)
+        if not self.context.get('answers'):
+            del data['is_correct']
+        return data
+
+class PagePositionField(serializers.IntegerField):
+    """A page's 0-based position in its module, derived from the rank ordering."""
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        position = super().to_internal_value(data)
+        if position < 0:
+            self.fail('min_value', min_value=0)
+        return {'order': position}
+
+    def to_representation(self, page):
+        position = getattr(page, 'position', None)
+        if position is None:
+            # Single pages outside a with_position() queryset
+            position = Page.objects.filter(module_id=page.module_id).filter(
+                Q(rank__lt=page.rank) | Q(rank=page.rank, id__lt=page.id)
+            ).count()
+        return position
+
 class PageSerializer(serializers.ModelSerializer):
     quiz_options = QuizOptionSerializer(many=True, required=False)
     module = serializers.PrimaryKeyRelatedField(queryset=Module.objects.all(), required=False)
+    order = PagePositionField(required=False)
+    multiple_answers = serializers.SerializerMethodField()
 
     class Meta:
         model = Page
-        fields = ['id', 'module', 'type', 'content', 'order', 'quiz_options', 'created_at', 'updated_at']
+        fields = ['id', 'module', 'type', 'content', 'order', 'quiz_options', 'multiple_answers',
+                  'created_at', 'updated_at']
         read_only_fields = ['created_at', 'updated_at']
 
+    def get_multiple_answers(self, page):
+        # Lets the quiz offer checkboxes rather than radio buttons without revealing the answers
+        if page.type != 'quiz':
+            return False
+        return sum(option.is_correct for option in page.quiz_options.all()) > 1
+
     def validate(self, data):
         if data.get('type') == 'quiz':
             quiz_options = self.initial_data.get('quiz_options', [])
@@ -91,6 +139,10 @@ class PageSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         quiz_options_data = validated_data.pop('quiz_options', [])
+        # Appends unless an explicit position was requested
+        validated_data['rank'] = rank_for_position(
+            validated_data['module'].id, validated_data.pop('order', None)
+        )
         page = Page.objects.create(**validated_data)
 
         if page.type == 'quiz':
@@ -100,14 +152,22 @@ class PageSerializer(serializers.ModelSerializer):
         return page
 
     def update(self, instance, validated_data):
-        quiz_options_data = validated_data.pop('quiz_options', [])
+        quiz_options_data = validated_data.pop('quiz_options', None)
+        position = validated_data.pop('order', None)
+
+        # Moving a page only rewrites its own rank
+        if position is not None and not rank_fits_position(
+            instance.rank, instance.module_id, position, exclude_pk=instance.pk
+        ):
+            instance.rank = rank_for_position(instance.module_id, position, exclude_pk=instance.pk)
         
         # Update page fields
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
         instance.save()
 
-        if instance.type == 'quiz':
+        # Options are only replaced when the payload carries them
+        if instance.type == 'quiz' and quiz_options_data is not None:
             # Delete existing options
             instance.quiz_options.all().delete()
             # Create new options
@@ -116,6 +176,148 @@ class PageSerializer(serializers.ModelSerializer):
 
         return instance
 
+class BulkQuizOptionSerializer(serializers.Serializer):
+    id = serializers.IntegerField(required=False)
+    text = serializers.CharField(max_length=255)
+    is_correct = serializers.BooleanField(required=False, default=False)
+
+class BulkPageSerializer(serializers.Serializer):
+    id = serializers.IntegerField(required=False)
+    type = serializers.ChoiceField(choices=Page._meta.get_field('type').choices)
+    content = serializers.CharField(allow_blank=True)
+    quiz_options = BulkQuizOptionSerializer(many=True, required=False, default=list)
+
+    def validate(self, data):
+        if data['type'] == 'quiz':
+            if not data['quiz_options']:
+                raise serializers.ValidationError({
+                    'quiz_options': 'Quiz options are required for quiz pages'
+                })
+            if not any(option['is_correct'] for option in data['quiz_options']):
+                raise serializers.ValidationError({
+                    'quiz_options': 'At least one option must be marked as correct'
+                })
+        else:
+            data['quiz_options'] = []
+        return data
+
+class PageBulkWriteSerializer(serializers.Serializer):
+    """
+    Replaces a module's ordered page list in one transaction. Pages and options
+    carrying an ``id`` are updated when changed, the others are created, and
+    stored ones missing from the payload are deleted.
+    """
+    pages = BulkPageSerializer(many=True)
+
+    def update(self, module, validated_data):
+        now = timezone.now()
+        existing_pages = {page.id: page for page in module.pages.prefetch_related('quiz_options')}
+        page_ids = [page['id'] for page in validated_data['pages'] if 'id' in page]
+        if len(page_ids) != len(set(page_ids)) or not set(page_ids) <= set(existing_pages):
+            raise serializers.ValidationError({'pages': 'Unknown or duplicate page ids'})
+
+        pages_to_create, pages_to_update, page_options = [], [], []
+        for position, page_data in enumerate(validated_data['pages']):
+            fields = {
+                'type': page_data['type'],
+                'content': page_data['content'],
+                'rank': spaced_rank(position),
+            }
+            if 'id' in page_data:
+                page = existing_pages[page_data['id']]
+                if any(getattr(page, field) != value for field, value in fields.items()):
+                    for field, value in fields.items():
+                        setattr(page, field, value)
+                    page.updated_at = now
+                    pages_to_update.append(page)
+            else:
+                page = Page(module=module, **fields)
+                pages_to_create.append(page)
+            page_options.append((page, page_data['quiz_options']))
+
+        with transaction.atomic():
+            deleted_page_ids = set(existing_pages) - set(page_ids)
+            if deleted_page_ids:
+                Page.objects.filter(pk__in=deleted_page_ids).delete()
+            Page.objects.bulk_update(pages_to_update, ['type', 'content', 'rank', 'updated_at'])
+            Page.objects.bulk_create(pages_to_create)
+
+            options_to_create, options_to_update, options_to_delete = [], [], []
+            for page, options_data in page_options:
+                existing_options = (
+                    {option.id: option for option in page.quiz_options.all()}
+                    if page.id in existing_pages else {}
+                )
+                kept = set()
+                for option_data in options_data:
+                    option_id = option_data.get('id')
+                    if option_id is None:
+                        options_to_create.append(QuizOption(
+                            page=page, text=option_data['text'], is_correct=option_data['is_correct']
+                        ))
+                        continue
+                    if option_id not in existing_options or option_id in kept:
+                        raise serializers.ValidationError({'quiz_options': 'Unknown or duplicate option ids'})
+                    kept.add(option_id)
+                    option = existing_options[option_id]
+                    if option.text != option_data['text'] or option.is_correct != option_data['is_correct']:
+                        option.text = option_data['text']
+                        option.is_correct = option_data['is_correct']
+                        option.updated_at = now
+                        options_to_update.append(option)
+                options_to_delete += set(existing_options) - kept
+
+            if options_to_delete:
+                QuizOption.objects.filter(pk__in=options_to_delete).delete()
+            QuizOption.objects.bulk_update(options_to_update, ['text', 'is_correct', 'updated_at'])
+            QuizOption.objects.bulk_create(options_to_create)
+        return module
+
+class PageReorderSerializer(serializers.Serializer):
+    page_ids = serializers.ListField(child=serializers.IntegerField())
+
+    def validate_page_ids(self, page_ids):
+        module = self.context['module']
+        if len(page_ids) != len(set(page_ids)) or set(page_ids) != set(module.pages.values_list('id', flat=True)):
+            raise serializers.ValidationError('Must list every page of the module exactly once')
+        return page_ids
+
+    def update(self, module, validated_data):
+        # One UPDATE ... SET rank = CASE id WHEN ... END for the whole module
+        rewrite_ranks(module.id, validated_data['page_ids'])
+        return module
+
+class SavedModulesSerializer(serializers.Serializer):
+    add = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, max_length=1000)
+    remove = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, max_length=1000)
+
+    def validate(self, data):
+        if not data.get('add') and not data.get('remove'):
+            raise serializers.ValidationError('Provide module ids to add or remove')
+        if set(data.get('add', [])) & set(data.get('remove', [])):
+            raise serializers.ValidationError('A module cannot be both added and removed')
+        return data
+
+class QuizAnswerSerializer(serializers.Serializer):
+    page = serializers.IntegerField()
+    options = serializers.ListField(child=serializers.IntegerField(), max_length=100)
+
+class QuizSubmissionSerializer(serializers.Serializer):
+    answers = QuizAnswerSerializer(many=True, allow_empty=False, max_length=500)
+
+    def validate_answers(self, answers):
+        answer_key = self.context['answer_key']
+        pages = [answer['page'] for answer in answers]
+        if len(pages) != len(set(pages)):
+            raise serializers.ValidationError('Each page can be answered once per submission')
+        unknown = [page for page in pages if page not in answer_key]
+        if unknown:
+            raise serializers.ValidationError(f'Not quiz pages of this module: {unknown}')
+        for answer in answers:
+            if not set(answer['options']) <= answer_key[answer['page']][0]:
+                raise serializers.ValidationError(f"Unknown options for page {answer['page']}")
+        return answers
+
 class ModuleSerializer(serializers.ModelSerializer):
     pages = PageSerializer(many=True, read_only=True)
     progress = serializers.SerializerMethodField()
@@ -126,15 +328,53 @@ class ModuleSerializer(serializers.ModelSerializer):
 
     def get_progress(self, obj):
         request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            try:
-                progress = UserProgress.objects.get(user=request.user, module=obj)
-                return progress.progress
-            except UserProgress.DoesNotExist:
-                return 0
-        return 0
+        pending = self.context.get('pending_progress', {}).get(obj.pk)
+        if pending is not None and not pending['monotonic']:
+            return pending['progress']
+        if hasattr(obj, 'user_progress'):
+            # Annotated by ModuleViewSet.get_queryset
+            stored = obj.user_progress
+        elif request and request.user.is_authenticated:
+            stored = UserProgress.objects.filter(
+                user=request.user, module=obj
+            ).values_list('progress', flat=True).first()
+        else:
+            stored = None
+        if pending is not None:
+            return merged_progress(pending, stored)
+        return stored if stored is not None else 0
+
+class ModuleSummarySerializer(serializers.ModelSerializer):
+    description = serializers.CharField(source='description_excerpt', read_only=True)
+    page_count = serializers.IntegerField(read_only=True)
+    progress = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Module
+        fields = ('id', 'title', 'description', 'category', 'page_count', 'progress', 'created_at', 'updated_at')
+
+    def get_progress(self, obj):
+        progress = getattr(obj, 'user_progress', None)
+        pending = self.context.get('pending_progress', {}).get(obj.pk)
+        if pending is not None:
+            return merged_progress(pending, progress)
+        return progress if progress is not None else 0
 
 class UserProgressSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserProgress
-        fields = ('id', 'user', 'module', 'progress', 'last_page_viewed', 'updated_at')
+        fields = ('id', 'user', 'module', 'progress', 'last_page_viewed', 'updated_at', 'completed_at')
+        read_only_fields = ('completed_at',)
+
+class ProgressUpsertSerializer(serializers.Serializer):
+    progress = serializers.FloatField(required=False, min_value=0)
+    last_page_viewed = serializers.IntegerField(required=False, allow_null=True)
+    completed = serializers.BooleanField(required=False, default=False)
+    monotonic = serializers.BooleanField(required=False, default=False)
+
+    def validate(self, data):
+        if data['completed']:
+            data['progress'] = 100.0
+        elif 'progress' not in data:
+            raise serializers.ValidationError({'progress': 'This field is required.'})
+        return data
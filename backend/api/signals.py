@@ -0,0 +1,84 @@
+from django.db.backends.signals import connection_created
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import cache as module_cache
+from .authentication import CLAIM_FIELDS, revoke_user_tokens
+from .models import Module, Page, QuizOption, User, UserProgress
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    # Per-connection settings from the database's PRAGMAS (the sqlite-wal profile)
+    pragmas = connection.settings_dict.get('PRAGMAS')
+    if connection.vendor == 'sqlite' and pragmas:
+        with connection.cursor() as cursor:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name} = {value}')
+
+
+@receiver([post_save, post_delete], sender=Module)
+def invalidate_module(sender, instance, **kwargs):
+    module_cache.invalidate_module(instance.pk)
+
+
+@receiver(post_save, sender=Module)
+def count_created_module(sender, instance, created, **kwargs):
+    if created:
+        module_cache.invalidate_module_count()
+
+
+@receiver(post_save, sender=UserProgress)
+def complete_full_progress(sender, instance, raw=False, **kwargs):
+    # Saves through the ORM (the progress viewset, the admin) complete a module as upserts do
+    if not raw and instance.completed_at is None and instance.progress >= UserProgress.COMPLETE:
+        instance.completed_at = UserProgress.objects.complete(instance.user_id, instance.module_id)[0].completed_at
+
+
+@receiver(pre_delete, sender=Module)
+def uncount_completions(sender, instance, **kwargs):
+    # One UPDATE here, as a receiver on UserProgress would make the cascade load every row
+    User.objects.filter(
+        pk__in=UserProgress.objects.filter(module=instance, completed_at__isnull=False).values('user_id')
+    ).update(completed_modules_count=F('completed_modules_count') - 1)
+    module_cache.invalidate_module_count()
+
+
+@receiver([post_save, post_delete], sender=Page)
+def invalidate_page_module(sender, instance, **kwargs):
+    module_cache.invalidate_module(instance.module_id)
+
+
+@receiver([post_save, post_delete], sender=QuizOption)
+def invalidate_option_module(sender, instance, **kwargs):
+    try:
+        module_id = instance.page.module_id
+    except Page.DoesNotExist:
+        # The page is being deleted too and invalidates the module itself
+        return
+    module_cache.invalidate_module(module_id)
+
+
+@receiver(pre_save, sender=User)
+def revoke_stale_tokens(sender, instance, update_fields=None, **kwargs):
+    # Tokens carry these fields as claims, so changing them invalidates issued
+    # tokens, as does deactivating the user or changing their password
+    fields = set(CLAIM_FIELDS) | {'is_active'}
+    # set_password() keeps the raw password until save; check_password()
+    # rehashing the same one on login clears it first
+    if instance._password is not None:
+        fields.add('password')
+    if update_fields is not None:
+        fields &= set(update_fields)
+    fields -= instance.get_deferred_fields()
+    if instance.pk is None or not fields:
+        return
+    stored = User.objects.filter(pk=instance.pk).values(*fields).first()
+    if stored and any(stored[field] != getattr(instance, field) for field in fields):
+        revoke_user_tokens(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def revoke_deleted_user_tokens(sender, instance, **kwargs):
+    revoke_user_tokens(instance.pk)
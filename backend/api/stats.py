@@ -0,0 +1,165 @@
+from django.db import connections, router, transaction
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Coalesce
+
+from .models import Module, ModuleStats
+
+# Per-module learner aggregates for the admin dashboard. Rather than
+# aggregating every UserProgress row per request, ModuleStats holds running
+# totals that triggers adjust on each progress and saved-module write, so
+# bulk upserts, the write-behind flush and cascading deletes are counted
+# too. refresh_module_stats() recomputes them with grouped aggregates. A
+# module counts as completed once the row has completed_at, as it does for
+# User.completed_modules_count.
+
+SQLITE_TRIGGERS = [
+    'CREATE TRIGGER IF NOT EXISTS api_modulestats_progress_insert AFTER INSERT ON api_userprogress BEGIN '
+    'INSERT INTO api_modulestats (module_id, learners, completed, progress_sum, saves) '
+    'VALUES (new.module_id, 1, new.completed_at IS NOT NULL, new.progress, 0) '
+    'ON CONFLICT (module_id) DO UPDATE SET learners = learners + 1, '
+    'completed = completed + excluded.completed, progress_sum = progress_sum + excluded.progress_sum; END',
+    'CREATE TRIGGER IF NOT EXISTS api_modulestats_progress_update '
+    'AFTER UPDATE OF progress, completed_at ON api_userprogress '
+    'WHEN new.progress != old.progress OR (new.completed_at IS NULL) != (old.completed_at IS NULL) BEGIN '
+    'UPDATE api_modulestats SET completed = completed '
+    '+ (new.completed_at IS NOT NULL) - (old.completed_at IS NOT NULL), '
+    'progress_sum = progress_sum + new.progress - old.progress WHERE module_id = new.module_id; END',
+    # Plain UPDATEs on delete, so a module being deleted doesn't get its row back
+    'CREATE TRIGGER IF NOT EXISTS api_modulestats_progress_delete AFTER DELETE ON api_userprogress BEGIN '
+    'UPDATE api_modulestats SET learners = learners - 1, completed = completed - (old.completed_at IS NOT NULL), '
+    'progress_sum = progress_sum - old.progress WHERE module_id = old.module_id; END',
+    'CREATE TRIGGER IF NOT EXISTS api_modulestats_saved_insert AFTER INSERT ON api_user_saved_modules BEGIN '
+    'INSERT INTO api_modulestats (module_id, learners, completed, progress_sum, saves) '
+    'VALUES (new.module_id, 0, 0, 0.0, 1) ON CONFLICT (module_id) DO UPDATE SET saves = saves + 1; END',
+    'CREATE TRIGGER IF NOT EXISTS api_modulestats_saved_delete AFTER DELETE ON api_user_saved_modules BEGIN '
+    'UPDATE api_modulestats SET saves = saves - 1 WHERE module_id = old.module_id; END',
+]
+
+SQLITE_DROP = [
+    'DROP TRIGGER IF EXISTS api_modulestats_progress_insert',
+    'DROP TRIGGER IF EXISTS api_modulestats_progress_update',
+    'DROP TRIGGER IF EXISTS api_modulestats_progress_delete',
+    'DROP TRIGGER IF EXISTS api_modulestats_saved_insert',
+    'DROP TRIGGER IF EXISTS api_modulestats_saved_delete',
+]
+
+POSTGRES_TRIGGERS = [
+    'CREATE OR REPLACE FUNCTION api_modulestats_progress() RETURNS trigger AS $$ BEGIN '
+    "IF TG_OP = 'INSERT' THEN "
+    'INSERT INTO api_modulestats (module_id, learners, completed, progress_sum, saves) '
+    'VALUES (NEW.module_id, 1, (NEW.completed_at IS NOT NULL)::int, NEW.progress, 0) '
+    'ON CONFLICT (module_id) DO UPDATE SET learners = api_modulestats.learners + 1, '
+    'completed = api_modulestats.completed + EXCLUDED.completed, '
+    'progress_sum = api_modulestats.progress_sum + EXCLUDED.progress_sum; '
+    "ELSIF TG_OP = 'UPDATE' THEN "
+    'IF NEW.progress <> OLD.progress OR (NEW.completed_at IS NULL) <> (OLD.completed_at IS NULL) THEN '
+    'UPDATE api_modulestats SET completed = completed + (NEW.completed_at IS NOT NULL)::int '
+    '- (OLD.completed_at IS NOT NULL)::int, progress_sum = progress_sum + NEW.progress - OLD.progress '
+    'WHERE module_id = NEW.module_id; END IF; '
+    'ELSE '
+    'UPDATE api_modulestats SET learners = learners - 1, completed = completed - (OLD.completed_at IS NOT NULL)::int, '
+    'progress_sum = progress_sum - OLD.progress WHERE module_id = OLD.module_id; '
+    'END IF; RETURN NULL; END $$ LANGUAGE plpgsql',
+    'DROP TRIGGER IF EXISTS api_modulestats_progress ON api_userprogress',
+    'CREATE TRIGGER api_modulestats_progress AFTER INSERT OR DELETE OR UPDATE OF progress, completed_at '
+    'ON api_userprogress '
+    'FOR EACH ROW EXECUTE FUNCTION api_modulestats_progress()',
+
+    'CREATE OR REPLACE FUNCTION api_modulestats_saved() RETURNS trigger AS $$ BEGIN '
+    "IF TG_OP = 'INSERT' THEN "
+    'INSERT INTO api_modulestats (module_id, learners, completed, progress_sum, saves) '
+    'VALUES (NEW.module_id, 0, 0, 0.0, 1) '
+    'ON CONFLICT (module_id) DO UPDATE SET saves = api_modulestats.saves + 1; '
+    'ELSE '
+    'UPDATE api_modulestats SET saves = saves - 1 WHERE module_id = OLD.module_id; '
+    'END IF; RETURN NULL; END $$ LANGUAGE plpgsql',
+    'DROP TRIGGER IF EXISTS api_modulestats_saved ON api_user_saved_modules',
+    'CREATE TRIGGER api_modulestats_saved AFTER INSERT OR DELETE ON api_user_saved_modules '
+    'FOR EACH ROW EXECUTE FUNCTION api_modulestats_saved()',
+]
+
+POSTGRES_DROP = [
+    'DROP TRIGGER IF EXISTS api_modulestats_progress ON api_userprogress',
+    'DROP TRIGGER IF EXISTS api_modulestats_saved ON api_user_saved_modules',
+    'DROP FUNCTION IF EXISTS api_modulestats_progress()',
+    'DROP FUNCTION IF EXISTS api_modulestats_saved()',
+]
+
+TRIGGERS = {'sqlite': SQLITE_TRIGGERS, 'postgresql': POSTGRES_TRIGGERS}
+DROP_TRIGGERS = {'sqlite': SQLITE_DROP, 'postgresql': POSTGRES_DROP}
+
+
+def _execute(connection, statements):
+    with connection.cursor() as cursor:
+        for statement in statements.get(connection.vendor, []):
+            cursor.execute(statement)
+
+
+def install_triggers(connection=None):
+    """Create the maintenance triggers; other databases rely on refresh_module_stats() alone."""
+    _execute(connection or connections[router.db_for_write(ModuleStats)], TRIGGERS)
+
+
+def uninstall_triggers(connection=None):
+    _execute(connection or connections[router.db_for_write(ModuleStats)], DROP_TRIGGERS)
+
+
+REFRESH_SQL = """
+    INSERT INTO api_modulestats (module_id, learners, completed, progress_sum, saves)
+    SELECT api_module.id, COALESCE(progress.learners, 0), COALESCE(progress.completed, 0),
+           COALESCE(progress.progress_sum, 0.0), COALESCE(saved.saves, 0)
+    FROM api_module
+    LEFT JOIN (
+        SELECT module_id, COUNT(*) AS learners,
+               SUM(CASE WHEN completed_at IS NOT NULL THEN 1 ELSE 0 END) AS completed,
+               SUM(progress) AS progress_sum
+        FROM api_userprogress GROUP BY module_id
+    ) progress ON progress.module_id = api_module.id
+    LEFT JOIN (
+        SELECT module_id, COUNT(*) AS saves FROM api_user_saved_modules GROUP BY module_id
+    ) saved ON saved.module_id = api_module.id
+    {where}
+"""
+
+
+def refresh_module_stats(module_ids=None, connection=None):
+    """
+    Recompute stats from scratch with grouped aggregates over UserProgress
+    and the saved modules table: the backfill, and a repair for drift.
+    Writes made while it runs may be missed, so run it when the site is quiet.
+    """
+    connection = connection or connections[router.db_for_write(ModuleStats)]
+    where, params = '', []
+    if module_ids is not None:
+        module_ids = list(module_ids)
+        if not module_ids:
+            return 0
+        placeholders = ', '.join(['%s'] * len(module_ids))
+        where, params = f'WHERE api_module.id IN ({placeholders})', module_ids
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(
+            'DELETE FROM api_modulestats' + (f' WHERE module_id IN ({placeholders})' if params else ''), params
+        )
+        cursor.execute(REFRESH_SQL.format(where=where), params)
+        return cursor.rowcount
+
+
+def module_stats(category=None):
+    """Stats for every module, newest first, read in one query."""
+    queryset = Module.objects.order_by('-created_at')
+    if category:
+        queryset = queryset.filter(category=category)
+    rows = queryset.values('id', 'title', 'category').annotate(
+        learners=Coalesce(F('stats__learners'), 0),
+        completed=Coalesce(F('stats__completed'), 0),
+        progress_sum=Coalesce(F('stats__progress_sum'), Value(0.0), output_field=FloatField()),
+        saves=Coalesce(F('stats__saves'), 0),
+    )
+    results = []
+    for row in rows:
+        progress_sum = row.pop('progress_sum')
+        learners = row['learners']
+        row['completion_rate'] = round(row['completed'] / learners, 4) if learners else 0.0
+        row['average_progress'] = round(progress_sum / learners, 2) if learners else 0.0
+        results.append(row)
+    return results
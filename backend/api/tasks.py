@@ -0,0 +1,248 @@
+import atexit
+import logging
+import random
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import connections, transaction
+from django.db.models import F
+from django.http import Http404
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import Job, User
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # In-process worker threads, started on the first enqueue; with 0 the
+    # queue is drained by `manage.py run_tasks`
+    'WORKERS': 0,
+    # Seconds an idle worker waits before polling again
+    'POLL_INTERVAL': 1.0,
+    'MAX_ATTEMPTS': 5,
+    # Seconds before the first retry, doubled for each further attempt
+    'RETRY_BACKOFF': 10.0,
+    'RETRY_BACKOFF_MAX': 3600.0,
+    # A running job not finished after this many seconds lost its worker and is retried
+    'LOCK_TIMEOUT': 300,
+    # Jobs claimed per poll
+    'BATCH_SIZE': 10,
+}
+
+_registry = {}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'TASK_QUEUE', {})}
+
+
+class Task:
+    """A function that can be queued as a Job and run by a worker."""
+
+    def __init__(self, func, name=None, max_attempts=None):
+        self.func = func
+        self.name = name or f'{func.__module__}.{func.__qualname__}'
+        self.max_attempts = max_attempts
+        self.__doc__ = func.__doc__
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def enqueue(self, *args, delay=None, **kwargs):
+        """Queue a call; arguments must be JSON serializable. Workers see it once the current transaction commits."""
+        config = get_config()
+        job = Job.objects.create(
+            task=self.name,
+            args=list(args),
+            kwargs=kwargs,
+            max_attempts=self.max_attempts or config['MAX_ATTEMPTS'],
+            run_at=timezone.now() + timedelta(seconds=delay or 0),
+        )
+        if config['WORKERS']:
+            worker_pool.start(config['WORKERS'])
+        return job
+
+
+def task(func=None, *, name=None, max_attempts=None):
+    """Register a function as a background task: ``@task`` or ``@task(max_attempts=3)``."""
+    def register(func):
+        registered = Task(func, name=name, max_attempts=max_attempts)
+        _registry[registered.name] = registered
+        return registered
+
+    return register(func) if func is not None else register
+
+
+def get_task(name):
+    if name not in _registry:
+        # Importing the task's module registers it
+        import_string(name)
+    return _registry[name]
+
+
+def retry_delay(attempts, config=None):
+    config = config or get_config()
+    delay = min(config['RETRY_BACKOFF'] * 2 ** (attempts - 1), config['RETRY_BACKOFF_MAX'])
+    # Jitter so jobs failing together don't all retry together
+    return delay * random.uniform(0.5, 1.0)
+
+
+def release_stale_jobs(config=None):
+    config = config or get_config()
+    stale = Job.objects.filter(
+        status=Job.RUNNING,
+        locked_at__lt=timezone.now() - timedelta(seconds=config['LOCK_TIMEOUT']),
+    )
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, last_error='Worker lost while running the job'
+    )
+    return stale.update(status=Job.PENDING, locked_at=None)
+
+
+def claim_jobs(limit):
+    now = timezone.now()
+    ids = list(Job.objects.filter(
+        status=Job.PENDING,
+        run_at__lte=now,
+    ).order_by('run_at', 'id').values_list('id', flat=True)[:limit])
+    claimed = []
+    for job_id in ids:
+        # Conditional update, so of several workers polling at once only one wins each job
+        if Job.objects.filter(pk=job_id, status=Job.PENDING).update(
+            status=Job.RUNNING, locked_at=now, attempts=F('attempts') + 1
+        ):
+            claimed.append(job_id)
+    return list(Job.objects.filter(pk__in=claimed).order_by('run_at', 'id'))
+
+
+def run_job(job, config=None):
+    """Run a claimed job. It is deleted on success and rescheduled or marked failed on error."""
+    try:
+        get_task(job.task)(*job.args, **job.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            logger.error('Task %s failed after %d attempts:\n%s', job.task, job.attempts, error)
+            Job.objects.filter(pk=job.pk).update(status=Job.FAILED, locked_at=None, last_error=error)
+        else:
+            delay = retry_delay(job.attempts, config)
+            logger.warning('Task %s failed, retrying in %.0fs:\n%s', job.task, delay, error)
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.PENDING,
+                locked_at=None,
+                last_error=error,
+                run_at=timezone.now() + timedelta(seconds=delay),
+            )
+        return False
+    Job.objects.filter(pk=job.pk).delete()
+    return True
+
+
+def run_pending(limit=None):
+    """Run due jobs until none are left (or ``limit`` have run); returns how many ran."""
+    config = get_config()
+    release_stale_jobs(config)
+    ran = 0
+    while limit is None or ran < limit:
+        batch = config['BATCH_SIZE'] if limit is None else min(config['BATCH_SIZE'], limit - ran)
+        jobs = claim_jobs(batch)
+        if not jobs:
+            break
+        for job in jobs:
+            run_job(job, config)
+            ran += 1
+    return ran
+
+
+class WorkerPool:
+    """Threads polling the job table, in this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._threads = []
+        self._stop = threading.Event()
+
+    def start(self, workers):
+        with self._lock:
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            self._stop.clear()
+            while len(self._threads) < workers:
+                thread = threading.Thread(
+                    target=self._run, name=f'task-worker-{len(self._threads)}', daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def _run(self):
+        while not self._stop.is_set():
+            ran = 0
+            try:
+                ran = run_pending()
+            except Exception:
+                logger.exception('Task worker poll failed')
+            finally:
+                connections.close_all()
+            if not ran:
+                self._stop.wait(get_config()['POLL_INTERVAL'])
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for thread in threads:
+            thread.join(timeout)
+
+    def is_running(self):
+        with self._lock:
+            return any(thread.is_alive() for thread in self._threads)
+
+
+worker_pool = WorkerPool()
+
+
+@atexit.register
+def stop_workers():
+    # Let jobs in flight finish; anything cut short is retried after LOCK_TIMEOUT
+    worker_pool.stop(timeout=5)
+
+
+@task
+def send_email(subject, message, recipient_list, from_email=None):
+    send_mail(subject, message, from_email or settings.DEFAULT_FROM_EMAIL, recipient_list, fail_silently=False)
+
+
+@task
+def send_password_reset(user_id):
+    """Mail the user a reset link; the token is minted here so it is never stored in a job's args."""
+    user = User.objects.filter(pk=user_id).first()
+    if user is None:
+        # Deleted since it was queued
+        return
+    reset_token = str(RefreshToken.for_user(user).access_token)
+    reset_url = f"{settings.FRONTEND_URL}/reset-password?token={reset_token}"
+    send_email('Password Reset Request', f'Click here to reset your password: {reset_url}', [user.email])
+
+
+@task(max_attempts=2)
+def warm_module_trees(module_ids):
+    """Rebuild cached module trees after a write, so the next reader doesn't pay for it."""
+    from .views import get_cached_module_tree
+
+    for module_id in module_ids:
+        try:
+            # Learners' trees, and the authors' with quiz answers
+            get_cached_module_tree(module_id)
+            get_cached_module_tree(module_id, answers=True)
+        except Http404:
+            # Deleted since it was queued
+            pass
+
+
+def enqueue_on_commit(task_to_run, *args, **kwargs):
+    """Enqueue once the current transaction commits, e.g. after cache invalidation has run."""
+    transaction.on_commit(lambda: task_to_run.enqueue(*args, **kwargs))
@@ -1,3 +1,1798 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import tempfile
+import threading
+import time
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.hashers import get_hasher
+from django.core import mail
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.db.models import Prefetch
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.http import http_date
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from . import cache as module_cache
+from . import compression
+from . import profiling
+from . import representations
+from . import routers
+from . import stats as module_stats
+from . import tasks
+from . import transfer
+from .authentication import get_cache as auth_cache, revoke_token
+from .benchmarks import ASYNC_READS
+from .conditional import conditional_response
+from .datagen import BENCH_EMAIL, BENCH_PASSWORD, generate_dataset
+from .ordering import MIN_RANK_GAP, rank_for_position, spaced_rank
+from .progress_buffer import progress_buffer
+from .renderers import FastJSONRenderer
+from .serializers import CustomTokenObtainPairSerializer, ModuleSerializer, UserProgressSerializer
+from .models import ImportedRecord, Job, Module, ModuleStats, Page, QuizAttempt, QuizOption, UserProgress, User
+
+
+def create_catalog(modules=3, pages=3, options=2):
+    created = []
+    for m in range(modules):
+        module = Module.objects.create(title=f'Module {m}', description=f'Description {m}')
+        for p in range(pages):
+            page = Page.objects.create(module=module, type='quiz', content=f'Page {p}', rank=p + 1)
+            for o in range(options):
+                QuizOption.objects.create(page=page, text=f'Option {o}', is_correct=o == 0)
+        created.append(module)
+    return created
+
+
+def create_user(email='learner@example.com', first_name='Learner', last_name='User', **fields):
+    return User.objects.create_user(
+        email=email, password='secret', first_name=first_name, last_name=last_name, **fields
+    )
+
+
+def create_admin():
+    return create_user('admin@example.com', 'Admin', is_admin=True)
+
+
+def signed_in(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+class LearnerTestCase(TestCase):
+    """self.client is signed in as self.user, a learner."""
+
+    def setUp(self):
+        self.user = create_user()
+        self.client = signed_in(self.user)
+
+
+class AdminTestCase(TestCase):
+    """self.client is signed in as self.admin."""
+
+    def setUp(self):
+        self.admin = create_admin()
+        self.client = signed_in(self.admin)
+
+
+class ModuleQueryCountTests(LearnerTestCase):
+    def setUp(self):
+        module_cache.get_cache().clear()
+        super().setUp()
+
+    def test_list_query_count_is_constant(self):
+        modules = create_catalog(modules=2)
+        UserProgress.objects.create(user=self.user, module=modules[0], progress=0.5)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/modules/')
+        self.assertEqual(response.status_code, 200)
+
+        create_catalog(modules=10)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/modules/')
+        self.assertEqual(len(response.data['results']), 12)
+
+    def test_list_reports_user_progress(self):
+        modules = create_catalog(modules=2)
+        UserProgress.objects.create(user=self.user, module=modules[0], progress=0.5)
+        response = self.client.get('/api/modules/')
+        progress = {m['id']: m['progress'] for m in response.data['results']}
+        self.assertEqual(progress, {modules[0].id: 0.5, modules[1].id: 0})
+
+    def test_saved_query_count_is_constant(self):
+        modules = create_catalog(modules=5)
+        self.user.saved_modules.add(*modules)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/modules/saved/')
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_retrieve_query_count_is_constant(self):
+        module = create_catalog(modules=1, pages=20)[0]
+        # Module, pages and options on a cold cache, then the user's progress
+        with self.assertNumQueries(4):
+            response = self.client.get(f'/api/modules/{module.id}/')
+        self.assertEqual(len(response.data['pages']), 20)
+        self.assertEqual(len(response.data['pages'][0]['quiz_options']), 2)
+        with self.assertNumQueries(1):
+            self.client.get(f'/api/modules/{module.id}/')
+
+    def test_pages_query_count_is_constant(self):
+        module = create_catalog(modules=1, pages=20)[0]
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/api/modules/{module.id}/pages/')
+        self.assertEqual(len(response.data), 20)
+        with self.assertNumQueries(0):
+            self.client.get(f'/api/modules/{module.id}/pages/')
+
+
+class ModuleCatalogListingTests(LearnerTestCase):
+    def test_list_returns_summary_without_pages(self):
+        module = create_catalog(modules=1, pages=4)[0]
+        module.description = 'x' * 500
+        module.save()
+        response = self.client.get('/api/modules/')
+        item = response.data['results'][0]
+        self.assertEqual(set(item), {
+            'id', 'title', 'description', 'category', 'page_count', 'progress',
+            'created_at', 'updated_at',
+        })
+        self.assertEqual(item['page_count'], 4)
+        self.assertEqual(len(item['description']), 200)
+
+    def test_list_is_cursor_paginated(self):
+        create_catalog(modules=5, pages=1)
+        response = self.client.get('/api/modules/', {'page_size': 2})
+        self.assertEqual(len(response.data['results']), 2)
+        seen = [m['id'] for m in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            seen += [m['id'] for m in response.data['results']]
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(len(set(seen)), 5)
+
+    def test_list_filters_searches_and_orders(self):
+        first, second = create_catalog(modules=2, pages=1)
+        Module.objects.filter(pk=second.pk).update(category='Sport', title='Football basics')
+
+        response = self.client.get('/api/modules/', {'category': 'Sport'})
+        self.assertEqual([m['id'] for m in response.data['results']], [second.id])
+
+        response = self.client.get('/api/modules/', {'search': 'football'})
+        self.assertEqual([m['id'] for m in response.data['results']], [second.id])
+
+        response = self.client.get('/api/modules/', {'ordering': 'created_at'})
+        self.assertEqual([m['id'] for m in response.data['results']], [first.id, second.id])
+        response = self.client.get('/api/modules/', {'ordering': '-created_at'})
+        self.assertEqual([m['id'] for m in response.data['results']], [second.id, first.id])
+
+
+class ModuleTreeCacheTests(LearnerTestCase):
+    def setUp(self):
+        module_cache.get_cache().clear()
+        super().setUp()
+        self.admin = create_admin()
+        self.module = create_catalog(modules=1, pages=3)[0]
+
+    def test_hits_and_misses_are_counted(self):
+        self.client.get(f'/api/modules/{self.module.id}/')
+        self.client.get(f'/api/modules/{self.module.id}/')
+        self.client.get(f'/api/modules/{self.module.id}/pages/')
+        self.assertEqual(module_cache.get_stats(), {'hits': 2, 'misses': 1, 'hit_ratio': 2 / 3})
+
+        self.client.force_authenticate(self.admin)
+        response = self.client.get('/api/modules/cache_stats/')
+        self.assertEqual(response.data['misses'], 1)
+
+    def test_cache_stats_requires_admin(self):
+        response = self.client.get('/api/modules/cache_stats/')
+        self.assertEqual(response.status_code, 403)
+
+    def test_progress_is_merged_per_user(self):
+        UserProgress.objects.create(user=self.user, module=self.module, progress=0.75)
+        self.assertEqual(self.client.get(f'/api/modules/{self.module.id}/').data['progress'], 0.75)
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.client.get(f'/api/modules/{self.module.id}/').data['progress'], 0)
+
+    def test_content_writes_invalidate_the_tree(self):
+        url = f'/api/modules/{self.module.id}/'
+        self.client.get(url)
+
+        self.module.title = 'Renamed'
+        self.module.save()
+        self.assertEqual(self.client.get(url).data['title'], 'Renamed')
+
+        page = self.module.pages.first()
+        page.content = 'Edited'
+        page.save()
+        self.assertEqual(self.client.get(url).data['pages'][0]['content'], 'Edited')
+
+        option = page.quiz_options.first()
+        option.text = 'Edited option'
+        option.save()
+        self.assertEqual(
+            self.client.get(url).data['pages'][0]['quiz_options'][0]['text'], 'Edited option'
+        )
+
+        page.delete()
+        self.assertEqual(len(self.client.get(url).data['pages']), 2)
+
+    def test_reorder_invalidates_the_tree(self):
+        url = f'/api/modules/{self.module.id}/pages/'
+        self.client.get(url)
+        last = self.module.pages.last()
+
+        self.client.force_authenticate(self.admin)
+        response = self.client.patch(f'{url}{last.id}/', {'order': 0}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(url).data[0]['id'], last.id)
+
+    def test_deleted_module_is_not_served_from_cache(self):
+        url = f'/api/modules/{self.module.id}/'
+        self.client.get(url)
+        self.module.delete()
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class ConditionalGetTests(LearnerTestCase):
+    def setUp(self):
+        module_cache.get_cache().clear()
+        super().setUp()
+        self.module = create_catalog(modules=1, pages=3)[0]
+
+    def assertRevalidates(self, url, queries):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Last-Modified', response)
+        module_cache.reset_stats()
+        with self.assertNumQueries(queries):
+            not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+        self.assertEqual(not_modified.content, b'')
+        # The cached tree isn't even read to answer a 304
+        self.assertEqual(module_cache.get_stats()['hits'], 0)
+
+        not_modified = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(not_modified.status_code, 304)
+        return response
+
+    def test_module_retrieve(self):
+        url = f'/api/modules/{self.module.id}/'
+        response = self.assertRevalidates(url, queries=1)
+
+        UserProgress.objects.create(user=self.user, module=self.module, progress=0.5)
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.data['progress'], 0.5)
+
+    def test_module_pages(self):
+        url = f'/api/modules/{self.module.id}/pages/'
+        response = self.assertRevalidates(url, queries=1)
+
+        page = self.module.pages.first()
+        page.content = 'Edited'
+        page.save()
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.data[0]['content'], 'Edited')
+
+    def test_missing_module_is_not_revalidated(self):
+        url = f'/api/modules/{self.module.id}/'
+        response = self.client.get(url)
+        module_id = self.module.id
+        self.module.delete()
+        for path in (url, url + 'pages/', f'/api/modules/{module_id + 1}/'):
+            self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 404)
+            self.assertEqual(self.client.get(path, HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT').status_code, 404)
+
+    def test_last_modified_rounds_up_to_the_second(self):
+        response = conditional_response(
+            RequestFactory().get('/'), '"etag"', 1700000000.2, lambda: HttpResponse('body')
+        )
+        self.assertEqual(response['Last-Modified'], http_date(1700000001))
+
+        # A change later in the second the client last saw is still served
+        request = RequestFactory().get('/', HTTP_IF_MODIFIED_SINCE=http_date(1700000000))
+        response = conditional_response(request, '"etag"', 1700000000.7, lambda: HttpResponse('body'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_progress_list(self):
+        progress = UserProgress.objects.create(user=self.user, module=self.module, progress=0.5)
+        response = self.assertRevalidates('/api/progress/', queries=1)
+
+        progress.delete()
+        changed = self.client.get('/api/progress/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.data, [])
+
+
+class ProgressUpsertTests(LearnerTestCase):
+    def setUp(self):
+        module_cache.get_cache().clear()
+        super().setUp()
+        self.module = create_catalog(modules=1, pages=3)[0]
+        self.url = f'/api/progress/by-module/{self.module.id}/'
+
+    def test_upsert_is_a_single_query(self):
+        page = self.module.pages.first()
+        with self.assertNumQueries(1):
+            response = self.client.put(self.url, {'progress': 25, 'last_page_viewed': page.id}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['progress'], 25)
+        self.assertEqual(response.data['last_page_viewed'], page.id)
+
+        with self.assertNumQueries(1):
+            response = self.client.put(self.url, {'progress': 50}, format='json')
+        row = UserProgress.objects.get(user=self.user, module=self.module)
+        self.assertEqual(response.data['id'], row.id)
+        self.assertEqual(row.progress, 50)
+        # Omitting last_page_viewed keeps the stored page
+        self.assertEqual(row.last_page_viewed_id, page.id)
+        self.assertEqual(UserProgress.objects.count(), 1)
+
+    def test_monotonic_upsert_never_decreases(self):
+        self.client.put(self.url, {'progress': 60}, format='json')
+        response = self.client.put(self.url, {'progress': 40, 'monotonic': True}, format='json')
+        self.assertEqual(response.data['progress'], 60)
+        response = self.client.put(self.url, {'progress': 40}, format='json')
+        self.assertEqual(response.data['progress'], 40)
+
+    def test_completed_sets_full_progress(self):
+        response = self.client.put(self.url, {'completed': True}, format='json')
+        self.assertEqual(response.data['progress'], 100)
+
+    def test_missing_module_or_foreign_page(self):
+        response = self.client.put('/api/progress/by-module/999999/', {'progress': 10}, format='json')
+        self.assertEqual(response.status_code, 404)
+        other = create_catalog(modules=1, pages=1)[0]
+        response = self.client.put(
+            self.url, {'progress': 10, 'last_page_viewed': other.pages.first().id}, format='json'
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(UserProgress.objects.exists())
+
+    def test_progress_is_required(self):
+        response = self.client.put(self.url, {}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(PROGRESS_WRITE_BEHIND={'ENABLED': True, 'FLUSH_INTERVAL': 0, 'MAX_PENDING': 100000})
+class ProgressWriteBehindTests(LearnerTestCase):
+    def setUp(self):
+        module_cache.get_cache().clear()
+        progress_buffer.reset()
+        self.addCleanup(progress_buffer.reset)
+        super().setUp()
+        self.module = create_catalog(modules=1, pages=3)[0]
+        self.url = f'/api/progress/by-module/{self.module.id}/'
+
+    def test_writes_are_buffered_and_coalesced(self):
+        pages = list(self.module.pages.all())
+        self.client.get(f'/api/modules/{self.module.id}/pages/')
+        with self.assertNumQueries(0):
+            for i, page in enumerate(pages):
+                response = self.client.put(
+                    self.url, {'progress': i * 10, 'last_page_viewed': page.id}, format='json'
+                )
+                self.assertEqual(response.status_code, 202)
+        self.assertFalse(UserProgress.objects.exists())
+
+        self.assertEqual(progress_buffer.flush(), 1)
+        row = UserProgress.objects.get(user=self.user, module=self.module)
+        self.assertEqual((row.progress, row.last_page_viewed_id), (20, pages[-1].id))
+        stats = progress_buffer.stats()
+        self.assertEqual(stats['coalescing_ratio'], 3)
+        self.assertEqual(stats['pending'], 0)
+
+    def test_reads_see_pending_writes(self):
+        UserProgress.objects.create(user=self.user, module=self.module, progress=10)
+        self.client.put(self.url, {'progress': 70}, format='json')
+
+        self.assertEqual(self.client.get(f'/api/modules/{self.module.id}/').data['progress'], 70)
+        listing = self.client.get('/api/modules/').data['results']
+        self.assertEqual(listing[0]['progress'], 70)
+        self.assertEqual(self.client.get('/api/progress/').data[0]['progress'], 70)
+
+    def test_monotonic_writes_coalesce_to_the_maximum(self):
+        UserProgress.objects.create(user=self.user, module=self.module, progress=90)
+        self.client.put(self.url, {'progress': 50, 'monotonic': True}, format='json')
+        self.client.put(self.url, {'progress': 30, 'monotonic': True}, format='json')
+        progress_buffer.flush()
+        self.assertEqual(UserProgress.objects.get().progress, 90)
+
+    def test_deleted_module_rows_are_skipped_on_flush(self):
+        other = create_catalog(modules=1, pages=1)[0]
+        progress_buffer.record(self.user.pk, self.module.pk, 40)
+        progress_buffer.record(self.user.pk, other.pk, 40)
+        other.delete()
+        progress_buffer.flush()
+        self.assertEqual(list(UserProgress.objects.values_list('module_id', flat=True)), [self.module.pk])
+
+    def test_monotonic_write_on_a_pending_plain_write_stays_plain(self):
+        UserProgress.objects.create(user=self.user, module=self.module, progress=90)
+        self.client.put(self.url, {'progress': 20}, format='json')
+        self.client.put(self.url, {'progress': 50, 'monotonic': True}, format='json')
+        self.assertEqual(self.client.get(f'/api/modules/{self.module.id}/').data['progress'], 50)
+        progress_buffer.flush()
+        self.assertEqual(UserProgress.objects.get().progress, 50)
+
+    def test_reads_merge_pending_monotonic_writes_with_the_stored_row(self):
+        UserProgress.objects.create(user=self.user, module=self.module, progress=90)
+        self.client.put(self.url, {'progress': 50, 'monotonic': True}, format='json')
+
+        self.assertEqual(self.client.get(f'/api/modules/{self.module.id}/').data['progress'], 90)
+        self.assertEqual(self.client.get('/api/modules/').data['results'][0]['progress'], 90)
+        self.assertEqual(self.client.get('/api/modules/saved/').data['results'], [])
+        self.user.saved_modules.add(self.module)
+        self.assertEqual(self.client.get('/api/modules/saved/').data['results'][0]['progress'], 90)
+
+    @override_settings(PROGRESS_WRITE_BEHIND={'ENABLED': True, 'FLUSH_INTERVAL': 0, 'MAX_PENDING': 10})
+    def test_flushes_inline_at_max_pending(self):
+        modules = create_catalog(modules=25, pages=1, options=0)
+        for module in modules:
+            progress_buffer.record(self.user.pk, module.pk, 10)
+        # Coalesces with the pending row instead of counting towards MAX_PENDING
+        progress_buffer.record(self.user.pk, modules[-1].pk, 20)
+        stats = progress_buffer.stats()
+        self.assertEqual((stats['flushes'], stats['flushed_rows'], stats['pending']), (2, 20, 5))
+        self.assertEqual(UserProgress.objects.count(), 20)
+
+    def test_concurrent_writes_coalesce_per_row(self):
+        users = [
+            User.objects.create(email=f'user{i}@example.com', first_name='U', last_name=str(i))
+            for i in range(20)
+        ]
+        modules = create_catalog(modules=5, pages=1, options=0)
+        writes_per_thread = 2000
+
+        def writer(offset):
+            for i in range(writes_per_thread):
+                user = users[i % len(users)]
+                module = modules[(i // len(users) + offset) % len(modules)]
+                progress_buffer.record(user.pk, module.pk, i / writes_per_thread)
+
+        threads = [threading.Thread(target=writer, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        total_writes = writes_per_thread * len(threads)
+        stats = progress_buffer.stats()
+        self.assertEqual((stats['writes'], stats['pending'], stats['flushes']), (total_writes, 100, 0))
+        self.assertEqual(len(progress_buffer.pending_for(users[0].pk)), len(modules))
+
+        # Module existence check, then savepoint, bulk upsert, release
+        with self.assertNumQueries(4):
+            flushed = progress_buffer.flush()
+        self.assertEqual(flushed, len(users) * len(modules))
+        self.assertEqual(UserProgress.objects.count(), flushed)
+        stats = progress_buffer.stats()
+        self.assertEqual((stats['flushes'], stats['pending']), (1, 0))
+        self.assertEqual(stats['coalescing_ratio'], total_writes / flushed)
+        self.assertFalse(progress_buffer.has_pending())
+
+
+class PageBulkWriteTests(AdminTestCase):
+    def setUp(self):
+        module_cache.get_cache().clear()
+        super().setUp()
+        self.module = create_catalog(modules=1, pages=3)[0]
+        self.url = f'/api/modules/{self.module.id}/pages/'
+
+    def payload(self):
+        return [
+            {'id': page['id'], 'type': page['type'], 'content': page['content'],
+             'quiz_options': [dict(option) for option in page['quiz_options']]}
+            for page in self.client.get(self.url).data
+        ]
+
+    def test_bulk_create_is_a_fixed_number_of_writes(self):
+        module = Module.objects.create(title='Empty', description='')
+        pages = [
+            {'type': 'quiz', 'content': f'Question {i}', 'quiz_options': [
+                {'text': 'Yes', 'is_correct': True}, {'text': 'No'},
+            ]}
+            for i in range(40)
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.put(f'/api/modules/{module.id}/pages/bulk/', {'pages': pages}, format='json')
+        self.assertEqual(response.status_code, 200)
+        inserts = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 2)
+        self.assertEqual([p['order'] for p in response.data], list(range(40)))
+        self.assertEqual([p['content'] for p in response.data][:2], ['Question 0', 'Question 1'])
+        self.assertEqual(QuizOption.objects.filter(page__module=module).count(), 80)
+
+    def test_bulk_diff_updates_creates_and_deletes(self):
+        pages = self.payload()
+        first, second, third = pages
+        untouched_option = second['quiz_options'][0]
+        first['content'] = 'Edited'
+        first['quiz_options'][0]['text'] = 'Edited option'
+        del first['quiz_options'][1]
+        first['quiz_options'].append({'text': 'New option', 'is_correct': False})
+        new_page = {'type': 'text', 'content': 'New page'}
+
+        response = self.client.put(
+            f'{self.url}bulk/', {'pages': [third, new_page, first]}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(p['id'], p['order']) for p in response.data],
+            [(third['id'], 0), (response.data[1]['id'], 1), (first['id'], 2)]
+        )
+        self.assertEqual(response.data[1]['quiz_options'], [])
+        self.assertEqual(
+            [o['text'] for o in response.data[2]['quiz_options']], ['Edited option', 'New option']
+        )
+        self.assertFalse(Page.objects.filter(pk=second['id']).exists())
+        self.assertFalse(QuizOption.objects.filter(pk=untouched_option['id']).exists())
+
+    def test_bulk_rejects_foreign_ids_atomically(self):
+        other = create_catalog(modules=1, pages=1)[0]
+        pages = self.payload()
+        pages[0]['quiz_options'][0]['id'] = other.pages.first().quiz_options.first().id
+        response = self.client.put(f'{self.url}bulk/', {'pages': pages[:1]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.module.pages.count(), 3)
+
+        response = self.client.put(
+            f'{self.url}bulk/', {'pages': [{'id': other.pages.first().id, 'type': 'text', 'content': ''}]},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_bulk_validates_quiz_pages(self):
+        response = self.client.put(
+            f'{self.url}bulk/', {'pages': [{'type': 'quiz', 'content': 'Q', 'quiz_options': [{'text': 'A'}]}]},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_reorder_is_a_single_update(self):
+        ids = list(self.module.pages.values_list('id', flat=True))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(f'{self.url}reorder/', {'page_ids': ids[::-1]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        updates = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual([p['id'] for p in response.data], ids[::-1])
+        self.assertEqual([p['order'] for p in response.data], [0, 1, 2])
+
+    def test_reorder_requires_every_page(self):
+        ids = list(self.module.pages.values_list('id', flat=True))
+        response = self.client.post(f'{self.url}reorder/', {'page_ids': ids[:2]}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_bulk_writes_require_admin(self):
+        self.client.force_authenticate(create_user())
+        response = self.client.post(f'{self.url}reorder/', {'page_ids': []}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+class PageRankOrderingTests(AdminTestCase):
+    def setUp(self):
+        module_cache.get_cache().clear()
+        super().setUp()
+        self.module = create_catalog(modules=1, pages=5, options=0)[0]
+        self.url = f'/api/modules/{self.module.id}/pages/'
+        self.ids = list(self.module.pages.values_list('id', flat=True))
+
+    def page_ids(self):
+        return [p['id'] for p in self.client.get(self.url).data]
+
+    def writes(self, queries):
+        return [q['sql'] for q in queries.captured_queries if q['sql'].startswith(('UPDATE', 'INSERT', 'DELETE'))]
+
+    def test_move_writes_one_row(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(f'{self.url}{self.ids[4]}/', {'order': 1}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['order'], 1)
+        self.assertEqual(len(self.writes(queries)), 1)
+        self.assertEqual(self.page_ids(), [self.ids[0], self.ids[4], *self.ids[1:4]])
+        self.assertEqual([p['order'] for p in self.client.get(self.url).data], [0, 1, 2, 3, 4])
+
+    def test_move_down_and_to_the_end(self):
+        self.client.patch(f'{self.url}{self.ids[0]}/', {'order': 2}, format='json')
+        self.assertEqual(self.page_ids(), [self.ids[1], self.ids[2], self.ids[0], self.ids[3], self.ids[4]])
+        self.client.patch(f'{self.url}{self.ids[1]}/', {'order': 4}, format='json')
+        self.assertEqual(self.page_ids()[-1], self.ids[1])
+
+    def test_delete_writes_no_other_rows(self):
+        page = Page.objects.get(pk=self.ids[1])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.delete(f'{self.url}{page.id}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(any(sql.startswith('UPDATE "api_page"') for sql in self.writes(queries)))
+        self.assertEqual([p['order'] for p in self.client.get(self.url).data], [0, 1, 2, 3])
+
+    def test_insert_at_position(self):
+        response = self.client.post(self.url, {'type': 'text', 'content': 'New', 'order': 0}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['order'], 0)
+        self.assertEqual(self.page_ids()[0], response.data['id'])
+
+        response = self.client.post(self.url, {'type': 'text', 'content': 'Last'}, format='json')
+        self.assertEqual(response.data['order'], 6)
+
+    def test_rebalances_when_ranks_run_out(self):
+        Page.objects.filter(pk=self.ids[1]).update(rank=1 + MIN_RANK_GAP / 2)
+        rank = rank_for_position(self.module.id, 1)
+        ranks = list(self.module.pages.values_list('rank', flat=True))
+        self.assertEqual(len(set(ranks)), 5)
+        self.assertTrue(ranks[0] < rank < ranks[1])
+
+    def test_content_edit_keeps_rank(self):
+        page = Page.objects.get(pk=self.ids[2])
+        self.client.patch(f'{self.url}{page.id}/', {'order': 2, 'content': 'Edited'}, format='json')
+        page.refresh_from_db()
+        self.assertEqual(page.rank, 3)
+        self.assertEqual(page.quiz_options.count(), 0)
+
+
+class DataGeneratorTests(TestCase):
+    def test_generates_consistent_dataset(self):
+        counts = generate_dataset(
+            users=4, modules_per_category=1, pages_per_module=3, quiz_ratio=1,
+            options_per_quiz=2, progress_density=0.5, saved_density=0.25,
+        )
+        modules = len(Module.CATEGORY_CHOICES)
+        self.assertEqual(counts['modules'], modules)
+        self.assertEqual(Page.objects.count(), modules * 3)
+        self.assertEqual(QuizOption.objects.count(), modules * 3 * 2)
+        self.assertEqual(UserProgress.objects.count(), 4 * modules // 2)
+        self.assertEqual(User.saved_modules.through.objects.count(), counts['saved'])
+        self.assertEqual(
+            list(Page.objects.filter(module_id=Module.objects.first().id).values_list('rank', flat=True)),
+            [spaced_rank(0), spaced_rank(1), spaced_rank(2)]
+        )
+
+        response = APIClient().post('/api/token/', {'email': BENCH_EMAIL.format(0), 'password': BENCH_PASSWORD}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_learners_can_save_modules(self):
+        generate_dataset(users=1, modules_per_category=1, pages_per_module=1, saved_density=0)
+        user = User.objects.get()
+        module = Module.objects.first()
+        client = signed_in(user)
+        self.assertEqual(client.post(f'/api/modules/{module.id}/save/').status_code, 200)
+        self.assertEqual(list(user.saved_modules.all()), [module])
+        self.assertEqual(client.post(f'/api/modules/{module.id}/unsave/').status_code, 200)
+        self.assertFalse(user.saved_modules.exists())
+
+
+@override_settings(REQUEST_PROFILING={
+    'ENABLED': True,
+    'N_PLUS_ONE_THRESHOLD': 2,
+    'SINKS': ['api.profiling.LogSink', 'api.profiling.PrometheusSink'],
+})
+class ProfilingMiddlewareTests(LearnerTestCase):
+    def setUp(self):
+        self.prometheus = profiling.get_sink('api.profiling.PrometheusSink')
+        self.prometheus.reset()
+        super().setUp()
+        self.admin = create_admin()
+        self.module = create_catalog(modules=2, pages=2)[0]
+
+    def test_server_timing_and_view_tag(self):
+        with self.assertLogs('api.profiling', 'INFO') as logs:
+            response = self.client.get('/api/modules/')
+            self.client.put(f'/api/progress/by-module/{self.module.id}/', {'progress': 10}, format='json')
+            self.client.force_authenticate(self.admin)
+            metrics = self.client.get('/api/metrics/').content.decode()
+        timing = response['Server-Timing']
+        for metric in ('db;dur=', 'serializer;dur=', 'view;dur=', 'total;dur='):
+            self.assertIn(metric, timing)
+        self.assertIn('desc="1 queries"', timing)
+        self.assertTrue(logs.output[0].startswith('INFO:api.profiling:ModuleViewSet.list GET 200 queries=1'))
+        self.assertTrue(logs.output[1].startswith('INFO:api.profiling:UserProgressViewSet.by_module PUT 200'))
+
+        self.assertIn('api_requests_total{view="ModuleViewSet.list",method="GET",status="200"} 1', metrics)
+        self.assertIn('api_requests_total{view="UserProgressViewSet.by_module",method="PUT",status="200"} 1', metrics)
+        self.assertIn('api_db_queries_total{view="ModuleViewSet.list"} 1', metrics)
+        self.assertIn('api_request_duration_seconds_count{view="ModuleViewSet.list"} 1', metrics)
+
+    def test_flags_repeated_queries(self):
+        def per_module_queries(request):
+            for module in Module.objects.all():
+                list(Page.objects.filter(pk__in=range(1, module.id + 1)))
+            return HttpResponse()
+
+        middleware = profiling.ProfilingMiddleware(per_module_queries)
+        request = RequestFactory().get('/')
+        for _ in range(2):
+            create_catalog(modules=1, pages=1)
+        with self.assertLogs('api.profiling', 'WARNING') as logs:
+            middleware(request)
+        self.assertEqual(len(request.profile.n_plus_one), 1)
+        self.assertEqual(request.profile.n_plus_one[0][1], 4)
+        self.assertIn('Possible N+1 in unresolved: 4 x SELECT', logs.output[0])
+
+    def test_times_the_representation_builders(self):
+        UserProgress.objects.create(user=self.user, module=self.module, progress=30)
+        with self.assertLogs('api.profiling', 'INFO'):
+            for url in ('/api/progress/', f'/api/modules/{self.module.id}/'):
+                response = self.client.get(url)
+                self.assertGreater(response.wsgi_request.profile.serializer_time, 0, url)
+
+    def test_metrics_requires_admin(self):
+        with self.assertLogs('api.profiling', 'INFO'):
+            self.assertEqual(self.client.get('/api/metrics/').status_code, 403)
+
+    @override_settings(REQUEST_PROFILING={'ENABLED': False})
+    def test_disabled_by_default(self):
+        self.assertNotIn('Server-Timing', APIClient().get('/api/modules/'))
+
+    @ASYNC_READS
+    async def test_counts_async_view_queries(self):
+        access = CustomTokenObtainPairSerializer.get_token(self.user).access_token
+        with self.assertLogs('api.profiling', 'INFO') as logs:
+            response = await self.async_client.get('/api/modules/', headers={'Authorization': f'Bearer {access}'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('desc="2 queries"', response['Server-Timing'])
+        self.assertTrue(logs.output[0].startswith('INFO:api.profiling:api.async_views.module_list GET 200 queries=2'))
+
+
+@override_settings(JWT_CLAIMS_USER=True)
+class ClaimsAuthenticationTests(TestCase):
+    def setUp(self):
+        auth_cache().clear()
+        self.user = create_user()
+        self.admin = create_admin()
+        self.module = create_catalog(modules=2, pages=2)[0]
+
+    def login(self, email):
+        response = APIClient().post('/api/token/', {'email': email, 'password': 'secret'}, format='json')
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        return client, response.data
+
+    def test_token_carries_user_claims(self):
+        _, tokens = self.login('admin@example.com')
+        token = AccessToken(tokens['access'])
+        self.assertEqual(token['email'], 'admin@example.com')
+        self.assertTrue(token['is_admin'])
+        self.assertFalse(token['is_superuser'])
+
+    def test_reads_skip_the_user_query(self):
+        client, _ = self.login('learner@example.com')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(client.get('/api/modules/').status_code, 200)
+        self.assertFalse(any('"api_user"' in q['sql'] for q in queries.captured_queries))
+
+        with override_settings(JWT_CLAIMS_USER=False):
+            with CaptureQueriesContext(connection) as db_queries:
+                client.get('/api/modules/')
+        self.assertEqual(len(db_queries), len(queries) + 1)
+
+    def test_writes_and_full_profile(self):
+        client, _ = self.login('admin@example.com')
+        response = client.post('/api/modules/', {'title': 'New', 'description': 'New'}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        client, _ = self.login('learner@example.com')
+        self.assertEqual(client.post('/api/modules/', {'title': 'X', 'description': 'X'}).status_code, 403)
+        self.assertEqual(client.get('/api/users/me/').data['first_name'], 'Learner')
+        response = client.put(f'/api/progress/by-module/{self.module.id}/', {'progress': 40}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(UserProgress.objects.get(user=self.user).progress, 40)
+
+    def later(self, seconds=1):
+        # Revocation has the one-second resolution of the tokens' iat
+        return mock.patch('api.authentication.time.time', return_value=time.time() + seconds)
+
+    def test_role_change_revokes_tokens(self):
+        client, tokens = self.login('admin@example.com')
+        self.assertEqual(client.get('/api/modules/').status_code, 200)
+        self.admin.is_admin = False
+        with self.later():
+            self.admin.save()
+        self.assertEqual(client.get('/api/modules/').status_code, 401)
+
+        # Access tokens minted from the old refresh token keep its login time
+        refreshed = APIClient().post('/api/token/refresh/', {'refresh': tokens['refresh']}, format='json')
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {refreshed.data['access']}")
+        self.assertEqual(client.get('/api/modules/').status_code, 401)
+
+    def test_password_change_revokes_tokens(self):
+        client, _ = self.login('learner@example.com')
+        with self.later():
+            response = client.patch(
+                f'/api/users/{self.user.id}/', {'current_password': 'secret', 'new_password': 'changed'},
+                format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(client.get('/api/modules/').status_code, 401)
+
+    def test_tokens_issued_in_the_revocation_second_are_accepted(self):
+        self.user.is_superuser = True
+        self.user.save()
+        client, _ = self.login('learner@example.com')
+        self.assertEqual(client.get('/api/modules/').status_code, 200)
+
+    def test_rehashing_on_login_keeps_tokens(self):
+        client, _ = self.login('learner@example.com')
+        # Fewer iterations than configured, so check_password() upgrades the hash
+        hasher = get_hasher('pbkdf2_sha256')
+        self.user.password = hasher.encode('secret', hasher.salt(), iterations=1)
+        self.user.save()
+        with self.later(), mock.patch('api.signals.revoke_user_tokens') as revoke:
+            self.login('learner@example.com')
+        revoke.assert_not_called()
+        self.user.refresh_from_db()
+        self.assertNotIn('$1$', self.user.password)
+        self.assertEqual(client.get('/api/modules/').status_code, 200)
+
+    def test_single_token_revocation(self):
+        client, tokens = self.login('learner@example.com')
+        revoke_token(AccessToken(tokens['access']))
+        self.assertEqual(client.get('/api/modules/').status_code, 401)
+        other, _ = self.login('learner@example.com')
+        self.assertEqual(other.get('/api/modules/').status_code, 200)
+
+    def test_tokens_without_claims_use_the_database(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(client.get('/api/modules/').status_code, 200)
+        self.assertTrue(any('"api_user"' in q['sql'] for q in queries.captured_queries))
+
+
+@override_settings(PASSWORD_HASH_COST={'PBKDF2_ITERATIONS': 1000, 'SCRYPT_WORK_FACTOR': 1024})
+class LoginTests(TestCase):
+    def setUp(self):
+        self.user = create_user()
+
+    def login(self):
+        return APIClient().post('/api/token/', {'email': 'learner@example.com', 'password': 'secret'}, format='json')
+
+    def test_login_runs_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.login()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(queries), 1)
+
+    def test_rehashes_when_cost_changes(self):
+        self.assertIn('$1000$', self.user.password)
+        with override_settings(PASSWORD_HASH_COST={'PBKDF2_ITERATIONS': 2000}):
+            self.assertEqual(self.login().status_code, 200)
+            self.user.refresh_from_db()
+            self.assertTrue(self.user.password.startswith('pbkdf2_sha256$2000$'))
+            # Up to date hashes are left alone
+            with CaptureQueriesContext(connection) as queries:
+                self.login()
+            self.assertEqual(len(queries), 1)
+
+    def test_rehashes_to_the_preferred_algorithm(self):
+        with override_settings(PASSWORD_HASHERS=['api.hashers.ScryptPasswordHasher', 'api.hashers.PBKDF2PasswordHasher']):
+            self.assertEqual(self.login().status_code, 200)
+            self.user.refresh_from_db()
+            self.assertTrue(self.user.password.startswith('scrypt$'))
+            self.assertEqual(self.login().status_code, 200)
+
+    def test_verifies_hashes_from_django_defaults(self):
+        hasher = get_hasher('pbkdf2_sha1')
+        self.user.password = hasher.encode('secret', hasher.salt(), iterations=1000)
+        self.user.save()
+        self.assertEqual(self.login().status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$'))
+
+    def test_wrong_password(self):
+        response = APIClient().post('/api/token/', {'email': 'learner@example.com', 'password': 'nope'}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+
+@ASYNC_READS
+@override_settings(JWT_CLAIMS_USER=True)
+class AsyncReadViewTests(TestCase):
+    def setUp(self):
+        module_cache.get_cache().clear()
+        auth_cache().clear()
+        self.user = create_user()
+        self.modules = create_catalog(modules=3, pages=2)
+        self.user.saved_modules.add(self.modules[0])
+        UserProgress.objects.create(user=self.user, module=self.modules[1], progress=30)
+        access = CustomTokenObtainPairSerializer.get_token(self.user).access_token
+        self.headers = {'headers': {'Authorization': f'Bearer {access}'}}
+
+    def read_urls(self):
+        module_id = self.modules[1].id
+        return [
+            '/api/modules/',
+            '/api/modules/?page_size=2&ordering=-updated_at',
+            '/api/modules/saved/',
+            f'/api/modules/{module_id}/',
+            f'/api/modules/{module_id}/pages/',
+            '/api/progress/',
+            '/api/users/me/',
+            '/api/modules/?fields=id,title',
+            f'/api/modules/{module_id}/?fields=id,pages.id,pages.quiz_options.text',
+            f'/api/modules/{module_id}/pages/?fields=id,type',
+            '/api/progress/?fields=module,progress',
+        ]
+
+    async def test_matches_the_sync_views(self):
+        for url in self.read_urls():
+            response = await self.async_client.get(url, **self.headers)
+            with override_settings(ROOT_URLCONF='micro_learning.urls'):
+                expected = await sync_to_async(self.client.get)(url, **self.headers)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertEqual(response.json(), expected.json(), url)
+            self.assertEqual(response.get('ETag'), expected.get('ETag'), url)
+
+    async def test_follows_cursors(self):
+        response = await self.async_client.get('/api/modules/?page_size=2', **self.headers)
+        self.assertEqual(len(response.json()['results']), 2)
+        response = await self.async_client.get(response.json()['next'], **self.headers)
+        self.assertEqual([m['id'] for m in response.json()['results']], [self.modules[0].id])
+        self.assertIsNone(response.json()['next'])
+
+    async def test_conditional_and_errors(self):
+        url = f'/api/modules/{self.modules[1].id}/'
+        etag = (await self.async_client.get(url, **self.headers))['ETag']
+        response = await self.async_client.get(url, headers={**self.headers['headers'], 'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+        self.assertEqual((await self.async_client.get('/api/modules/999/', **self.headers)).status_code, 404)
+        for missing in ('/api/modules/999/', '/api/modules/999/pages/'):
+            response = await self.async_client.get(
+                missing, headers={**self.headers['headers'], 'If-Modified-Since': 'Fri, 01 Jan 2100 00:00:00 GMT'}
+            )
+            self.assertEqual(response.status_code, 404)
+        response = await self.async_client.get('/api/modules/')
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('Bearer', response['WWW-Authenticate'])
+        response = await self.async_client.get('/api/modules/', headers={'Authorization': 'Bearer nope'})
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['code'], 'token_not_valid')
+
+    async def test_writes_fall_back_to_the_sync_views(self):
+        response = await self.async_client.post(
+            '/api/modules/', {'title': 'X', 'description': 'X'}, content_type='application/json', **self.headers
+        )
+        self.assertEqual(response.status_code, 403)
+        response = await self.async_client.patch(
+            '/api/users/me/', {'first_name': 'Renamed'}, content_type='application/json', **self.headers
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['first_name'], 'Renamed')
+
+
+flaky_calls = []
+
+
+@tasks.task(max_attempts=2)
+def flaky(value):
+    flaky_calls.append(value)
+    raise RuntimeError('SMTP down')
+
+
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        flaky_calls.clear()
+        self.user = create_user()
+
+    def test_password_reset_mail_is_sent_by_a_worker(self):
+        response = APIClient().post('/api/users/password_reset/', {'email': 'learner@example.com'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(mail.outbox), 0)
+        job = Job.objects.get()
+        self.assertEqual((job.task, job.args), ('api.tasks.send_password_reset', [self.user.pk]))
+
+        self.assertEqual(tasks.run_pending(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['learner@example.com'])
+        self.assertIn('/reset-password?token=', mail.outbox[0].body)
+        self.assertFalse(Job.objects.exists())
+
+    def test_failures_back_off_then_fail(self):
+        flaky.enqueue('a')
+        with self.assertLogs('api.tasks', 'WARNING'):
+            self.assertEqual(tasks.run_pending(), 1)
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), (Job.PENDING, 1))
+        self.assertIn('SMTP down', job.last_error)
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=4))
+        # Not due yet
+        self.assertEqual(tasks.run_pending(), 0)
+
+        Job.objects.update(run_at=timezone.now())
+        with self.assertLogs('api.tasks', 'ERROR'):
+            self.assertEqual(tasks.run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertEqual(flaky_calls, ['a', 'a'])
+
+    def test_jobs_of_a_lost_worker_are_retried(self):
+        job = flaky.enqueue('b')
+        Job.objects.update(status=Job.RUNNING, attempts=1, locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(tasks.release_stale_jobs(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.PENDING)
+
+    def test_bulk_page_writes_warm_the_module_cache(self):
+        client = signed_in(create_admin())
+        module = create_catalog(modules=1, pages=1)[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.put(f'/api/modules/{module.id}/pages/bulk/', {'pages': [
+                {'type': 'text', 'content': 'Intro'},
+            ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Job.objects.get().task, 'api.tasks.warm_module_trees')
+
+        self.assertEqual(tasks.run_pending(), 1)
+        module_cache.reset_stats()
+        client.get(f'/api/modules/{module.id}/pages/')
+        self.assertEqual(module_cache.get_stats()['misses'], 0)
+
+
+class ModuleSearchTests(LearnerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.python = Module.objects.create(title='Python basics', description='Variables and loops', category='Computer Science')
+        self.cooking = Module.objects.create(title='Knife skills', description='Chopping onions', category='Cooking')
+        Page.objects.create(module=self.cooking, type='text', content='Dice the onion, then <b>sauté</b> it in python oil.')
+        self.page = Page.objects.create(module=self.python, type='text', content='A list comprehension builds lists.')
+
+    def search(self, **params):
+        return self.client.get('/api/modules/search/', params)
+
+    def test_ranks_title_matches_first_with_snippets(self):
+        response = self.search(q='python')
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results']
+        self.assertEqual([r['id'] for r in results], [self.python.id, self.cooking.id])
+        self.assertGreater(results[0]['score'], results[1]['score'])
+        self.assertIn('<mark>Python</mark>', results[0]['snippet'])
+        # Page text is escaped, only the match markers are markup
+        self.assertIn('&lt;b&gt;sauté&lt;/b&gt; it in <mark>python</mark> oil', results[1]['snippet'])
+        self.assertEqual(results[0]['page_count'], 1)
+
+    def test_prefix_terms_category_and_paging(self):
+        self.assertEqual([r['id'] for r in self.search(q='comprehen').data['results']], [self.python.id])
+        self.assertEqual([r['id'] for r in self.search(q='python', category='Cooking').data['results']], [self.cooking.id])
+        self.assertEqual(self.search(q='python onions').data['results'][0]['id'], self.cooking.id)
+
+        response = self.search(q='python', limit=1)
+        self.assertEqual(len(response.data['results']), 1)
+        response = self.client.get(response.data['next'])
+        self.assertEqual([r['id'] for r in response.data['results']], [self.cooking.id])
+        self.assertIsNone(response.data['next'])
+
+        self.assertEqual(self.search(q=' "*').status_code, 400)
+
+    def test_index_follows_writes(self):
+        self.page.content = 'Generators yield values lazily.'
+        self.page.save()
+        self.assertEqual(self.search(q='comprehension').data['results'], [])
+        self.assertEqual([r['id'] for r in self.search(q='generators').data['results']], [self.python.id])
+
+        # Bulk writes send no signals and are indexed all the same
+        Page.objects.bulk_create([Page(module=self.cooking, type='text', content='Whisk the eggs')])
+        self.assertEqual([r['id'] for r in self.search(q='whisk').data['results']], [self.cooking.id])
+
+        self.python.delete()
+        self.assertEqual(self.search(q='generators').data['results'], [])
+
+    @override_settings(SEARCH_BACKEND='api.search.ScanSearchBackend')
+    def test_scan_backend(self):
+        results = self.search(q='python').data['results']
+        self.assertEqual({r['id'] for r in results}, {self.python.id, self.cooking.id})
+        self.assertEqual([r['id'] for r in self.search(q='onion', category='Cooking').data['results']], [self.cooking.id])
+
+
+class ModuleStatsTests(AdminTestCase):
+    def setUp(self):
+        super().setUp()
+        self.learners = [create_user(f'learner{i}@example.com', 'L', str(i)) for i in range(3)]
+        self.module, self.other = create_catalog(modules=2, pages=1, options=0)
+
+    def stats(self):
+        response = self.client.get('/api/modules/stats/')
+        self.assertEqual(response.status_code, 200)
+        return {row['id']: row for row in response.data}
+
+    def test_totals_follow_every_kind_of_write(self):
+        a, b, c = self.learners
+        UserProgress.objects.create(user=a, module=self.module, progress=40)
+        UserProgress.objects.upsert(b.id, self.module.id, 100)
+        UserProgress.objects.bulk_upsert([(c.id, self.module.id, 20, None, timezone.now())])
+        a.saved_modules.add(self.module, self.other)
+        b.saved_modules.add(self.module)
+
+        stats = self.stats()[self.module.id]
+        self.assertEqual((stats['learners'], stats['completed'], stats['saves']), (3, 1, 2))
+        self.assertEqual(stats['average_progress'], 53.33)
+        self.assertEqual(stats['completion_rate'], 0.3333)
+        self.assertEqual(self.stats()[self.other.id]['saves'], 1)
+
+        UserProgress.objects.upsert(a.id, self.module.id, 100)
+        UserProgress.objects.filter(user=c).delete()
+        b.saved_modules.remove(self.module)
+        stats = self.stats()[self.module.id]
+        self.assertEqual((stats['learners'], stats['completed'], stats['saves']), (2, 2, 1))
+        self.assertEqual(stats['average_progress'], 100.0)
+
+        # The running totals agree with a recount
+        before = self.stats()
+        module_stats.refresh_module_stats()
+        self.assertEqual(self.stats(), before)
+
+        # Cascades don't resurrect the deleted module's row
+        self.module.delete()
+        self.assertNotIn(self.module.id, self.stats())
+
+    def test_one_query_and_admin_only(self):
+        with self.assertNumQueries(1):
+            self.client.get('/api/modules/stats/')
+        stats = self.stats()[self.other.id]
+        self.assertEqual((stats['learners'], stats['completion_rate'], stats['average_progress']), (0, 0.0, 0.0))
+
+        learner = signed_in(self.learners[0])
+        self.assertEqual(learner.get('/api/modules/stats/').status_code, 403)
+
+
+class ModuleCompletionTests(LearnerTestCase):
+    def setUp(self):
+        module_cache.get_cache().clear()
+        super().setUp()
+        self.modules = create_catalog(modules=4, pages=1, options=0)
+
+    def complete(self, module):
+        return self.client.post(f'/api/modules/{module.id}/complete/')
+
+    def test_completes_once_and_counts(self):
+        response = self.complete(self.modules[0])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['message'], 'Module completed successfully')
+        self.assertEqual((response.data['completed_modules_count'], response.data['progression']), (1, 25.0))
+        progress = UserProgress.objects.get(user=self.user, module=self.modules[0])
+        self.assertEqual(progress.progress, UserProgress.COMPLETE)
+        self.assertEqual(progress.completed_at, response.data['completed_at'])
+
+        response = self.complete(self.modules[0])
+        self.assertEqual(response.data['message'], 'Module already completed')
+        self.assertEqual(response.data['completed_modules_count'], 1)
+        self.assertEqual(response.data['completed_at'], progress.completed_at)
+
+        # Completing a module already in progress updates its row
+        UserProgress.objects.upsert(self.user.id, self.modules[1].id, 30)
+        self.assertEqual(self.complete(self.modules[1]).data['completed_modules_count'], 2)
+        self.assertEqual(self.client.post('/api/modules/999/complete/').status_code, 404)
+
+    def test_every_write_reaching_complete_completes(self):
+        first, second, third, fourth = self.modules
+        response = self.client.put(f'/api/progress/by-module/{first.id}/', {'completed': True}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(response.data['completed_at'])
+        self.assertEqual(self.complete(first).data['message'], 'Module already completed')
+
+        # Dropping back keeps the completion, for the counter and the stats alike
+        self.client.put(f'/api/progress/by-module/{first.id}/', {'progress': 40}, format='json')
+        self.assertIsNotNone(UserProgress.objects.get(user=self.user, module=first).completed_at)
+        self.assertEqual(ModuleStats.objects.get(module=first).completed, 1)
+
+        progress = UserProgress.objects.create(user=self.user, module=second, progress=30)
+        self.client.patch(f'/api/progress/{progress.id}/', {'completed': True}, format='json')
+        UserProgress.objects.bulk_upsert([(self.user.id, third.id, 100.0, None, timezone.now())])
+        with self.settings(PROGRESS_WRITE_BEHIND={'ENABLED': True, 'FLUSH_INTERVAL': 0, 'MAX_PENDING': 100}):
+            response = self.client.put(f'/api/progress/by-module/{fourth.id}/', {'progress': 100}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.completed_modules_count, 4)
+        self.assertEqual(UserProgress.objects.filter(completed_at__isnull=False).count(), 4)
+        self.assertEqual(sum(ModuleStats.objects.values_list('completed', flat=True)), 4)
+
+    def test_query_count_is_independent_of_the_catalog(self):
+        self.complete(self.modules[0])
+        create_catalog(modules=20, pages=0)
+        # New modules invalidate the cached catalog size; the next completion counts it again
+        with self.assertNumQueries(6):
+            self.complete(self.modules[1])
+        with self.assertNumQueries(5):
+            # Savepoint, upsert, counter update, release, counter read
+            response = self.complete(self.modules[2])
+        self.assertEqual(response.data['progression'], 3 / 24 * 100)
+
+    def test_counter_follows_deletes_and_survives_full_saves(self):
+        for module in self.modules[:3]:
+            self.complete(module)
+        self.user.first_name = 'Renamed'
+        self.user.save()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.completed_modules_count, 3)
+
+        self.modules[0].delete()
+        progress = UserProgress.objects.get(user=self.user, module=self.modules[1])
+        self.assertEqual(self.client.delete(f'/api/progress/{progress.id}/').status_code, 204)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.completed_modules_count, 1)
+        self.assertEqual(self.complete(self.modules[3]).data['progression'], 2 / 3 * 100)
+
+
+class SavedModulesTests(LearnerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.modules = create_catalog(modules=5, pages=2)
+
+    def test_save_and_unsave_one(self):
+        module = self.modules[0]
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.post(f'/api/modules/{module.id}/save/').status_code, 200)
+        # Saving twice is harmless
+        self.assertEqual(self.client.post(f'/api/modules/{module.id}/save/').status_code, 200)
+        self.assertEqual(self.client.get('/api/modules/saved/ids/').data, {'ids': [module.id]})
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.post(f'/api/modules/{module.id}/unsave/').status_code, 200)
+        self.assertEqual(self.client.post(f'/api/modules/{module.id}/unsave/').status_code, 200)
+        self.assertEqual(self.client.post('/api/modules/999/save/').status_code, 404)
+        self.assertEqual(self.client.post('/api/modules/999/unsave/').status_code, 404)
+
+    def test_batch(self):
+        ids = [module.id for module in self.modules]
+        self.user.saved_modules.add(self.modules[0])
+        with self.assertNumQueries(5):
+            # Savepoint, DELETE, existing ids, INSERT, release
+            response = self.client.post(
+                '/api/modules/saved/batch/', {'add': ids[1:] + [999], 'remove': [ids[0]]}, format='json'
+            )
+        self.assertEqual(response.data, {'added': sorted(ids[1:]), 'removed': 1})
+        self.assertEqual(sorted(self.user.saved_module_ids()), sorted(ids[1:]))
+        self.assertEqual(ModuleStats.objects.get(module=self.modules[0]).saves, 0)
+        self.assertEqual(ModuleStats.objects.get(module=self.modules[1]).saves, 1)
+
+        for payload in [{}, {'add': []}, {'add': [ids[0]], 'remove': [ids[0]]}, {'add': ['x']}]:
+            response = self.client.post('/api/modules/saved/batch/', payload, format='json')
+            self.assertEqual(response.status_code, 400, payload)
+
+    def test_ids_query_count_is_constant(self):
+        self.user.saved_modules.add(*self.modules)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/modules/saved/ids/')
+        self.assertEqual(sorted(response.data['ids']), sorted(module.id for module in self.modules))
+
+    def test_saved_list_is_a_paginated_summary(self):
+        self.user.saved_modules.add(*self.modules[:3])
+        response = self.client.get('/api/modules/saved/?page_size=2')
+        self.assertEqual([item['id'] for item in response.data['results']], [m.id for m in self.modules[2:0:-1]])
+        self.assertEqual(response.data['results'][0]['page_count'], 2)
+        self.assertNotIn('pages', response.data['results'][0])
+        response = self.client.get(response.data['next'])
+        self.assertEqual([item['id'] for item in response.data['results']], [self.modules[0].id])
+        self.assertNotIn('saved_modules', self.client.get('/api/users/me/').data)
+
+
+class DatabaseProfileTests(TestCase):
+    def test_sqlite_pragmas_are_applied_on_connect(self):
+        with tempfile.TemporaryDirectory() as directory:
+            settings_dict = {
+                **connection.settings_dict,
+                'NAME': os.path.join(directory, 'db.sqlite3'),
+                'PRAGMAS': {'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'busy_timeout': 1234},
+            }
+            wrapper = type(connections['default'])(settings_dict, alias='profile')
+            try:
+                with wrapper.cursor() as cursor:
+                    pragmas = [
+                        cursor.execute(f'PRAGMA {name}').fetchone()[0]
+                        for name in ('journal_mode', 'synchronous', 'busy_timeout')
+                    ]
+            finally:
+                wrapper.close()
+        # synchronous=NORMAL reads back as 1
+        self.assertEqual(pragmas, ['wal', 1, 1234])
+
+
+class QuizGradingTests(LearnerTestCase):
+    def setUp(self):
+        module_cache.get_cache().clear()
+        super().setUp()
+        self.module = create_catalog(modules=1, pages=3, options=3)[0]
+        self.pages = list(self.module.pages.all())
+        self.options = {page.id: list(page.quiz_options.values_list('id', flat=True)) for page in self.pages}
+        self.url = f'/api/modules/{self.module.id}/quiz/'
+
+    def answer(self, page, *indexes):
+        return {'page': page.id, 'options': [self.options[page.id][i] for i in indexes]}
+
+    def test_grades_a_batch_and_records_attempts(self):
+        # Option 0 is the correct one on every page
+        response = self.client.post(self.url, {'answers': [
+            self.answer(self.pages[0], 0), self.answer(self.pages[1], 1), self.answer(self.pages[2], 0, 1),
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['score'], response.data['total']), (1, 3))
+        self.assertEqual([r['correct'] for r in response.data['results']], [True, False, False])
+
+        attempts = QuizAttempt.objects.filter(user=self.user).order_by('page_id')
+        self.assertEqual([a.is_correct for a in attempts], [True, False, False])
+        self.assertEqual(attempts[2].selected, sorted(self.options[self.pages[2].id][:2]))
+
+    def test_answer_key_is_cached_until_options_change(self):
+        submission = {'answers': [self.answer(self.pages[0], 1)]}
+        self.client.post(self.url, submission, format='json')
+        # The cached key, then one INSERT for the attempts
+        with self.assertNumQueries(1):
+            response = self.client.post(self.url, submission, format='json')
+        self.assertFalse(response.data['results'][0]['correct'])
+
+        QuizOption.objects.filter(pk=self.options[self.pages[0].id][1]).update(is_correct=True)
+        QuizOption.objects.get(pk=self.options[self.pages[0].id][0]).save()
+        response = self.client.post(self.url, {'answers': [self.answer(self.pages[0], 0, 1)]}, format='json')
+        self.assertTrue(response.data['results'][0]['correct'])
+
+    def test_rejects_invalid_submissions(self):
+        other = create_catalog(modules=1, pages=1)[0].pages.get()
+        other_option = other.quiz_options.first().id
+        for answers in [
+            [],
+            [self.answer(self.pages[0], 0), self.answer(self.pages[0], 1)],
+            [{'page': other.id, 'options': [other_option]}],
+            [{'page': self.pages[0].id, 'options': [other_option]}],
+        ]:
+            response = self.client.post(self.url, {'answers': answers}, format='json')
+            self.assertEqual(response.status_code, 400, answers)
+        self.assertEqual(self.client.post('/api/modules/999/quiz/', {'answers': []}, format='json').status_code, 404)
+        self.assertFalse(QuizAttempt.objects.exists())
+
+    def test_answers_are_hidden_from_learners(self):
+        admin_client = signed_in(create_admin())
+        reads = [
+            (f'/api/modules/{self.module.id}/', lambda data: data['pages'][0]),
+            (f'/api/modules/{self.module.id}/pages/', lambda data: data[0]),
+            (f'/api/modules/{self.module.id}/pages/{self.pages[0].id}/', lambda data: data),
+        ]
+        for url, first_page in reads:
+            option = first_page(self.client.get(url).data)['quiz_options'][0]
+            self.assertEqual(set(option), {'id', 'text'}, url)
+            option = first_page(admin_client.get(url).data)['quiz_options'][0]
+            self.assertTrue(option['is_correct'], url)
+        self.assertFalse(self.client.get(f'/api/modules/{self.module.id}/pages/').data[0]['multiple_answers'])
+        self.assertNotEqual(
+            self.client.get(f'/api/modules/{self.module.id}/pages/')['ETag'],
+            admin_client.get(f'/api/modules/{self.module.id}/pages/')['ETag'],
+        )
+
+
+class FastRepresentationTests(TestCase):
+    def setUp(self):
+        self.user = create_user()
+
+    def assertSameJSON(self, fast, data):
+        self.assertEqual(JSONRenderer().render(fast), JSONRenderer().render(data))
+
+    def test_module_tree_matches_the_serializer(self):
+        module = create_catalog(modules=1, pages=3, options=3)[0]
+        module.description = 'Ünïcödé \u2028 "quoted"'
+        module.save()
+        quiz = module.pages.first()
+        quiz.quiz_options.update(is_correct=True)
+        Page.objects.create(module=module, type='text', content='Line\nbreak', rank=0.5)
+        Page.objects.create(module=module, type='video', content='https://example.com/v', rank=10)
+        empty = Module.objects.create(title='Empty', description='', category='Art')
+
+        instances = Module.objects.prefetch_related(
+            Prefetch('pages', queryset=Page.objects.with_position().prefetch_related('quiz_options'))
+        )
+        for module_id in (module.id, empty.id):
+            for answers in (False, True):
+                data = ModuleSerializer(instances.get(pk=module_id), context={'answers': answers}).data
+                self.assertSameJSON(representations.module_tree(module_id, answers), data)
+        self.assertIsNone(representations.module_tree(999))
+
+    def test_progress_list_matches_the_serializer(self):
+        modules = create_catalog(modules=3, pages=1, options=0)
+        UserProgress.objects.create(user=self.user, module=modules[0], progress=12.5)
+        UserProgress.objects.create(
+            user=self.user, module=modules[1], progress=30, last_page_viewed=modules[1].pages.get()
+        )
+        UserProgress.objects.complete(self.user.id, modules[2].id)
+        queryset = UserProgress.objects.filter(user=self.user)
+        self.assertSameJSON(representations.progress_list(queryset), UserProgressSerializer(queryset, many=True).data)
+
+    def test_fast_renderer_matches_json_renderer(self):
+        data = {
+            'text': 'Ünïcödé \u2028\u2029 "quoted" \\ </script>',
+            'numbers': [0, -1, 0.1, 33.333333333333336, 100.0, 2 ** 53, None, True],
+            'when': timezone.now(),
+            'day': timezone.now().date(),
+            'amount': Decimal('1.10'),
+            'nested': [{'a': {'b': []}}, {}],
+            1: 'int key',
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        # Indented output is left to JSONRenderer
+        self.assertEqual(
+            FastJSONRenderer().render(data, 'application/json; indent=2'),
+            JSONRenderer().render(data, 'application/json; indent=2'),
+        )
+
+
+class NDJSONTransferTests(AdminTestCase):
+    def setUp(self):
+        super().setUp()
+        self.learner = create_user()
+
+    def export(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        return b''.join(response.streaming_content)
+
+    def post_import(self, body, source='staging'):
+        return self.client.post(f'/api/import/?source={source}', body, content_type='application/x-ndjson')
+
+    def test_module_export_copies_trees_with_new_ids(self):
+        first, second = create_catalog(modules=2, pages=2, options=2)
+        body = self.export(f'/api/export/modules/?module={first.id}')
+        models = [json.loads(line)['model'] for line in body.splitlines()]
+        self.assertEqual(models, ['header', 'module', 'page', 'page'] + ['option'] * 4)
+
+        response = self.post_import(body)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['imported'], {
+            'modules': 1, 'pages': 2, 'options': 4, 'progress': 0, 'existing': 0, 'skipped': 0,
+        })
+        copy = Module.objects.latest('id')
+        self.assertNotIn(copy.id, (first.id, second.id))
+        self.assertEqual(copy.title, first.title)
+        self.assertEqual(
+            [(page.content, [(o.text, o.is_correct) for o in page.quiz_options.all()]) for page in copy.pages.all()],
+            [(page.content, [(o.text, o.is_correct) for o in page.quiz_options.all()]) for page in first.pages.all()],
+        )
+
+        # Importing the same export again finds everything already there
+        response = self.post_import(body)
+        self.assertEqual(response.data['imported']['existing'], 7)
+        self.assertEqual(Module.objects.count(), 3)
+
+    def test_import_into_existing_module_invalidates_its_tree(self):
+        module_cache.get_cache().clear()
+        source = create_catalog(modules=1, pages=1, options=0)[0]
+        source_page = source.pages.get()
+        self.post_import(self.export(f'/api/export/modules/?module={source.id}'))
+        copy = Module.objects.latest('id')
+        before = self.client.get(f'/api/modules/{copy.id}/pages/')
+        self.assertEqual(len(before.data), 1)
+
+        header = b'{"model": "header", "version": 1, "source": "staging"}\n'
+        records = [
+            {'model': 'page', 'id': source_page.id + 1000, 'module': source.id, 'type': 'text', 'content': 'New',
+             'rank': 2},
+            {'model': 'option', 'id': 1000, 'page': source_page.id, 'text': 'Yes', 'is_correct': True},
+        ]
+        for record in records:
+            with self.subTest(model=record['model']):
+                response = self.post_import(header + json.dumps(record).encode())
+                self.assertEqual(response.status_code, 200)
+                after = self.client.get(f'/api/modules/{copy.id}/pages/')
+                self.assertNotEqual(after['ETag'], before['ETag'])
+                before = after
+        self.assertEqual(len(after.data), 2)
+        self.assertEqual(len(after.data[0]['quiz_options']), 1)
+
+    def test_interrupted_import_resumes(self):
+        create_catalog(modules=3, pages=2, options=1)
+        lines = list(transfer.export_modules(chunk_size=2))
+        lines = b''.join(lines).splitlines()
+        broken = lines[:8] + [b'{not json'] + lines[8:]
+
+        counts = {}
+        with self.assertRaisesMessage(ValueError, 'Line 9: not valid JSON'):
+            transfer.import_records(broken, source='staging', chunk_size=3, counts=counts)
+        # The first two chunks of three records are committed
+        self.assertEqual(counts['modules'] + counts['pages'] + counts['options'], 6)
+        self.assertEqual(ImportedRecord.objects.filter(source='staging').count(), 6)
+
+        counts = transfer.import_records(lines, source='staging', chunk_size=3)
+        self.assertEqual(counts['existing'], 6)
+        self.assertEqual(counts['modules'] + counts['pages'] + counts['options'], 15 - 6)
+        self.assertEqual(Module.objects.count(), 6)
+        self.assertEqual(Page.objects.count(), 12)
+        self.assertEqual(QuizOption.objects.count(), 12)
+        for page in Page.objects.filter(module__in=Module.objects.order_by('-id')[:3]):
+            self.assertEqual(page.quiz_options.count(), 1)
+
+    def test_progress_round_trip(self):
+        modules = create_catalog(modules=2, pages=1, options=0)
+        page = modules[0].pages.get()
+        UserProgress.objects.create(user=self.learner, module=modules[0], progress=40, last_page_viewed=page)
+        UserProgress.objects.complete(self.learner.id, modules[1].id)
+        body = self.export('/api/export/progress/')
+        UserProgress.objects.all().delete()
+        User.objects.filter(pk=self.learner.pk).update(completed_modules_count=0)
+
+        # Our own export restores onto the same ids
+        with self.settings(TRANSFER_SOURCE='production'):
+            response = self.post_import(body, source='production')
+        self.assertEqual(response.data['imported']['progress'], 2)
+        rows = {row.module_id: row for row in UserProgress.objects.filter(user=self.learner)}
+        self.assertEqual(rows[modules[0].id].progress, 40)
+        self.assertEqual(rows[modules[0].id].last_page_viewed_id, page.id)
+        self.assertIsNotNone(rows[modules[1].id].completed_at)
+        self.learner.refresh_from_db()
+        self.assertEqual(self.learner.completed_modules_count, 1)
+
+        # From elsewhere, only modules imported from that source are known
+        response = self.post_import(body, source='elsewhere')
+        self.assertEqual(response.data['imported']['skipped'], 2)
+
+    def test_older_progress_does_not_overwrite_newer(self):
+        module = create_catalog(modules=1, pages=1, options=0)[0]
+        progress = UserProgress.objects.create(user=self.learner, module=module, progress=40)
+        body = self.export('/api/export/progress/')
+        # The learner moves on after the export was taken
+        UserProgress.objects.filter(pk=progress.pk).update(
+            progress=80, updated_at=progress.updated_at + timedelta(minutes=1)
+        )
+
+        with self.settings(TRANSFER_SOURCE='production'):
+            response = self.post_import(body, source='production')
+        self.assertEqual(response.data['imported']['progress'], 0)
+        self.assertEqual(response.data['imported']['existing'], 1)
+        progress.refresh_from_db()
+        self.assertEqual(progress.progress, 80)
+
+    def test_invalid_records_are_rejected(self):
+        module = create_catalog(modules=1, pages=0, options=0)[0]
+        header = b'{"model": "header", "version": 1, "source": "staging"}\n'
+        records = [
+            ({'model': 'module', 'id': '1', 'title': 'T', 'description': '', 'category': 'General'}, 'id'),
+            ({'model': 'module', 'id': 1, 'title': None, 'description': '', 'category': 'Cooking'}, 'title'),
+            ({'model': 'module', 'id': 1, 'title': 'T', 'description': '', 'category': 'Gardening'}, 'category'),
+            ({'model': 'page', 'id': 1, 'module': 1, 'type': 'slide', 'content': '', 'rank': 1}, 'type'),
+            ({'model': 'page', 'id': 1, 'module': 1, 'type': 'text', 'content': [], 'rank': 'first'},
+             'content, rank'),
+            ({'model': 'option', 'id': 1, 'page': 1, 'text': 'A', 'is_correct': 'yes'}, 'is_correct'),
+            ({'model': 'progress', 'user': 'learner@example.com', 'module': module.id, 'progress': 50,
+              'updated_at': 'yesterday'}, 'updated_at'),
+            ({'model': 'progress', 'user': 'learner@example.com', 'module': module.id, 'progress': True,
+              'updated_at': '2026-01-01T00:00:00Z', 'last_page_viewed': 1.5}, 'progress, last_page_viewed'),
+        ]
+        for record, invalid in records:
+            with self.subTest(record=record):
+                response = self.post_import(header + json.dumps(record).encode())
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.data['error'], f'Line 2: invalid {invalid}')
+        self.assertEqual(Module.objects.count(), 1)
+        self.assertFalse(UserProgress.objects.exists())
+
+    def test_management_commands(self):
+        create_catalog(modules=1, pages=1, options=2)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'modules.ndjson')
+            call_command('export_ndjson', 'modules', output=path)
+            out = StringIO()
+            call_command('import_ndjson', path, source='staging', stdout=out)
+            self.assertIn('1 modules, 1 pages, 2 options', out.getvalue())
+            with open(path, 'ab') as fh:
+                fh.write(b'{"model": "lesson"}\n')
+            with self.assertRaisesMessage(CommandError, "Line 6: unknown model 'lesson'"):
+                call_command('import_ndjson', path, source='staging')
+        self.assertEqual(Module.objects.count(), 2)
+
+    def test_admin_only(self):
+        self.client.force_authenticate(self.learner)
+        self.assertEqual(self.client.get('/api/export/modules/').status_code, 403)
+        self.assertEqual(self.client.get('/api/export/progress/').status_code, 403)
+        self.assertEqual(self.post_import(b'').status_code, 403)
+
+
+class SparseFieldsetTests(LearnerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.module = create_catalog(modules=2, pages=2, options=2)[0]
+        UserProgress.objects.create(user=self.user, module=self.module, progress=50)
+
+    def test_parse_fieldset(self):
+        self.assertIsNone(representations.parse_fieldset(''))
+        self.assertIsNone(representations.parse_fieldset(' , .'))
+        self.assertEqual(
+            representations.parse_fieldset('id, pages.id,pages.quiz_options.text,title'),
+            {'id': None, 'pages': {'id': None, 'quiz_options': {'text': None}}, 'title': None},
+        )
+        # Asking for the whole value wins over a selection inside it, in either order
+        self.assertEqual(representations.parse_fieldset('pages.id,pages'), {'pages': None})
+        self.assertEqual(representations.parse_fieldset('pages,pages.id'), {'pages': None})
+
+    def test_module_tree_without_content(self):
+        response = self.client.get(f'/api/modules/{self.module.id}/', {'fields': 'id,title,progress,pages.id,pages.order'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'id': self.module.id,
+            'title': self.module.title,
+            'pages': [{'id': page.id, 'order': i} for i, page in enumerate(self.module.pages.all())],
+            'progress': 50.0,
+        })
+        # The full tree is still served, and cached, without the parameter
+        self.assertIn('content', self.client.get(f'/api/modules/{self.module.id}/').json()['pages'][0])
+
+    def test_lists(self):
+        response = self.client.get('/api/modules/', {'fields': 'id,nope'})
+        self.assertEqual(set(response.json()), {'next', 'previous', 'results'})
+        self.assertEqual(response.json()['results'], [{'id': m.id} for m in Module.objects.order_by('-created_at')])
+
+        response = self.client.get(f'/api/modules/{self.module.id}/pages/', {'fields': 'type,quiz_options.id'})
+        self.assertEqual(response.json()[0], {
+            'type': 'quiz', 'quiz_options': [{'id': o.id} for o in self.module.pages.first().quiz_options.all()],
+        })
+        response = self.client.get('/api/progress/', {'fields': 'module,progress'})
+        self.assertEqual(response.json(), [{'module': self.module.id, 'progress': 50.0}])
+
+    def test_writes_and_errors_are_untouched(self):
+        response = self.client.get('/api/modules/999/', {'fields': 'id'})
+        self.assertEqual(response.status_code, 404)
+        self.assertIn('detail', response.json())
+        response = self.client.put(
+            f'/api/progress/by-module/{self.module.id}/?fields=progress', {'progress': 60}, format='json'
+        )
+        self.assertIn('module', response.json())
+
+
+class ResponseCompressionTests(LearnerTestCase):
+    def setUp(self):
+        module_cache.get_cache().clear()
+        super().setUp()
+        self.module = Module.objects.create(title='Long', description='Long pages')
+        for i in range(5):
+            Page.objects.create(module=self.module, type='text', content=f'Paragraph {i}. ' * 200, rank=i + 1)
+        self.url = f'/api/modules/{self.module.id}/'
+
+    def test_negotiate(self):
+        encodings = ['zstd', 'br', 'gzip']
+        self.assertEqual(compression.negotiate('gzip, deflate, br', encodings), 'br')
+        self.assertEqual(compression.negotiate('gzip;q=1.0, br;q=0.5', encodings), 'gzip')
+        self.assertEqual(compression.negotiate('*', encodings), 'zstd')
+        self.assertEqual(compression.negotiate('*;q=0.1, zstd;q=0', encodings), 'br')
+        self.assertIsNone(compression.negotiate('gzip;q=0', encodings))
+        self.assertIsNone(compression.negotiate('identity', encodings))
+        self.assertIsNone(compression.negotiate('', encodings))
+
+    def test_large_json_is_gzipped(self):
+        plain = self.client.get(self.url)
+        self.assertNotIn('Content-Encoding', plain)
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertLess(len(response.content), len(plain.content) / 5)
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+        # The weakened ETag still validates either representation
+        self.assertEqual(response['ETag'], 'W/' + plain['ETag'])
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_small_and_unlisted_responses_are_left_alone(self):
+        response = self.client.get('/api/progress/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Content-Encoding', response)
+        # A sparse fieldset can bring a body under the threshold
+        response = self.client.get(self.url, {'fields': 'id'}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotIn('Content-Encoding', response)
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip', HTTP_ACCEPT='text/html')
+        self.assertTrue(response['Content-Type'].startswith('text/html'))
+        self.assertNotIn('Content-Encoding', response)
+
+    def test_streaming_export(self):
+        self.client.force_authenticate(create_admin())
+        plain = b''.join(self.client.get('/api/export/modules/').streaming_content)
+        response = self.client.get('/api/export/modules/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertNotIn('Content-Length', response)
+        body = gzip.decompress(b''.join(response.streaming_content))
+        # Only exported_at in the header line differs between the two exports
+        self.assertEqual(body.splitlines()[1:], plain.splitlines()[1:])
+
+
+@override_settings(REPLICA_DATABASES=['replica'], REPLICA_PIN_SECONDS=60)
+class ReplicaRoutingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # A second SQLite file that never catches up: an infinitely lagging
+        # replica. The runner sets up the aliases tests declare before any
+        # class runs, so this one is added and declared here.
+        cls.replica_dir = tempfile.TemporaryDirectory()
+        connections.settings['replica'] = {
+            **connections['default'].settings_dict,
+            'NAME': os.path.join(cls.replica_dir.name, 'replica.sqlite3'),
+            'TEST': {'NAME': None, 'MIRROR': None},
+        }
+        call_command('migrate', database='replica', verbosity=0)
+        cls.databases = {'default', 'replica'}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+        cls.replica_dir.cleanup()
+
+    def setUp(self):
+        module_cache.get_cache().clear()
+        routers.get_cache().clear()
+        self.writer = create_user('writer@example.com', 'Writer')
+        self.reader = create_user('reader@example.com', 'Reader')
+        self.module = Module.objects.create(title='Fresh title', description='Primary')
+        UserProgress.objects.create(user=self.writer, module=self.module, progress=10)
+        UserProgress.objects.create(user=self.reader, module=self.module, progress=70)
+
+        # The replica's copy, from before the title change and the reader's progress
+        User.objects.using('replica').bulk_create([
+            User(id=user.id, email=user.email, password=user.password, first_name='R', last_name='R')
+            for user in (self.writer, self.reader)
+        ])
+        Module.objects.using('replica').bulk_create([Module(id=self.module.id, title='Stale title', description='Replica')])
+        UserProgress.objects.using('replica').bulk_create([
+            UserProgress(user_id=self.writer.id, module_id=self.module.id, progress=10),
+            UserProgress(user_id=self.reader.id, module_id=self.module.id, progress=20),
+        ])
+        self.client = signed_in(self.writer)
+        self.reader_client = signed_in(self.reader)
+
+    def progress(self, client):
+        return [row['progress'] for row in client.get('/api/progress/').json()]
+
+    def test_catalog_and_progress_reads_use_the_replica(self):
+        self.assertEqual(self.client.get('/api/modules/').json()['results'][0]['title'], 'Stale title')
+        self.assertEqual(self.progress(self.reader_client), [20.0])
+        # Cached trees outlive replica lag and are built from the primary
+        self.assertEqual(self.client.get(f'/api/modules/{self.module.id}/').json()['title'], 'Fresh title')
+        # So is everything outside a request
+        self.assertEqual(Module.objects.get().title, 'Fresh title')
+
+    def test_writer_never_reads_stale_progress(self):
+        response = self.client.put(f'/api/progress/by-module/{self.module.id}/', {'progress': 60}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(UserProgress.objects.using('replica').get(user=self.writer).progress, 10)
+
+        self.assertEqual(self.progress(self.client), [60.0])
+        self.assertEqual(self.client.get(f'/api/modules/{self.module.id}/').json()['progress'], 60.0)
+        self.assertEqual(self.client.get('/api/modules/').json()['results'][0]['title'], 'Fresh title')
+        # Users who didn't write still read the replica
+        self.assertEqual(self.progress(self.reader_client), [20.0])
+
+        # Once the pin expires the writer is back on the (still lagging) replica
+        routers.get_cache().clear()
+        self.assertEqual(self.progress(self.client), [10.0])
+
+    @override_settings(PROGRESS_WRITE_BEHIND={'ENABLED': True, 'FLUSH_INTERVAL': 0, 'MAX_PENDING': 100000})
+    def test_buffered_writes_pin_too(self):
+        progress_buffer.reset()
+        self.addCleanup(progress_buffer.reset)
+        response = self.client.put(f'/api/progress/by-module/{self.module.id}/', {'progress': 45}, format='json')
+        self.assertEqual(response.status_code, 202)
+        # The background flush, outside any request
+        progress_buffer.flush()
+        self.assertEqual(self.progress(self.client), [45.0])
+
+    @override_settings(REPLICA_DATABASES=[])
+    def test_unused_without_replicas(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            routers.ReplicaPinningMiddleware(HttpResponse)
+
+    @override_settings(DEBUG=True, REQUEST_PROFILING={'ENABLED': True})
+    def test_async_handler_runs_the_middleware_natively(self):
+        # In DEBUG, Django logs each middleware it has to wrap in sync_to_async
+        with self.assertNoLogs('django.request', 'DEBUG'):
+            ASGIHandler()
@@ -0,0 +1,315 @@
+import json
+import math
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import cache as module_cache
+from .models import ImportedRecord, Module, Page, QuizOption, User, UserProgress
+from .renderers import FastJSONRenderer, orjson
+
+# NDJSON export and import of module trees and learner progress. Exports
+# stream .iterator() querysets, so memory stays flat however many rows
+# there are. An export begins with a header line naming its source
+# environment. Modules come next, then pages, then options, and each record
+# carries its ids in the source.
+#
+# Imports read one line at a time and write in chunks, each chunk in its
+# own transaction. ImportedRecord maps every module, page and option
+# created to its source id. Parents are remapped through it one chunk at a
+# time, and a rerun of an interrupted import skips whatever was already
+# committed. Progress rows name the learner by email and are upserted only
+# over older rows, so replaying an export, or importing a stale one, never
+# rolls a learner back. Imported content gets fresh timestamps, since a copy
+# is new to its target.
+
+FORMAT_VERSION = 1
+CHUNK_SIZE = 2000
+# Bytes of rendered lines per streamed block
+BLOCK_SIZE = 64 * 1024
+
+# Record keys and the columns they are read from
+MODULE_FIELDS = {
+    'id': 'id', 'title': 'title', 'description': 'description', 'category': 'category',
+    'created_at': 'created_at', 'updated_at': 'updated_at',
+}
+PAGE_FIELDS = {
+    'id': 'id', 'module': 'module_id', 'type': 'type', 'content': 'content', 'rank': 'rank',
+    'created_at': 'created_at', 'updated_at': 'updated_at',
+}
+OPTION_FIELDS = {'id': 'id', 'page': 'page_id', 'text': 'text', 'is_correct': 'is_correct'}
+PROGRESS_FIELDS = {
+    'user': 'user__email', 'module': 'module_id', 'progress': 'progress',
+    'last_page_viewed': 'last_page_viewed_id', 'updated_at': 'updated_at', 'completed_at': 'completed_at',
+}
+REQUIRED = {
+    'module': {'id', 'title', 'description', 'category'},
+    'page': {'id', 'module', 'type', 'content', 'rank'},
+    'option': {'id', 'page', 'text', 'is_correct'},
+    'progress': {'user', 'module', 'progress', 'updated_at'},
+}
+
+
+def _integer(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _boolean(value):
+    return isinstance(value, bool)
+
+
+def _number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def _datetime(value):
+    try:
+        return isinstance(value, str) and parse_datetime(value) is not None
+    except ValueError:
+        return False
+
+
+def _text(model, field):
+    max_length = model._meta.get_field(field).max_length
+    return lambda value: isinstance(value, str) and (max_length is None or len(value) <= max_length)
+
+
+def _choice(model, field):
+    values = {value for value, _ in model._meta.get_field(field).choices}
+    return lambda value: isinstance(value, str) and value in values
+
+
+def _nullable(check):
+    return lambda value: value is None or check(value)
+
+
+# What each key must hold when present, checked as lines are read so a bad
+# record fails its chunk before any of it is written
+CHECKS = {
+    'module': {
+        'id': _integer, 'title': _text(Module, 'title'), 'description': _text(Module, 'description'),
+        'category': _choice(Module, 'category'),
+        'created_at': _nullable(_datetime), 'updated_at': _nullable(_datetime),
+    },
+    'page': {
+        'id': _integer, 'module': _integer, 'type': _choice(Page, 'type'), 'content': _text(Page, 'content'),
+        'rank': _number, 'created_at': _nullable(_datetime), 'updated_at': _nullable(_datetime),
+    },
+    'option': {'id': _integer, 'page': _integer, 'text': _text(QuizOption, 'text'), 'is_correct': _boolean},
+    'progress': {
+        'user': _text(User, 'email'), 'module': _integer, 'progress': _number,
+        'last_page_viewed': _nullable(_integer), 'updated_at': _datetime, 'completed_at': _nullable(_datetime),
+    },
+}
+
+_render = FastJSONRenderer().render
+_loads = orjson.loads if orjson is not None else json.loads
+
+
+def _stream(sections, chunk_size):
+    header = {
+        'model': 'header',
+        'version': FORMAT_VERSION,
+        'source': settings.TRANSFER_SOURCE,
+        'exported_at': timezone.now(),
+    }
+    block = [_render(header)]
+    size = 0
+    for model, queryset, fields in sections:
+        for row in queryset.values_list(*fields.values()).iterator(chunk_size=chunk_size):
+            record = {'model': model}
+            record.update(zip(fields, row))
+            line = _render(record)
+            block.append(line)
+            size += len(line) + 1
+            if size >= BLOCK_SIZE:
+                block.append(b'')
+                yield b'\n'.join(block)
+                block, size = [], 0
+    block.append(b'')
+    yield b'\n'.join(block)
+
+
+def export_modules(module_ids=None, chunk_size=CHUNK_SIZE):
+    """NDJSON for the modules (default: all) and their pages and options, as blocks of lines."""
+    modules = Module.objects.order_by('id')
+    pages = Page.objects.order_by('id')
+    options = QuizOption.objects.order_by('id')
+    if module_ids is not None:
+        modules = modules.filter(pk__in=module_ids)
+        pages = pages.filter(module_id__in=module_ids)
+        options = options.filter(page__module_id__in=module_ids)
+    return _stream([
+        ('module', modules, MODULE_FIELDS),
+        ('page', pages, PAGE_FIELDS),
+        ('option', options, OPTION_FIELDS),
+    ], chunk_size)
+
+
+def export_progress(module_ids=None, chunk_size=CHUNK_SIZE):
+    """NDJSON for the progress rows (default: of all modules), as blocks of lines."""
+    progress = UserProgress.objects.order_by('id')
+    if module_ids is not None:
+        progress = progress.filter(module_id__in=module_ids)
+    return _stream([('progress', progress, PROGRESS_FIELDS)], chunk_size)
+
+
+def import_records(lines, source=None, chunk_size=CHUNK_SIZE, counts=None):
+    """
+    Import NDJSON lines from export_modules() or export_progress(). Records
+    are remapped as coming from ``source``, by default the header's. Returns
+    ``counts``, updated as chunks commit; on a ValueError it holds what was
+    committed before the failing chunk, and rerunning the import resumes.
+    """
+    if counts is None:
+        counts = {}
+    for key in ('modules', 'pages', 'options', 'progress', 'existing', 'skipped'):
+        counts.setdefault(key, 0)
+    chunk = []
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = _loads(line)
+        except ValueError:
+            raise ValueError(f'Line {number}: not valid JSON')
+        model = record.get('model') if isinstance(record, dict) else None
+        if model == 'header':
+            if record.get('version') != FORMAT_VERSION:
+                raise ValueError(f"Line {number}: unsupported format version {record.get('version')!r}")
+            source = source or record.get('source')
+            continue
+        if model not in REQUIRED:
+            raise ValueError(f'Line {number}: unknown model {model!r}')
+        missing = REQUIRED[model] - record.keys()
+        if missing:
+            raise ValueError(f"Line {number}: missing {', '.join(sorted(missing))}")
+        invalid = [key for key, check in CHECKS[model].items() if key in record and not check(record[key])]
+        if invalid:
+            raise ValueError(f"Line {number}: invalid {', '.join(invalid)}")
+        if not source:
+            raise ValueError(f'Line {number}: no source given and no header line before it')
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            _import_chunk(chunk, source, counts)
+            chunk = []
+    if chunk:
+        _import_chunk(chunk, source, counts)
+    return counts
+
+
+def _build_module(record, parent_id):
+    return Module(title=record['title'], description=record['description'], category=record['category'])
+
+
+def _build_page(record, module_id):
+    return Page(module_id=module_id, type=record['type'], content=record['content'], rank=record['rank'])
+
+
+def _build_option(record, page_id):
+    return QuizOption(page_id=page_id, text=record['text'], is_correct=record['is_correct'])
+
+
+# Models in dependency order, with the key remapping each one's parent
+TREE_IMPORTS = (
+    ('module', 'modules', None, _build_module),
+    ('page', 'pages', 'module', _build_page),
+    ('option', 'options', 'page', _build_option),
+)
+
+
+def _import_chunk(records, source, counts):
+    by_model = {}
+    for record in records:
+        by_model.setdefault(record['model'], []).append(record)
+    # Counted apart until the chunk commits
+    chunk_counts = dict.fromkeys(counts, 0)
+    created = {}
+    with transaction.atomic():
+        for model, count_key, parent, build in TREE_IMPORTS:
+            if model in by_model:
+                created[model] = _import_objects(source, model, by_model[model], parent, build, chunk_counts)
+                chunk_counts[count_key] += len(created[model])
+        # Bulk inserts send no signals, so existing modules gaining pages or
+        # options are invalidated here
+        changed = {page.module_id for page in created.get('page', [])}
+        option_pages = {option.page_id for option in created.get('option', [])}
+        option_pages -= {page.pk for page in created.get('page', [])}
+        if option_pages:
+            changed.update(Page.objects.filter(pk__in=option_pages).values_list('module_id', flat=True))
+        if 'progress' in by_model:
+            chunk_counts['progress'] += _import_progress(source, by_model['progress'], chunk_counts)
+    for key, value in chunk_counts.items():
+        counts[key] += value
+    for module_id in changed:
+        module_cache.invalidate_module(module_id)
+    if 'module' in by_model:
+        module_cache.invalidate_module_count()
+
+
+def _mapped(source, model, source_ids):
+    return dict(ImportedRecord.objects.filter(
+        source=source, model=model, source_id__in=set(source_ids)
+    ).values_list('source_id', 'object_id'))
+
+
+def _import_objects(source, model, records, parent, build, counts):
+    """Create the records not yet imported from ``source``, remapping their ``parent`` key; returns them."""
+    imported = _mapped(source, model, (record['id'] for record in records))
+    pending = {record['id']: record for record in records if record['id'] not in imported}
+    counts['existing'] += len(records) - len(pending)
+    parents = _mapped(source, parent, (record[parent] for record in pending.values())) if parent else {}
+    objects, source_ids = [], []
+    for source_id, record in pending.items():
+        parent_id = parents.get(record[parent]) if parent else None
+        if parent and parent_id is None:
+            # Its parent wasn't part of any import from this source
+            counts['skipped'] += 1
+            continue
+        objects.append(build(record, parent_id))
+        source_ids.append(source_id)
+    if not objects:
+        return []
+    objects[0].__class__.objects.bulk_create(objects)
+    ImportedRecord.objects.bulk_create([
+        ImportedRecord(source=source, model=model, source_id=source_id, object_id=obj.pk)
+        for source_id, obj in zip(source_ids, objects)
+    ])
+    return objects
+
+
+def _import_progress(source, records, counts):
+    users = dict(User.objects.filter(email__in={record['user'] for record in records}).values_list('email', 'pk'))
+    module_ids = {record['module'] for record in records}
+    page_ids = {record['last_page_viewed'] for record in records if record.get('last_page_viewed') is not None}
+    if source == settings.TRANSFER_SOURCE:
+        # Our own export, e.g. a restore: ids are local, but may be gone
+        modules = {pk: pk for pk in Module.objects.filter(pk__in=module_ids).values_list('pk', flat=True)}
+        pages = {pk: pk for pk in Page.objects.filter(pk__in=page_ids).values_list('pk', flat=True)}
+    else:
+        modules = _mapped(source, 'module', module_ids)
+        pages = _mapped(source, 'page', page_ids)
+    rows = {}
+    for record in records:
+        user_id, module_id = users.get(record['user']), modules.get(record['module'])
+        if user_id is None or module_id is None:
+            counts['skipped'] += 1
+            continue
+        completed_at = record.get('completed_at')
+        # One row per (user, module) and statement, which PostgreSQL's ON CONFLICT requires
+        rows[user_id, module_id] = (
+            user_id,
+            module_id,
+            record['progress'],
+            pages.get(record.get('last_page_viewed')),
+            parse_datetime(record['updated_at']),
+            parse_datetime(completed_at) if completed_at else None,
+        )
+    if not rows:
+        return 0
+    imported = UserProgress.objects.import_rows(list(rows.values()))
+    # The rest were no newer than the rows already there
+    counts['existing'] += len(rows) - imported
+    return imported
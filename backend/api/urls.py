@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenRefreshView
@@ -8,6 +9,10 @@ from .views import (
     UserProgressViewSet,
     CustomTokenObtainPairView,
     complete_module,
+    metrics,
+    export_modules,
+    export_progress,
+    import_ndjson,
 )
 
 router = DefaultRouter()
@@ -48,6 +53,17 @@ urlpatterns = [
         'post': 'pages'
     }), name='module-pages-alt'),
     
+    # Prometheus text exposition of the profiling middleware's metrics
+    path('metrics/', metrics, name='metrics'),
+
+    # NDJSON export and import for admins (see api.transfer)
+    path('export/modules/', export_modules, name='export_modules'),
+    path('export/progress/', export_progress, name='export_progress'),
+    path('import/', import_ndjson, name='import_ndjson'),
+
     # Complete module endpoint
     path('modules/<int:module_id>/complete/', complete_module, name='complete_module'),
 ]
+
+if settings.ASYNC_READ_VIEWS:
+    urlpatterns.insert(0, path('', include('api.async_urls')))
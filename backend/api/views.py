@@ -1,47 +1,62 @@
-from rest_framework import viewsets, status, permissions
+from rest_framework import viewsets, status, permissions, filters
 from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import PermissionDenied
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework.utils.urls import replace_query_param
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from django.contrib.auth import get_user_model
-from django.core.mail import send_mail
-from django.conf import settings
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from . import cache as module_cache
+from . import profiling
+from . import quizzes
+from . import representations
+from . import search as module_search
+from . import stats as module_stats
+from . import tasks
+from . import transfer
+from .authentication import load_full_user
+from .conditional import conditional_response, is_conditional, make_etag
+from .progress_buffer import merged_progress, progress_buffer, is_enabled as write_behind_enabled
 from .models import Module, Page, UserProgress
 from .serializers import (
     UserSerializer,
     ModuleSerializer,
+    ModuleSummarySerializer,
     PageSerializer,
     UserProgressSerializer,
+    ProgressUpsertSerializer,
+    PageBulkWriteSerializer,
+    PageReorderSerializer,
+    SavedModulesSerializer,
+    QuizSubmissionSerializer,
     CustomTokenObtainPairSerializer,
 )
-from django.db.models import F
+from django.db import transaction
+from django.db.models import Count, F, FilteredRelation, Max, OuterRef, Prefetch, Q, Subquery
+from django.db.models.functions import Coalesce, Substr
+from .pagination import ModuleCursorPagination
 
 User = get_user_model()
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
 
-    def post(self, request, *args, **kwargs):
-        email = request.data.get('email')
-        password = request.data.get('password')
-        
-        if email:
-            # Convert email to username for authentication
-            try:
-                user = User.objects.get(email=email)
-                request.data['email'] = user.email
-            except User.DoesNotExist:
-                pass
-                
-        return super().post(request, *args, **kwargs)
-
 class IsAdminOrReadOnly(permissions.BasePermission):
     def has_permission(self, request, view):
         if request.method in permissions.SAFE_METHODS:
             return True
         return request.user and (request.user.is_admin or request.user.is_superuser)
 
+class IsAdmin(permissions.BasePermission):
+    def has_permission(self, request, view):
+        return request.user and (request.user.is_admin or request.user.is_superuser)
+
+def sees_answers(user):
+    # Quiz answer keys are for the authors editing them
+    return user.is_authenticated and (user.is_admin or user.is_superuser)
+
 class UserViewSet(viewsets.ModelViewSet):
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
@@ -59,11 +74,11 @@ class UserViewSet(viewsets.ModelViewSet):
         pk = self.kwargs.get('pk')
         if pk and str(pk) != str(self.request.user.id):
             raise PermissionDenied("You don't have permission to modify this user.")
-        return self.request.user
+        return load_full_user(self.request.user)
     
     @action(detail=False, methods=['get'])
     def me(self, request):
-        serializer = self.get_serializer(request.user)
+        serializer = self.get_serializer(self.get_object())
         return Response(serializer.data)
     
     def update(self, request, *args, **kwargs):
@@ -109,7 +124,7 @@ class UserViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
             user = serializer.save()
-            refresh = RefreshToken.for_user(user)
+            refresh = CustomTokenObtainPairSerializer.get_token(user)
             return Response({
                 'user': serializer.data,
                 'access': str(refresh.access_token),
@@ -128,19 +143,8 @@ class UserViewSet(viewsets.ModelViewSet):
         
         try:
             user = User.objects.get(email=email)
-            # Generate password reset token
-            refresh = RefreshToken.for_user(user)
-            reset_token = str(refresh.access_token)
-            
-            # Send email
-            reset_url = f"{settings.FRONTEND_URL}/reset-password?token={reset_token}"
-            send_mail(
-                'Password Reset Request',
-                f'Click here to reset your password: {reset_url}',
-                settings.DEFAULT_FROM_EMAIL,
-                [email],
-                fail_silently=False,
-            )
+            # Sent by a task worker, with retries, so SMTP latency stays out of the request
+            tasks.send_password_reset.enqueue(user.pk)
             
             return Response({
                 'message': 'Password reset email sent'
@@ -156,133 +160,346 @@ class UserViewSet(viewsets.ModelViewSet):
         user.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
-class ModuleViewSet(viewsets.ModelViewSet):
+def parse_module_id(pk):
+    try:
+        return int(pk)
+    except (TypeError, ValueError):
+        raise Http404
+
+def parse_int(value, default=0):
+    try:
+        return max(int(value), 0)
+    except (TypeError, ValueError):
+        return default
+
+def select_fields(request, data, paginated=False):
+    """Apply the request's ?fields= sparse fieldset to a response body, or to its results when ``paginated``."""
+    fieldset = representations.parse_fieldset(request.GET.get('fields'))
+    if fieldset is None:
+        return data
+    if paginated:
+        return {**data, 'results': representations.sparse(data['results'], fieldset)}
+    return representations.sparse(data, fieldset)
+
+class SparseFieldsMixin:
+    """Lets clients trim GET responses with ?fields=, e.g. to drop page content when they only need structure."""
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if request.method == 'GET' and response.status_code == 200 and isinstance(response, Response):
+            data = response.data
+            paginated = self.paginator is not None and isinstance(data, dict) and 'results' in data
+            response.data = select_fields(request, data, paginated)
+        return super().finalize_response(request, response, *args, **kwargs)
+
+def get_cached_module_tree(module_id, answers=False):
+    def build():
+        # Built without a request so the cached tree holds no per-user data
+        tree = representations.module_tree(module_id, answers)
+        if tree is None:
+            raise Http404
+        return tree
+
+    return module_cache.get_module_tree(module_id, build, answers)
+
+def module_progress_query(user, module_id):
+    # The module row, so a missing module is a 404 before any validator is
+    # compared, with the user's progress joined in the same query
+    return Module.objects.filter(pk=module_id).annotate(
+        own_progress=FilteredRelation('userprogress', condition=Q(userprogress__user=user))
+    ).values('own_progress__progress', 'own_progress__updated_at')
+
+def module_progress(row):
+    if row is None:
+        raise Http404
+    if row['own_progress__updated_at'] is None:
+        return None
+    return {'progress': row['own_progress__progress'], 'updated_at': row['own_progress__updated_at']}
+
+def module_detail_validators(request, module_id, version, modified, progress):
+    """The user's progress for a module detail response, with its ETag and Last-Modified."""
+    pending = progress_buffer.pending_for(request.user.pk).get(module_id)
+    if pending:
+        # A buffered write is newer than the stored row
+        progress = {
+            'progress': merged_progress(pending, progress['progress'] if progress else None),
+            'updated_at': pending['updated_at'],
+        }
+
+    last_modified = modified
+    if progress:
+        last_modified = max(modified, progress['updated_at'].timestamp())
+        etag = make_etag('module', module_id, version, request.user.pk,
+                         progress['progress'], progress['updated_at'].isoformat())
+    else:
+        etag = make_etag('module', module_id, version, request.user.pk)
+    return progress, etag, last_modified
+
+def progress_list_validators(request, state):
+    # Any insert, update or delete moves one of these aggregates
+    last_updated = state['last_updated']
+    etag = make_etag('progress', request.user.pk, state['count'], state['last_id'],
+                     last_updated.isoformat() if last_updated else None)
+    return etag, last_updated.timestamp() if last_updated else None
+
+def module_pages_response(request, module_id):
+    # Unconditional requests 404 when the tree is built
+    if is_conditional(request) and not Module.objects.filter(pk=module_id).exists():
+        raise Http404
+    version, modified = module_cache.get_module_validators(module_id)
+    answers = sees_answers(request.user)
+    return conditional_response(
+        request,
+        make_etag('pages', module_id, version, *(['answers'] if answers else [])),
+        modified,
+        lambda: Response(get_cached_module_tree(module_id, answers)['pages'])
+    )
+
+class ModuleViewSet(SparseFieldsMixin, viewsets.ModelViewSet):
     queryset = Module.objects.all()
     serializer_class = ModuleSerializer
     permission_classes = [IsAuthenticated, IsAdminOrReadOnly]
+    pagination_class = ModuleCursorPagination
+    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    search_fields = ['title']
+    ordering_fields = ['created_at', 'updated_at']
+    ordering = '-created_at'
+    description_excerpt_length = 200
+    max_search_results = 50
+
+    def get_serializer_class(self):
+        if self.action in ['list', 'search', 'saved']:
+            return ModuleSummarySerializer
+        return super().get_serializer_class()
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['answers'] = sees_answers(self.request.user)
+        if self.request.user.is_authenticated:
+            context['pending_progress'] = progress_buffer.pending_for(self.request.user.pk)
+        return context
 
     def get_queryset(self):
         queryset = super().get_queryset()
-        if not self.request.user.is_admin and not self.request.user.is_superuser:
-            # Add progress information for regular users
-            for module in queryset:
-                try:
-                    progress = UserProgress.objects.get(
+        category = self.request.query_params.get('category')
+        if category and self.action in ['list', 'saved']:
+            queryset = queryset.filter(category=category)
+        if self.request.user.is_authenticated:
+            # Resolve the user's progress in the same SELECT instead of once per module
+            queryset = queryset.annotate(
+                user_progress=Subquery(
+                    UserProgress.objects.filter(
                         user=self.request.user,
-                        module=module
-                    )
-                    module.progress = progress.progress
-                except UserProgress.DoesNotExist:
-                    module.progress = 0.0
+                        module=OuterRef('pk')
+                    ).values('progress')[:1]
+                )
+            )
+        if self.action in ['list', 'search', 'saved']:
+            # The catalog grid only needs counts and a short excerpt, never page bodies
+            # A correlated count instead of JOIN + GROUP BY lets the database walk
+            # the created_at/updated_at index and stop at the page size
+            page_count = Page.objects.filter(module=OuterRef('pk')).order_by().values('module').annotate(
+                count=Count('id')
+            ).values('count')
+            queryset = queryset.defer('description').annotate(
+                description_excerpt=Substr('description', 1, self.description_excerpt_length),
+                page_count=Coalesce(Subquery(page_count), 0),
+            )
+        elif self.action == 'retrieve':
+            # Pages and their quiz options are serialized for every module
+            queryset = queryset.prefetch_related(
+                Prefetch('pages', queryset=Page.objects.with_position().prefetch_related('quiz_options'))
+            )
         return queryset
 
+    def retrieve(self, request, *args, **kwargs):
+        module_id = parse_module_id(kwargs['pk'])
+        progress = module_progress(module_progress_query(request.user, module_id).first())
+        version, modified = module_cache.get_module_validators(module_id)
+        progress, etag, last_modified = module_detail_validators(
+            request, module_id, version, modified, progress
+        )
+
+        def build_response():
+            data = dict(get_cached_module_tree(module_id, sees_answers(request.user)))
+            data['progress'] = progress['progress'] if progress else 0
+            return Response(data)
+
+        return conditional_response(request, etag, last_modified, build_response)
+
     @action(detail=True, methods=['get', 'post'])
     def pages(self, request, pk=None):
-        module = self.get_object()
         if request.method == 'GET':
-            pages = module.pages.all().order_by('order')
-            serializer = PageSerializer(pages, many=True)
-            return Response(serializer.data)
+            return module_pages_response(request, parse_module_id(pk))
         elif request.method == 'POST':
-            serializer = PageSerializer(data=request.data)
+            module = self.get_object()
+            serializer = PageSerializer(data=request.data, context=self.get_serializer_context())
             if serializer.is_valid():
                 serializer.save(module=module)
                 return Response(serializer.data, status=status.HTTP_201_CREATED)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-    @action(detail=True, methods=['post'])
-    def save(self, request, pk=None):
+    @action(detail=True, methods=['put'], url_path='pages/bulk')
+    def bulk_pages(self, request, pk=None):
+        module = self.get_object()
+        serializer = PageBulkWriteSerializer(module, data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        # Bulk writes don't send signals
+        module_cache.invalidate_module(module.id)
+        tasks.enqueue_on_commit(tasks.warm_module_trees, [module.id])
+        return Response(get_cached_module_tree(module.id, answers=True)['pages'])
+
+    @action(detail=True, methods=['post'], url_path='pages/reorder')
+    def reorder_pages(self, request, pk=None):
         module = self.get_object()
-        request.user.saved_modules.add(module)
+        serializer = PageReorderSerializer(module, data=request.data, context={'module': module})
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        module_cache.invalidate_module(module.id)
+        tasks.enqueue_on_commit(tasks.warm_module_trees, [module.id])
+        return Response(get_cached_module_tree(module.id, answers=True)['pages'])
+
+    @action(detail=True, methods=['post'], url_path='quiz', permission_classes=[IsAuthenticated])
+    def submit_quiz(self, request, pk=None):
+        module_id = parse_module_id(pk)
+        answer_key = quizzes.get_answer_key(module_id)
+        serializer = QuizSubmissionSerializer(data=request.data, context={'answer_key': answer_key})
+        serializer.is_valid(raise_exception=True)
+        results = quizzes.grade(answer_key, serializer.validated_data['answers'])
+        quizzes.record_attempts(request.user.pk, module_id, results)
+        return Response({
+            'score': sum(result['correct'] for result in results),
+            'total': len(results),
+            'results': [{'page': result['page'], 'correct': result['correct']} for result in results],
+        })
+
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
+    def save(self, request, pk=None):
+        if not request.user.add_saved_modules([parse_module_id(pk)]):
+            raise Http404
         return Response({'status': 'module saved'})
 
-    @action(detail=True, methods=['post'])
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def unsave(self, request, pk=None):
-        module = self.get_object()
-        request.user.saved_modules.remove(module)
+        module_id = parse_module_id(pk)
+        if not request.user.remove_saved_modules([module_id]) and not Module.objects.filter(pk=module_id).exists():
+            raise Http404
         return Response({'status': 'module unsaved'})
 
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated, IsAdmin])
+    def stats(self, request):
+        return Response(module_stats.module_stats(category=request.query_params.get('category')))
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated, IsAdmin])
+    def cache_stats(self, request):
+        return Response(module_cache.get_stats())
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        query = request.query_params.get('q', '')
+        if not module_search.search_terms(query):
+            return Response({'error': 'q is required'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = min(parse_int(request.query_params.get('limit')) or 20, self.max_search_results)
+        offset = parse_int(request.query_params.get('offset'))
+
+        hits = module_search.search_modules(
+            query, category=request.query_params.get('category'), limit=limit + 1, offset=offset
+        )
+        # One row past the page tells whether there is a next one
+        has_next = len(hits) > limit
+        modules = self.get_queryset().in_bulk([hit['id'] for hit in hits[:limit]])
+        hits = [hit for hit in hits[:limit] if hit['id'] in modules]
+        serializer = self.get_serializer([modules[hit['id']] for hit in hits], many=True)
+        return Response({
+            'next': replace_query_param(request.build_absolute_uri(), 'offset', offset + limit) if has_next else None,
+            'results': [
+                {**data, 'score': hit['score'], 'snippet': hit['snippet']}
+                for hit, data in zip(hits, serializer.data)
+            ],
+        })
+
     @action(detail=False, methods=['get'])
     def saved(self, request):
-        saved_modules = request.user.saved_modules.all()
-        serializer = self.get_serializer(saved_modules, many=True)
-        return Response(serializer.data)
+        queryset = self.filter_queryset(self.get_queryset().filter(saved_by_users=request.user))
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'], url_path='saved/ids')
+    def saved_ids(self, request):
+        # Enough for the catalog's bookmark icons, without loading any module
+        return Response({'ids': request.user.saved_module_ids()})
 
-class PageViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['post'], url_path='saved/batch', permission_classes=[IsAuthenticated])
+    def saved_batch(self, request):
+        serializer = SavedModulesSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            removed = request.user.remove_saved_modules(serializer.validated_data.get('remove', []))
+            added = request.user.add_saved_modules(serializer.validated_data.get('add', []))
+        return Response({'added': sorted(added), 'removed': removed})
+
+class PageViewSet(SparseFieldsMixin, viewsets.ModelViewSet):
     serializer_class = PageSerializer
     permission_classes = [IsAuthenticated, IsAdminOrReadOnly]
 
     def get_queryset(self):
         module_id = self.kwargs.get('module_pk')
         if module_id is not None:
-            return Page.objects.filter(module_id=module_id).order_by('order')
+            return Page.objects.filter(module_id=module_id).prefetch_related('quiz_options')
         return Page.objects.none()
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['answers'] = sees_answers(self.request.user)
+        return context
+
+    def list(self, request, *args, **kwargs):
+        return module_pages_response(request, parse_module_id(self.kwargs.get('module_pk')))
+
     def perform_create(self, serializer):
         module_id = self.kwargs.get('module_pk')
         module = Module.objects.get(id=module_id)
-        
-        # Get the highest order value
-        last_page = Page.objects.filter(module=module).order_by('-order').first()
-        next_order = (last_page.order + 1) if last_page else 0
-        
-        serializer.save(module=module, order=next_order)
-
-    def perform_update(self, serializer):
-        instance = self.get_object()
-        old_order = instance.order
-        new_order = self.request.data.get('order')
-
-        if new_order is not None and old_order != new_order:
-            # Convert to integers for comparison
-            old_order = int(old_order)
-            new_order = int(new_order)
-            
-            # Get all pages for the module
-            pages = Page.objects.filter(module=instance.module)
-            
-            # Moving down: update pages between old and new position
-            if new_order > old_order:
-                pages.filter(
-                    order__gt=old_order,
-                    order__lte=new_order
-                ).update(order=F('order') - 1)
-            # Moving up: update pages between new and old position
-            else:
-                pages.filter(
-                    order__gte=new_order,
-                    order__lt=old_order
-                ).update(order=F('order') + 1)
-            
-            # Update the moved page's order
-            instance.order = new_order
-            instance.save(update_fields=['order'])
-        
-        serializer.save()
+        serializer.save(module=module)
 
-    def perform_destroy(self, instance):
-        # Get the order of the page being deleted
-        deleted_order = instance.order
-        
-        # Update the order of remaining pages
-        Page.objects.filter(
-            module=instance.module,
-            order__gt=deleted_order
-        ).update(order=F('order') - 1)
-        
-        instance.delete()
-
-class UserProgressViewSet(viewsets.ModelViewSet):
+class UserProgressViewSet(SparseFieldsMixin, viewsets.ModelViewSet):
     serializer_class = UserProgressSerializer
     queryset = UserProgress.objects.all()
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
+        if progress_buffer.has_pending(self.request.user.pk):
+            # Reads of the user's own rows must include buffered writes
+            progress_buffer.flush(user_id=self.request.user.pk)
         return UserProgress.objects.filter(user=self.request.user)
 
+    progress_state = {
+        'count': Count('id'),
+        'last_id': Max('id'),
+        'last_updated': Max('updated_at'),
+    }
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        state = queryset.aggregate(**self.progress_state)
+        etag, last_modified = progress_list_validators(request, state)
+
+        def build_response():
+            return Response(representations.progress_list(queryset))
+
+        return conditional_response(request, etag, last_modified, build_response)
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            if instance.completed_at is not None:
+                User.objects.filter(pk=instance.user_id).update(
+                    completed_modules_count=F('completed_modules_count') - 1
+                )
+
     def create(self, request, *args, **kwargs):
         data = request.data.copy()
         data['user'] = request.user.id
@@ -319,6 +536,55 @@ class UserProgressViewSet(viewsets.ModelViewSet):
         
         return Response(serializer.data)
 
+    @action(detail=False, methods=['put'], url_path=r'by-module/(?P<module_id>\d+)')
+    def by_module(self, request, module_id=None):
+        serializer = ProgressUpsertSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        completing = serializer.validated_data['progress'] >= UserProgress.COMPLETE
+        if write_behind_enabled() and not completing:
+            return self.buffer_progress(request, int(module_id), serializer.validated_data)
+        if completing and progress_buffer.has_pending(request.user.pk):
+            # Completions are written through, and a buffered write flushed later must not overwrite one
+            progress_buffer.flush(user_id=request.user.pk)
+        progress = UserProgress.objects.upsert(
+            user_id=request.user.id,
+            module_id=int(module_id),
+            progress=serializer.validated_data['progress'],
+            last_page_viewed_id=serializer.validated_data.get('last_page_viewed'),
+            monotonic=serializer.validated_data['monotonic'],
+        )
+        if progress is None:
+            return Response({'error': 'Module or page not found'},
+                          status=status.HTTP_404_NOT_FOUND)
+        return Response(UserProgressSerializer(progress).data)
+
+    def buffer_progress(self, request, module_id, data):
+        # Validate against the cached module tree so buffering stays query-free
+        tree = get_cached_module_tree(module_id)
+        last_page_viewed = data.get('last_page_viewed')
+        if last_page_viewed is not None and last_page_viewed not in {p['id'] for p in tree['pages']}:
+            return Response({'error': 'Module or page not found'},
+                          status=status.HTTP_404_NOT_FOUND)
+        entry = progress_buffer.record(
+            request.user.pk,
+            module_id,
+            data['progress'],
+            last_page_viewed_id=last_page_viewed,
+            monotonic=data['monotonic'],
+        )
+        return Response({
+            'id': None,
+            'user': request.user.pk,
+            'module': module_id,
+            'progress': entry['progress'],
+            'last_page_viewed': entry['last_page_viewed_id'],
+            'updated_at': timezone.localtime(entry['updated_at']).isoformat(),
+        }, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated, IsAdmin])
+    def buffer_stats(self, request):
+        return Response(progress_buffer.stats())
+
     @action(detail=True, methods=['post'])
     def update_progress(self, request, pk=None):
         progress = self.get_object()
@@ -333,34 +599,61 @@ class UserProgressViewSet(viewsets.ModelViewSet):
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def complete_module(request, module_id):
-    try:
-        module = Module.objects.get(id=module_id)
-        profile = request.user.profile
-        
-        # Check if module is already completed
-        if module not in profile.completed_modules.all():
-            # Add to completed modules
-            profile.completed_modules.add(module)
-            
-            # Calculate new progress
-            total_modules = Module.objects.count()
-            completed_count = profile.completed_modules.count()
-            profile.progression = (completed_count / total_modules) * 100 if total_modules > 0 else 0
-            profile.save()
-            
-            return Response({
-                'message': 'Module completed successfully',
-                'progression': profile.progression,
-                'completed_modules': list(profile.completed_modules.values_list('id', flat=True))
-            }, status=status.HTTP_200_OK)
-        
-        return Response({
-            'message': 'Module already completed',
-            'progression': profile.progression,
-            'completed_modules': list(profile.completed_modules.values_list('id', flat=True))
-        }, status=status.HTTP_200_OK)
-        
-    except Module.DoesNotExist:
+    if progress_buffer.has_pending(request.user.pk):
+        # A buffered write flushed later must not overwrite the completion
+        progress_buffer.flush(user_id=request.user.pk)
+    result = UserProgress.objects.complete(request.user.pk, module_id)
+    if result is None:
         return Response({'error': 'Module not found'}, status=status.HTTP_404_NOT_FOUND)
-    except Exception as e:
-        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    progress, newly_completed = result
+
+    completed_count = User.objects.filter(pk=request.user.pk).values_list('completed_modules_count', flat=True).get()
+    total_modules = module_cache.get_module_count(Module.objects.count)
+    return Response({
+        'message': 'Module completed successfully' if newly_completed else 'Module already completed',
+        'completed_at': progress.completed_at,
+        'completed_modules_count': completed_count,
+        'progression': min(completed_count / total_modules * 100, 100) if total_modules else 0,
+    }, status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsAdmin])
+def metrics(request):
+    sink_path = 'api.profiling.PrometheusSink'
+    if sink_path not in profiling.get_config()['SINKS']:
+        raise Http404
+    return HttpResponse(
+        profiling.get_sink(sink_path).render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+def ndjson_export(request, export, filename):
+    try:
+        module_ids = [int(pk) for pk in request.query_params.getlist('module')] or None
+    except ValueError:
+        return Response({'error': 'module must be an id'}, status=status.HTTP_400_BAD_REQUEST)
+    response = StreamingHttpResponse(export(module_ids), content_type='application/x-ndjson')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsAdmin])
+def export_modules(request):
+    return ndjson_export(request, transfer.export_modules, 'modules.ndjson')
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsAdmin])
+def export_progress(request):
+    return ndjson_export(request, transfer.export_progress, 'progress.ndjson')
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated, IsAdmin])
+def import_ndjson(request):
+    # Read a line at a time from the request body; request.data would load it whole
+    counts = {}
+    try:
+        transfer.import_records(request.stream or [], source=request.query_params.get('source'), counts=counts)
+    except ValueError as exc:
+        # Chunks before the error are committed; posting the file again resumes
+        return Response({'error': str(exc), 'imported': counts}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'imported': counts})
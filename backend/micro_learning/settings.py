@@ -10,9 +10,13 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
+import socket
 from pathlib import Path
 from datetime import timedelta
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -45,6 +49,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.profiling.ProfilingMiddleware',
+    # Below profiling, so request timings include compression
+    'api.compression.CompressionMiddleware',
+    'api.routers.ReplicaPinningMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -79,13 +87,146 @@ WSGI_APPLICATION = 'micro_learning.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# DATABASE_PROFILE picks one of:
+#   sqlite      the development defaults
+#   sqlite-wal  SQLite tuned for concurrent writers: WAL journaling, a busy
+#               timeout and persistent connections (PRAGMAS are applied by
+#               api.signals.configure_sqlite on connect)
+#   postgres    PostgreSQL with persistent, health-checked connections; set
+#               DATABASE_PGBOUNCER=true behind PgBouncer in transaction mode
+# Compare them with `manage.py benchmark_writes`.
+DATABASE_PROFILE = os.environ.get('DATABASE_PROFILE', 'sqlite')
+DATABASE_CONN_MAX_AGE = int(os.environ.get('DATABASE_CONN_MAX_AGE', 600))
+SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000))  # ms
+
+_DATABASE_PROFILES = {
+    'sqlite': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('DATABASE_NAME', BASE_DIR / 'db.sqlite3'),
+    },
+    'sqlite-wal': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('DATABASE_NAME', BASE_DIR / 'db.sqlite3'),
+        'CONN_MAX_AGE': DATABASE_CONN_MAX_AGE,
+        'OPTIONS': {'timeout': SQLITE_BUSY_TIMEOUT / 1000},
+        'PRAGMAS': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'busy_timeout': SQLITE_BUSY_TIMEOUT,
+            'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+        },
+    },
+    'postgres': {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('DATABASE_NAME', 'micro_learning'),
+        'USER': os.environ.get('DATABASE_USER', 'micro_learning'),
+        'PASSWORD': os.environ.get('DATABASE_PASSWORD', ''),
+        'HOST': os.environ.get('DATABASE_HOST', 'localhost'),
+        'PORT': os.environ.get('DATABASE_PORT', '5432'),
+        'CONN_MAX_AGE': DATABASE_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        # Transaction pooling hands each transaction a different server connection
+        'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('DATABASE_PGBOUNCER', 'false').lower() == 'true',
+        'OPTIONS': {'connect_timeout': int(os.environ.get('DATABASE_CONNECT_TIMEOUT', 5))},
+    },
+}
+
 DATABASES = {
+    'default': _DATABASE_PROFILES[DATABASE_PROFILE],
+}
+
+# Read replicas for catalog and progress reads (see api.routers): a comma-
+# separated DATABASE_REPLICAS of SQLite files for the sqlite profiles (kept
+# current with `manage.py sync_replicas`) or of PostgreSQL standby hosts.
+# Tests treat them as mirrors of default.
+REPLICA_DATABASES = []
+for _number, _replica in enumerate(filter(None, os.environ.get('DATABASE_REPLICAS', '').split(',')), 1):
+    DATABASES[f'replica{_number}'] = {
+        **DATABASES['default'],
+        'HOST' if DATABASE_PROFILE == 'postgres' else 'NAME': _replica.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append(f'replica{_number}')
+
+DATABASE_ROUTERS = ['api.routers.ReplicaRouter']
+# Seconds a user's reads stay on the primary after a write. Keep it above the
+# replicas' lag plus PROGRESS_FLUSH_INTERVAL, and the pins in a cache shared
+# by all workers.
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 10))
+REPLICA_PIN_CACHE_ALIAS = 'default'
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'micro-learning'),
     }
 }
 
+# Serialized module trees (pages and quiz options), keyed by module content version
+MODULE_CACHE_ALIAS = 'default'
+MODULE_CACHE_TIMEOUT = int(os.environ.get('MODULE_CACHE_TIMEOUT', 3600))
+
+# Opt-in write-behind buffering for progress updates (see api.progress_buffer)
+PROGRESS_WRITE_BEHIND = {
+    'ENABLED': os.environ.get('PROGRESS_WRITE_BEHIND', 'false').lower() == 'true',
+    'FLUSH_INTERVAL': float(os.environ.get('PROGRESS_FLUSH_INTERVAL', 1.0)),
+    'MAX_PENDING': int(os.environ.get('PROGRESS_MAX_PENDING', 5000)),
+}
+
+# Background jobs (see api.tasks). With TASK_WORKERS=0 run `manage.py run_tasks`
+# next to the web server; otherwise each web process runs that many worker threads.
+TASK_QUEUE = {
+    'WORKERS': int(os.environ.get('TASK_WORKERS', 0)),
+    'MAX_ATTEMPTS': int(os.environ.get('TASK_MAX_ATTEMPTS', 5)),
+    'RETRY_BACKOFF': float(os.environ.get('TASK_RETRY_BACKOFF', 10.0)),
+}
+
+# Outgoing mail; the console and file backends stand in for SMTP in development
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+EMAIL_FILE_PATH = os.environ.get('EMAIL_FILE_PATH', BASE_DIR / 'sent_emails')
+EMAIL_HOST = os.environ.get('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.environ.get('EMAIL_PORT', 25))
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'noreply@micro-learning.local')
+FRONTEND_URL = os.environ.get('FRONTEND_URL', 'http://localhost:5173')
+
+# Serve the read endpoints with the native async views in api.async_views;
+# only worth it under ASGI, where sync views each hold a thread
+ASYNC_READ_VIEWS = os.environ.get('ASYNC_READ_VIEWS', 'false').lower() == 'true'
+
+# Names this environment in NDJSON exports; imports remember what they created
+# per source, so it should stay the same across exports (see api.transfer)
+TRANSFER_SOURCE = os.environ.get('TRANSFER_SOURCE', socket.gethostname())
+
+# Negotiated zstd/br/gzip response compression (see api.compression); br and
+# zstd need the brotli and zstandard packages
+RESPONSE_COMPRESSION = {
+    'ENABLED': os.environ.get('RESPONSE_COMPRESSION', 'true').lower() == 'true',
+    'MIN_LENGTH': int(os.environ.get('COMPRESSION_MIN_LENGTH', 1024)),
+}
+
+# Opt-in per-request query and latency profiling (see api.profiling)
+REQUEST_PROFILING = {
+    'ENABLED': os.environ.get('REQUEST_PROFILING', 'false').lower() == 'true',
+    'SERVER_TIMING': True,
+    'N_PLUS_ONE_THRESHOLD': int(os.environ.get('N_PLUS_ONE_THRESHOLD', 10)),
+    'SINKS': os.environ.get('PROFILING_SINKS', 'api.profiling.LogSink').split(','),
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'api': {'handlers': ['console'], 'level': os.environ.get('API_LOG_LEVEL', 'INFO')},
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -107,6 +248,40 @@ AUTH_PASSWORD_VALIDATORS = [
 
 AUTH_USER_MODEL = 'api.User'
 
+# Password hashing: PASSWORD_HASHER picks the algorithm new hashes use
+# (pbkdf2, scrypt, or argon2/bcrypt with argon2-cffi/bcrypt installed). The
+# others stay listed so existing hashes verify and are upgraded on login.
+# Size the cost with `manage.py benchmark_login`.
+_PASSWORD_HASHERS = {
+    'pbkdf2': 'api.hashers.PBKDF2PasswordHasher',
+    'scrypt': 'api.hashers.ScryptPasswordHasher',
+    'argon2': 'api.hashers.Argon2PasswordHasher',
+    'bcrypt': 'api.hashers.BCryptSHA256PasswordHasher',
+}
+PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER', 'pbkdf2')
+if PASSWORD_HASHER not in _PASSWORD_HASHERS:
+    raise ImproperlyConfigured(
+        f"PASSWORD_HASHER must be one of {', '.join(_PASSWORD_HASHERS)}, not {PASSWORD_HASHER!r}"
+    )
+PASSWORD_HASHERS = [_PASSWORD_HASHERS[PASSWORD_HASHER]] + [
+    path for name, path in _PASSWORD_HASHERS.items() if name != PASSWORD_HASHER
+] + [
+    # The rest of Django's defaults, to verify (and upgrade) hashes they made
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+PASSWORD_HASH_COST = {
+    key: int(os.environ[key])
+    for key in (
+        'PBKDF2_ITERATIONS',
+        'SCRYPT_WORK_FACTOR',
+        'ARGON2_TIME_COST',
+        'ARGON2_MEMORY_COST',
+        'ARGON2_PARALLELISM',
+        'BCRYPT_ROUNDS',
+    )
+    if key in os.environ
+}
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.0/topics/i18n/
 
@@ -126,7 +301,12 @@ STATIC_URL = 'static/'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.ClaimsJWTAuthentication',
+    ),
+    # Encodes with orjson when it is installed, otherwise as JSONRenderer does
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -180,6 +360,12 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
 }
 
+# Build request.user from token claims instead of a per-request SELECT.
+# Token revocations live in AUTH_CACHE_ALIAS, which must be shared between
+# workers for them to apply everywhere.
+JWT_CLAIMS_USER = os.environ.get('JWT_CLAIMS_USER', 'false').lower() == 'true'
+AUTH_CACHE_ALIAS = 'default'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
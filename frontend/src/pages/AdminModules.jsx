@@ -26,6 +26,7 @@ import api from '../services/api'
 
 export default function AdminModules() {
   const [modules, setModules] = useState([])
+  const [nextPage, setNextPage] = useState(null)
   const [loading, setLoading] = useState(true)
   const [selectedModule, setSelectedModule] = useState(null)
   const { isOpen, onOpen, onClose } = useDisclosure()
@@ -40,7 +41,8 @@ export default function AdminModules() {
   const fetchModules = async () => {
     try {
       const response = await api.getModules()
-      setModules(response.data)
+      setModules(response.data.results)
+      setNextPage(response.data.next)
     } catch (error) {
       toast({
         title: 'Error fetching modules',
@@ -54,6 +56,22 @@ export default function AdminModules() {
     }
   }
 
+  const loadMore = async () => {
+    try {
+      const response = await api.getNextPage(nextPage)
+      setModules([...modules, ...response.data.results])
+      setNextPage(response.data.next)
+    } catch (error) {
+      toast({
+        title: 'Error fetching modules',
+        description: 'Failed to load modules',
+        status: 'error',
+        duration: 5000,
+        isClosable: true,
+      })
+    }
+  }
+
   const handleEdit = (module) => {
     navigate(`/admin/modules/${module.id}/edit`)
   }
@@ -148,6 +166,12 @@ export default function AdminModules() {
         </Tbody>
       </Table>
 
+      {nextPage && (
+        <Box mt={5} textAlign="center">
+          <Button onClick={loadMore}>Load more</Button>
+        </Box>
+      )}
+
       <AlertDialog
         isOpen={isOpen}
         leastDestructiveRef={cancelRef}
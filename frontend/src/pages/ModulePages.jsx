@@ -283,26 +283,11 @@ export default function ModulePages() {
     setPages(reorderedPages);
 
     try {
-      // Update both pages involved in the swap
-      const promises = [
-        // Update moved page
-        api.updatePage(moduleId, parseInt(movedPage.id), {
-          ...movedPage,
-          order: index - 1,
-          id: parseInt(movedPage.id)
-        }),
-        // Update the page that was displaced
-        api.updatePage(moduleId, parseInt(reorderedPages[index].id), {
-          ...reorderedPages[index],
-          order: index,
-          id: parseInt(reorderedPages[index].id)
-        })
-      ];
-
-      await Promise.all(promises);
-
-      // Refresh the page list
-      const response = await api.getModulePages(moduleId);
+      // Rewrite the whole order in one request
+      const response = await api.reorderPages(
+        moduleId,
+        reorderedPages.map(page => parseInt(page.id))
+      );
       const updatedPages = response.data.map(page => ({
         ...page,
         id: String(page.id)
@@ -331,26 +316,11 @@ export default function ModulePages() {
     setPages(reorderedPages);
 
     try {
-      // Update both pages involved in the swap
-      const promises = [
-        // Update moved page
-        api.updatePage(moduleId, parseInt(movedPage.id), {
-          ...movedPage,
-          order: index + 1,
-          id: parseInt(movedPage.id)
-        }),
-        // Update the page that was displaced
-        api.updatePage(moduleId, parseInt(reorderedPages[index].id), {
-          ...reorderedPages[index],
-          order: index,
-          id: parseInt(reorderedPages[index].id)
-        })
-      ];
-
-      await Promise.all(promises);
-
-      // Refresh the page list
-      const response = await api.getModulePages(moduleId);
+      // Rewrite the whole order in one request
+      const response = await api.reorderPages(
+        moduleId,
+        reorderedPages.map(page => parseInt(page.id))
+      );
       const updatedPages = response.data.map(page => ({
         ...page,
         id: String(page.id)
@@ -77,14 +77,13 @@ export default function ModuleView() {
     }
   }
 
-  const checkQuizAnswers = () => {
+  const checkQuizAnswers = async () => {
     const currentPage = pages[currentPageIndex]
-    const correctAnswers = currentPage.quiz_options
-      .filter(opt => opt.is_correct)
-      .map(opt => opt.id.toString())
-    
-    const isCorrect = selectedAnswers.length === correctAnswers.length &&
-      selectedAnswers.every(answer => correctAnswers.includes(answer))
+    // Graded on the server, which records the attempt
+    const { data } = await api.submitQuiz(id, [
+      { page: currentPage.id, options: selectedAnswers.map(Number) },
+    ])
+    const isCorrect = data.results[0].correct
 
     setShowQuizResult(true)
     
@@ -105,7 +104,18 @@ export default function ModuleView() {
     const currentPage = pages[currentPageIndex]
     
     if (currentPage.type === 'quiz' && !showQuizResult) {
-      const isCorrect = checkQuizAnswers()
+      let isCorrect = false
+      try {
+        isCorrect = await checkQuizAnswers()
+      } catch (error) {
+        toast({
+          title: 'Error',
+          description: 'Failed to check your answers',
+          status: 'error',
+          duration: 3000,
+          isClosable: true,
+        })
+      }
       if (!isCorrect) return
     }
 
@@ -118,7 +128,7 @@ export default function ModuleView() {
         // Update Redux state with completed module
         const response = await api.getProgress()
         const completedModules = response.data
-          .filter(p => p.progress === 100)
+          .filter(p => p.completed_at)
           .map(p => p.module)
         dispatch(setCompletedModules(completedModules))
         
@@ -160,7 +170,7 @@ export default function ModuleView() {
   const progress = (currentPageIndex / pages.length) * 100
 
   const renderQuizContent = () => {
-    const hasMultipleCorrectAnswers = currentPage.quiz_options.filter(opt => opt.is_correct).length > 1
+    const hasMultipleCorrectAnswers = currentPage.multiple_answers
 
     return (
       <VStack spacing={6} align="stretch">
@@ -11,7 +11,8 @@ import {
   VStack,
   Spinner,
   useColorModeValue,
-  Divider
+  Divider,
+  Button
 } from '@chakra-ui/react'
 import { CheckIcon, StarIcon } from '@chakra-ui/icons'
 import { Link } from 'react-router-dom'
@@ -21,24 +22,9 @@ import { useDispatch, useSelector } from 'react-redux'
 import { setProgression, setCompletedModules } from '../store/modulesSlice'
 import api from '../services/api'
 
-const ModuleCard = ({ module, progress, isCompleted }) => {
+const ModuleCard = ({ module, progress, isCompleted, isSaved, onSavedChange }) => {
   const toast = useToast()
   const { user } = useAuth()
-  const [isSaved, setIsSaved] = useState(false)
-
-  useEffect(() => {
-    const checkIfModuleIsSaved = async () => {
-      if (!user) return
-      try {
-        const { data } = await api.getSavedModules()
-        setIsSaved(data.some(m => m.id === module.id))
-      } catch (error) {
-        console.error('Error checking saved module status:', error)
-      }
-    }
-    
-    checkIfModuleIsSaved()
-  }, [module.id, user])
 
   const handleSaveModule = async (e) => {
     e.preventDefault()
@@ -48,8 +34,8 @@ const ModuleCard = ({ module, progress, isCompleted }) => {
 
     try {
       if (isSaved) {
-        const { data } = await api.unsaveModule(module.id)
-        setIsSaved(false)
+        await api.unsaveModule(module.id)
+        onSavedChange(module.id, false)
         toast({
           title: 'Module unsaved',
           status: 'info',
@@ -57,8 +43,8 @@ const ModuleCard = ({ module, progress, isCompleted }) => {
           isClosable: true,
         })
       } else {
-        const { data } = await api.saveModule(module.id)
-        setIsSaved(true)
+        await api.saveModule(module.id)
+        onSavedChange(module.id, true)
         toast({
           title: 'Module saved',
           status: 'success',
@@ -127,7 +113,7 @@ const ModuleCard = ({ module, progress, isCompleted }) => {
   )
 }
 
-const ModulesByCategory = ({ modules, category }) => {
+const ModulesByCategory = ({ modules, category, savedIds, onSavedChange }) => {
   return (
     <Box mb={8}>
       <Heading size="md" mb={4}>{category}</Heading>
@@ -138,6 +124,8 @@ const ModulesByCategory = ({ modules, category }) => {
             module={module}
             progress={module.progress}
             isCompleted={false}
+            isSaved={savedIds.has(module.id)}
+            onSavedChange={onSavedChange}
           />
         ))}
       </SimpleGrid>
@@ -147,6 +135,8 @@ const ModulesByCategory = ({ modules, category }) => {
 
 const Modules = () => {
   const [modules, setModules] = useState([])
+  const [nextPage, setNextPage] = useState(null)
+  const [savedIds, setSavedIds] = useState(new Set())
   const [loading, setLoading] = useState(true)
   const { isAuthenticated } = useAuth()
   const toast = useToast()
@@ -158,7 +148,12 @@ const Modules = () => {
       try {
         // Fetch modules
         const modulesResponse = await api.getModules()
-        setModules(modulesResponse.data)
+        setModules(modulesResponse.data.results)
+        setNextPage(modulesResponse.data.next)
+
+        // One request for every card's bookmark state
+        const savedResponse = await api.getSavedModuleIds()
+        setSavedIds(new Set(savedResponse.data.ids))
         
         // Fetch progress to update completed modules
         const progressResponse = await api.getProgress()
@@ -184,6 +179,34 @@ const Modules = () => {
     }
   }, [isAuthenticated, dispatch, toast])
 
+  const handleSavedChange = (moduleId, saved) => {
+    setSavedIds(ids => {
+      const next = new Set(ids)
+      if (saved) {
+        next.add(moduleId)
+      } else {
+        next.delete(moduleId)
+      }
+      return next
+    })
+  }
+
+  const loadMore = async () => {
+    try {
+      const { data } = await api.getNextPage(nextPage)
+      setModules([...modules, ...data.results])
+      setNextPage(data.next)
+    } catch (error) {
+      console.error('Error fetching modules:', error)
+      toast({
+        title: 'Error fetching modules',
+        status: 'error',
+        duration: 3000,
+        isClosable: true,
+      })
+    }
+  }
+
   if (loading) {
     return (
       <Center h="50vh">
@@ -210,8 +233,15 @@ const Modules = () => {
           key={category}
           category={category}
           modules={categoryModules}
+          savedIds={savedIds}
+          onSavedChange={handleSavedChange}
         />
       ))}
+      {nextPage && (
+        <Center>
+          <Button onClick={loadMore}>Load more</Button>
+        </Center>
+      )}
     </Box>
   )
 }
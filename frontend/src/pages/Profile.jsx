@@ -38,6 +38,7 @@ export default function Profile() {
   const { user, deleteAccount } = useAuth()
   const navigate = useNavigate()
   const [savedModules, setSavedModules] = useState([])
+  const [savedNextPage, setSavedNextPage] = useState(null)
   const { isOpen, onOpen, onClose } = useDisclosure()
   const cancelRef = useRef()
   const toast = useToast()
@@ -47,7 +48,8 @@ export default function Profile() {
     const fetchSavedModules = async () => {
       try {
         const response = await api.getSavedModules()
-        setSavedModules(response.data)
+        setSavedModules(response.data.results)
+        setSavedNextPage(response.data.next)
       } catch (error) {
         console.error('Error fetching saved modules:', error)
       }
@@ -58,6 +60,16 @@ export default function Profile() {
     }
   }, [user])
 
+  const loadMoreSavedModules = async () => {
+    try {
+      const { data } = await api.getNextPage(savedNextPage)
+      setSavedModules([...savedModules, ...data.results])
+      setSavedNextPage(data.next)
+    } catch (error) {
+      console.error('Error fetching saved modules:', error)
+    }
+  }
+
   const handleUnsaveModule = async (moduleId) => {
     try {
       await api.unsaveModule(moduleId)
@@ -224,6 +236,11 @@ export default function Profile() {
           ) : (
             <Text color="gray.500">No saved modules yet.</Text>
           )}
+          {savedNextPage && (
+            <Center mt={4}>
+              <Button onClick={loadMoreSavedModules}>Load more</Button>
+            </Center>
+          )}
         </Box>
       </VStack>
       {/* Delete Account Confirmation Dialog */}
@@ -77,8 +77,12 @@ const apiService = {
   deleteAccount: () => api.delete('/users/delete_account/'),
   
   // Modules
-  getModules() {
-    return api.get('/modules/');
+  getModules(params) {
+    return api.get('/modules/', { params });
+  },
+  // Follow the `next` cursor link returned by paginated endpoints
+  getNextPage(url) {
+    return api.get(url);
   },
   getModule(id) {
     return api.get(`/modules/${id}/`);
@@ -93,8 +97,19 @@ const apiService = {
   unsaveModule(id) {
     return api.post(`/modules/${id}/unsave/`);
   },
-  getSavedModules() {
-    return api.get('/modules/saved/');
+  getSavedModules(params) {
+    return api.get('/modules/saved/', { params });
+  },
+  // Grade answers to a module's quiz pages: [{ page, options: [optionIds] }]
+  submitQuiz(moduleId, answers) {
+    return api.post(`/modules/${moduleId}/quiz/`, { answers });
+  },
+  getSavedModuleIds() {
+    return api.get('/modules/saved/ids/');
+  },
+  // Save and unsave several modules in one request: { add: [ids], remove: [ids] }
+  updateSavedModules(changes) {
+    return api.post('/modules/saved/batch/', changes);
   },
   
   // Pages
@@ -123,37 +138,19 @@ const apiService = {
   },
   
   deletePage: (moduleId, pageId) => api.delete(`/modules/${moduleId}/pages/${pageId}/`),
+
+  // Replace every page of a module (with its quiz options) in one transaction
+  bulkSavePages: (moduleId, pages) => api.put(`/modules/${moduleId}/pages/bulk/`, { pages }),
+  reorderPages: (moduleId, pageIds) => api.post(`/modules/${moduleId}/pages/reorder/`, { page_ids: pageIds }),
   
   // Progress
   getProgress() {
     return api.get('/progress/');
   },
 
-  async updateProgress(moduleId, data) {
-    try {
-      // First try to get existing progress
-      const response = await api.get('/progress/');
-      const existingProgress = response.data.find(p => p.module === parseInt(moduleId));
-      
-      if (existingProgress) {
-        // If progress exists, update it
-        return api.patch(`/progress/${existingProgress.id}/`, {
-          ...data,
-          module: moduleId,
-          progress: data.completed ? 100 : (data.progress || existingProgress.progress)
-        });
-      } else {
-        // If no progress exists, create new
-        return api.post('/progress/', {
-          module: moduleId,
-          progress: data.completed ? 100 : (data.progress || 0),
-          ...data
-        });
-      }
-    } catch (error) {
-      console.error('Error updating progress:', error);
-      throw error;
-    }
+  // Single atomic upsert keyed by module; `monotonic` keeps progress from going down
+  updateProgress(moduleId, data) {
+    return api.put(`/progress/by-module/${moduleId}/`, data);
   },
 
   completeModule(moduleId) {